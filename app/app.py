@@ -9,6 +9,7 @@ import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from nlp_pipeline.enhanced_chatbot import EnhancedChatbot
+from nlp_pipeline.chatbot import loader as model_loader
 from p2p.node import P2PNode
 from monitoring.alert_monitor import AlertMonitor
 
@@ -157,19 +158,19 @@ class WebChatbotManager:
         if len(self.node_logs[port]) > 50:
             self.node_logs[port] = self.node_logs[port][-50:]
     
-    async def process_message_for_node(self, port, message, user_name=None):
+    async def process_message_for_node(self, port, message, user_name=None, session_id=None):
         """Procesar mensaje para un nodo específico"""
         if port == 8000 and self.chatbot:
             # Nodo principal
             self.add_node_log(port, f"Usuario: {message}", "user")
-            response = await self.chatbot.process_query(message, user_name)
+            response = await self.chatbot.process_query(message, user_name, session_id)
             self.add_node_log(port, f"Bot: {response[:100]}{'...' if len(response) > 100 else ''}", "bot")
             return response
         elif port in self.demo_chatbots:
             # Nodo demo
             chatbot = self.demo_chatbots[port]
             self.add_node_log(port, f"Usuario: {message}", "user")
-            response = await chatbot.process_query(message, user_name)
+            response = await chatbot.process_query(message, user_name, session_id)
             self.add_node_log(port, f"Bot: {response[:100]}{'...' if len(response) > 100 else ''}", "bot")
             return response
         else:
@@ -186,6 +187,7 @@ class WebChatbotManager:
                 'type': 'main',
                 'status': 'active' if self.is_running else 'inactive',
                 'peers': self.p2p_node.get_connected_peers(),
+                'peer_health': self.p2p_node.get_connected_peers(detailed=True),
                 'logs': self.node_logs.get(port, [])
             }
         elif port in self.demo_nodes:
@@ -199,6 +201,7 @@ class WebChatbotManager:
                 'type': 'demo',
                 'status': 'active',
                 'peers': node.get_connected_peers(),
+                'peer_health': node.get_connected_peers(detailed=True),
                 'logs': self.node_logs.get(port, [])
             }
         else:
@@ -230,10 +233,10 @@ class WebChatbotManager:
         return nodes
     
     # ... (resto de métodos anteriores)
-    async def process_message(self, message, user_name=None):
+    async def process_message(self, message, user_name=None, session_id=None):
         """Procesar mensaje de chat"""
         if self.chatbot:
-            return await self.chatbot.process_query(message, user_name)
+            return await self.chatbot.process_query(message, user_name, session_id)
         return "Sistema no inicializado"
         
     def get_network_status(self):
@@ -243,6 +246,8 @@ class WebChatbotManager:
             return {
                 'peers_count': len(peers),
                 'peers': peers,
+                # Estado según los latidos: alive, phi, rtt_ms, last_heartbeat
+                'peer_health': self.p2p_node.get_connected_peers(detailed=True),
                 'node_id': self.p2p_node.node_id,
                 'status': 'active' if self.is_running else 'inactive',
                 'demo_nodes_count': len(self.demo_nodes),
@@ -269,8 +274,9 @@ class WebChatbotManager:
         }
         nodes.append(main_node)
         
-        # Peers conectados (nodos demo)
-        peers = self.p2p_node.get_connected_peers()
+        # Peers conectados (nodos demo), con su estado según los latidos
+        health = {info['peer_id']: info for info in self.p2p_node.get_connected_peers(detailed=True)}
+        peers = list(health)
         for i, peer in enumerate(peers):
             # Extraer puerto del peer ID si es posible
             peer_port = None
@@ -284,7 +290,8 @@ class WebChatbotManager:
                 'id': peer,
                 'label': f'Demo Bank {i+1}',
                 'type': 'demo',
-                'active': True,
+                'active': health[peer]['alive'],
+                'rtt_ms': health[peer]['rtt_ms'],
                 'port': peer_port
             }
             nodes.append(peer_node)
@@ -347,12 +354,14 @@ def chat_with_node(port):
         data = request.get_json()
         message = data.get('message', '')
         user_name = data.get('user_name', None)
+        # Cada cliente continúa su propio historial con "más transacciones"
+        session_id = data.get('session_id') or request.remote_addr
         
         # Ejecutar consulta asíncrona en el nodo específico
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         response = loop.run_until_complete(
-            chat_manager.process_message_for_node(port, message, user_name)
+            chat_manager.process_message_for_node(port, message, user_name, session_id)
         )
         response = (response or "").replace('Â', '')
         
@@ -476,7 +485,34 @@ def test_scenarios():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/model')
+def get_model_status():
+    """Estado del modelo de intents servido"""
+    try:
+        return jsonify({
+            'success': True,
+            'model': model_loader.status()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/model/reload', methods=['POST'])
+def reload_model():
+    """Recargar data.pth/data.npz e intents.json sin reiniciar los nodos"""
+    try:
+        reloaded = model_loader.reload()
+        status = model_loader.status()
+        return jsonify({
+            'success': reloaded,
+            'message': f"Modelo versión {status['version']}" if reloaded else status['last_error'],
+            'model': status
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 if __name__ == '__main__':
+    # Recarga automática al reentrenar (python nlp_pipeline/train.py)
+    model_loader.watch()
     print("🚀 ChatBot P2P Financiero - Demostración Completa")
     print("📡 Accede a: http://localhost:5000")
     print("🔗 Red P2P con nodos reales y funcionalidad completa")
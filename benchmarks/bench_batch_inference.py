@@ -0,0 +1,53 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nlp_pipeline.chatbot import INTENTS_FILE, chatbot, chatbot_async, batcher, loader
+
+def load_patterns():
+    with open(INTENTS_FILE, 'r', encoding='utf-8') as stream:
+        intents = json.load(stream)
+    return [pattern for intent in intents['intents'] for pattern in intent['patterns']]
+
+async def concurrent_requests(texts, func):
+    return await asyncio.gather(*(func(text) for text in texts))
+
+def main(requests=2000, batch_size=64):
+    patterns = load_patterns()
+    texts = [patterns[i % len(patterns)] for i in range(requests)]
+    model = loader.get()
+
+    start = time.perf_counter()
+    for text in texts:
+        chatbot(text)
+    single = requests / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, requests, batch_size):
+        model.classify_batch(texts[i:i + batch_size])
+    batched = requests / (time.perf_counter() - start)
+
+    async def one_by_one(text):
+        return await asyncio.get_running_loop().run_in_executor(None, chatbot, text)
+
+    start = time.perf_counter()
+    asyncio.run(concurrent_requests(texts, one_by_one))
+    concurrent_single = requests / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    asyncio.run(concurrent_requests(texts, chatbot_async))
+    concurrent_batched = requests / (time.perf_counter() - start)
+
+    print(f"\n Benchmark de inferencia por lotes ({requests:,} frases)")
+    print("=" * 50)
+    print(f"Secuencial, una frase por pasada:     {single:10.0f} frases/s")
+    print(f"classify_batch (lotes de {batch_size}):        {batched:10.0f} frases/s")
+    print(f"Concurrentes, executor por frase:     {concurrent_single:10.0f} frases/s")
+    print(f"Concurrentes, micro-batching:         {concurrent_batched:10.0f} frases/s")
+    print(f"  lote medio: {batcher.stats()['avg_batch']:.1f} frases")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
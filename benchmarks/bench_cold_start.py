@@ -0,0 +1,64 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un proceso nuevo para medir un arranque en frío real
+COLD_START_SCRIPT = r'''
+import asyncio, json, sys, time
+start = time.perf_counter()
+from nlp_pipeline.enhanced_chatbot import EnhancedChatbot
+from nlp_pipeline.chatbot import loader
+timings = {"import": time.perf_counter() - start}
+
+async def main():
+    bot = EnhancedChatbot(sys.argv[1])
+    begin = time.perf_counter()
+    await bot.process_query("saldo de Juan")
+    timings["financial"] = time.perf_counter() - begin
+    timings["torch_loaded"] = "torch" in sys.modules
+    begin = time.perf_counter()
+    try:
+        await bot.process_query("hola")
+        timings["general"] = time.perf_counter() - begin
+        timings["model_load"] = loader.load_time
+        timings["backend"] = loader.get().backend
+    except (ImportError, LookupError) as e:
+        timings["general_error"] = type(e).__name__
+    bot.db.close()
+
+asyncio.run(main())
+print(json.dumps(timings))
+'''
+
+def run_once(db_path):
+    result = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, db_path],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench_financial.db")
+        results = [run_once(db_path) for _ in range(runs)]
+
+    def median_ms(key):
+        values = [r[key] for r in results if r.get(key) is not None]
+        return statistics.median(values) * 1000 if values else None
+
+    print(f"\n Benchmark de arranque en frío ({runs} procesos)")
+    print("=" * 50)
+    print(f"Importar EnhancedChatbot:           {median_ms('import'):8.1f} ms")
+    print(f"Primera respuesta financiera:       {median_ms('financial'):8.1f} ms")
+    print(f"torch cargado tras consulta financiera: {'sí' if results[0]['torch_loaded'] else 'no'}")
+    if median_ms('general') is not None:
+        print(f"Primera respuesta conversacional:   {median_ms('general'):8.1f} ms")
+        print(f"  de ellos, carga del modelo ({results[0]['backend']}): {median_ms('model_load'):8.1f} ms")
+    else:
+        print(f"Primera respuesta conversacional:   no disponible ({results[0]['general_error']})")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
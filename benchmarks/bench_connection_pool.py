@@ -0,0 +1,98 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+
+NAMES = ["Juan", "María", "Carlos", "Ana"]
+
+def legacy_balance_query(db_path, account_name):
+    """Consulta de saldo como antes del pool: una conexión por llamada"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT balance, account_type
+        FROM accounts
+        WHERE LOWER(user_name) LIKE LOWER(?)
+    ''', (f'%{account_name}%',))
+    result = cursor.fetchone()
+    conn.close()
+    return result
+
+def legacy_write(db_path):
+    """Escritura como antes del pool: conectar, actualizar, commit y cerrar"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        UPDATE accounts SET last_access = CURRENT_TIMESTAMP WHERE account_id = 1
+    ''')
+    conn.commit()
+    conn.close()
+
+def run_for(duration, query):
+    """Ejecutar una consulta en bucle y devolver cuantas se completaron"""
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        query(NAMES[count % len(NAMES)])
+        count += 1
+    return count
+
+def run_threads(duration, query, writer, readers=4):
+    """Lectores concurrentes mas un escritor (como los monitores de app.py)"""
+    counts = [0] * readers
+    stop = threading.Event()
+
+    def reader(index):
+        counts[index] = run_for(duration, query)
+
+    def write_loop():
+        while not stop.is_set():
+            writer()
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    writer_thread = threading.Thread(target=write_loop)
+    writer_thread.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    writer_thread.join()
+    return sum(counts)
+
+def main(duration=2.0):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench_financial.db")
+        db = FinancialDatabase(db_path)
+
+        def pooled_write():
+            with db.pool.write() as conn:
+                conn.execute('''
+                    UPDATE accounts SET last_access = CURRENT_TIMESTAMP WHERE account_id = 1
+                ''')
+
+        print(f"\n Benchmark de conexiones ({duration:.0f}s por escenario)")
+        print("=" * 50)
+
+        legacy = run_for(duration, lambda name: legacy_balance_query(db_path, name))
+        pooled = run_for(duration, db.get_account_balance)
+        print(f"1 hilo   - conexión por consulta: {legacy / duration:10.0f} consultas/s")
+        print(f"1 hilo   - pool WAL:              {pooled / duration:10.0f} consultas/s")
+        print(f"           mejora: x{pooled / max(legacy, 1):.1f}")
+
+        legacy = run_threads(duration, lambda name: legacy_balance_query(db_path, name),
+                             lambda: legacy_write(db_path))
+        pooled = run_threads(duration, db.get_account_balance, pooled_write)
+        print(f"4 hilos + escritor - conexión por consulta: {legacy / duration:10.0f} consultas/s")
+        print(f"4 hilos + escritor - pool WAL:              {pooled / duration:10.0f} consultas/s")
+        print(f"                     mejora: x{pooled / max(legacy, 1):.1f}")
+
+        db.close()
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
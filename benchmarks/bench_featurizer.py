@@ -0,0 +1,61 @@
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nlp_pipeline.nltk_lib import BagOfWordsFeaturizer, stemming
+
+INTENTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'nlp_pipeline', 'training_data', 'intents.json')
+
+def legacy_bag_of_words(tokenized_sentence, words):
+    """bag_of_words original: un PorterStemmer por palabra y recorrido de todo el vocabulario"""
+    from nltk.stem.porter import PorterStemmer
+    tokenized_sentence = [PorterStemmer().stem(i.lower()) for i in tokenized_sentence]
+    bag = np.zeros(len(words), dtype=np.float32)
+    for i, word in enumerate(words):
+        if word in tokenized_sentence:
+            bag[i] = 1.0
+    return bag
+
+def load_sentences():
+    """Patrones de intents.json separados por espacios (sin depender de los datos de punkt)"""
+    with open(INTENTS_FILE, 'r', encoding='utf-8') as stream:
+        intents = json.load(stream)
+    return [pattern.split() for intent in intents['intents'] for pattern in intent['patterns']]
+
+def measure(featurize, sentences, vocabulary):
+    start = time.perf_counter()
+    for sentence in sentences:
+        featurize(sentence, vocabulary)
+    return (time.perf_counter() - start) / len(sentences) * 1e6
+
+def main(vocabulary_size=5000, queries=2000):
+    rnd = random.Random(7)
+    sentences = load_sentences()
+    vocabulary = sorted({stemming(token) for sentence in sentences for token in sentence})
+    # Vocabulario ampliado con palabras sintéticas para simular un modelo más grande
+    while len(vocabulary) < vocabulary_size:
+        vocabulary.append(f"w{len(vocabulary)}")
+    vocabulary = sorted(set(vocabulary))
+    queries = [rnd.choice(sentences) for _ in range(queries)]
+
+    featurizer = BagOfWordsFeaturizer(vocabulary)
+    for sentence in queries[:200]:
+        assert np.array_equal(featurizer.transform(sentence), legacy_bag_of_words(sentence, vocabulary))
+
+    legacy = measure(legacy_bag_of_words, queries, vocabulary)
+    vectorized = measure(lambda sentence, _: featurizer.transform(sentence), queries, vocabulary)
+
+    print(f"\n Benchmark de bag of words (vocabulario de {len(vocabulary):,} palabras)")
+    print("=" * 50)
+    print(f"bag_of_words original: {legacy:10.1f} µs/consulta")
+    print(f"BagOfWordsFeaturizer:  {vectorized:10.1f} µs/consulta")
+    print(f"                       mejora: x{legacy / vectorized:.1f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,100 @@
+import os
+import sys
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+from database.name_resolver import NameResolver
+
+FIRST_NAMES = ["Juan", "María", "Carlos", "Ana", "José", "Lucía", "Pedro", "Sofía",
+               "Miguel", "Valentina", "Andrés", "Camila", "Jorge", "Isabel", "Raúl"]
+LAST_NAMES = ["Pérez", "González", "López", "Torres", "Rodríguez", "Martínez", "Sánchez",
+              "Ramírez", "Flores", "Gómez", "Díaz", "Vargas", "Castro", "Núñez", "Rojas"]
+
+def build_database(db_path, num_accounts, seed=42):
+    """Crear una base con num_accounts cuentas de nombres aleatorios"""
+    db = FinancialDatabase(db_path)
+    rnd = random.Random(seed)
+    batch = []
+    with db.pool.write() as conn:
+        for account_id in range(100, num_accounts + 100):
+            name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {account_id}"
+            batch.append((account_id, name, rnd.uniform(0, 50000), "checking"))
+            if len(batch) == 50000:
+                conn.executemany('''
+                    INSERT INTO accounts (account_id, user_name, balance, account_type)
+                    VALUES (?, ?, ?, ?)
+                ''', batch)
+                batch = []
+        conn.executemany('''
+            INSERT INTO accounts (account_id, user_name, balance, account_type)
+            VALUES (?, ?, ?, ?)
+        ''', batch)
+    db.index_account_names()
+    return db
+
+def legacy_lookup(conn, account_name):
+    """Búsqueda anterior: LOWER(user_name) LIKE '%nombre%' (recorre toda la tabla)"""
+    return conn.execute('''
+        SELECT balance, account_type
+        FROM accounts
+        WHERE LOWER(user_name) LIKE LOWER(?)
+    ''', (f'%{account_name}%',)).fetchone()
+
+def time_queries(lookup, queries):
+    """Tiempo medio por consulta en milisegundos"""
+    start = time.perf_counter()
+    for query in queries:
+        lookup(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+def main(num_accounts=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n Generando {num_accounts:,} cuentas...")
+        start = time.perf_counter()
+        db = build_database(os.path.join(tmp, "bench_names.db"), num_accounts)
+        print(f"   Base creada e indexada en {time.perf_counter() - start:.1f}s")
+
+        rnd = random.Random(7)
+        with db.pool.read() as conn:
+            names = [conn.execute("SELECT user_name FROM accounts WHERE account_id = ?",
+                                  (rnd.randrange(100, num_accounts + 100),)).fetchone()[0]
+                     for _ in range(200)]
+        # Nombre completo con número de cuenta: una única coincidencia
+        exact = names
+        # Apellido y número (sin acentos): se resuelve con el índice de palabras
+        surname = [" ".join(name.split()[1:]).replace("é", "e").replace("í", "i") for name in names]
+        # Una sola palabra (lo habitual en el chat): miles de cuentas coinciden
+        first_name = [rnd.choice(FIRST_NAMES) for _ in range(200)]
+        last_name = [rnd.choice(LAST_NAMES).lower() for _ in range(200)]
+        # Sin coincidencias: el peor caso para LIKE, que recorre toda la tabla
+        missing = [f"Inexistente{i}" for i in range(200)]
+
+        resolver = NameResolver(db)
+        start = time.perf_counter()
+        resolver.refresh()
+        print(f"   Índice en memoria de titulares cargado en {time.perf_counter() - start:.1f}s")
+
+        with db.pool.read() as conn:
+            cursor = conn.cursor()
+            for label, queries in (("nombre completo", exact), ("apellido y número", surname),
+                                   ("solo nombre", first_name), ("solo apellido", last_name),
+                                   ("sin coincidencia", missing)):
+                legacy = time_queries(lambda q: legacy_lookup(conn, q), queries[:10])
+                indexed = time_queries(lambda q: db._find_account_id(cursor, q), queries)
+                # Frase completa: el resolver encuentra el nombre dentro de ella
+                in_memory = time_queries(lambda q: resolver.find(f"saldo de {q} por favor"), queries)
+                print(f"\n {label}:")
+                print(f"   LIKE '%nombre%':       {legacy:9.3f} ms/consulta")
+                print(f"   índice normalizado:    {indexed:9.3f} ms/consulta")
+                print(f"   NameResolver (frase):  {in_memory:9.3f} ms/consulta")
+                print(f"   mejora: x{legacy / max(indexed, 1e-9):.0f}")
+
+            # La búsqueda sin acentos encuentra nombres acentuados
+            print(f"\n 'maria gonzalez' -> account_id {db._find_account_id(cursor, 'maria gonzalez')}")
+        db.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nlp_pipeline.numpy_model import NumpyNeuralNetwork
+
+HIDDEN_SIZE = 8
+NUM_CLASSES = 13
+
+def random_network(rnd, vocabulary_size):
+    """Red con las dimensiones de NeuralNetwork y pesos aleatorios (forma de torch)"""
+    shapes = [(HIDDEN_SIZE, vocabulary_size), (HIDDEN_SIZE, HIDDEN_SIZE), (NUM_CLASSES, HIDDEN_SIZE)]
+    return NumpyNeuralNetwork([rnd.standard_normal(shape, dtype=np.float32) for shape in shapes],
+                              [rnd.standard_normal(shape[0], dtype=np.float32) for shape in shapes])
+
+def dense_batch(bags, vocabulary_size):
+    """Como BagOfWordsFeaturizer.transform_batch"""
+    dense = np.zeros((len(bags), vocabulary_size), dtype=np.float32)
+    for row, bag in enumerate(bags):
+        dense[row, bag] = 1.0
+    return dense
+
+def sparse_batch(bags):
+    """Como BagOfWordsFeaturizer.sparse_batch"""
+    offsets = np.cumsum([0] + [len(bag) for bag in bags[:-1]]).astype(np.intp)
+    return np.concatenate(bags).astype(np.intp), offsets
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main(batch_size=1, repeat=2000):
+    rnd = np.random.default_rng(7)
+    print(f"\n Benchmark de entrada dispersa (lotes de {batch_size} frases de ~6 palabras)")
+    print("=" * 50)
+    for vocabulary_size in (1000, 10000, 50000):
+        network = random_network(rnd, vocabulary_size)
+        # Columnas activas de cada frase (lo que produce BagOfWordsFeaturizer.indices)
+        bags = [np.unique(rnd.integers(0, vocabulary_size, 6)) for _ in range(batch_size)]
+        assert np.allclose(network.forward(dense_batch(bags, vocabulary_size)),
+                           network.forward_sparse(*sparse_batch(bags)), atol=1e-4)
+
+        # Incluye construir la entrada: el vector denso también cuesta O(vocabulario)
+        dense_us = measure(lambda: network.predict_proba(dense_batch(bags, vocabulary_size)), repeat)
+        sparse_us = measure(lambda: network.predict_proba_sparse(*sparse_batch(bags)), repeat)
+        print(f"Vocabulario {vocabulary_size:6,}: densa {dense_us:8.1f} µs  dispersa {sparse_us:8.1f} µs  "
+              f"(x{dense_us / sparse_us:.1f})")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
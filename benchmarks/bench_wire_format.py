@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from p2p.protocol import P2PProtocol
+
+def sample_messages():
+    """Alerta y chat como los que envían broadcast_alert y share_chat"""
+    alerts = [
+        {'type': 'LOW_BALANCE', 'message': '🚨 SALDO BAJO: Juan Pérez tiene $45.50', 'severity': 3, 'account_id': 12},
+        {'type': 'SUSPICIOUS_ACTIVITY', 'message': '🚨 ACTIVIDAD SOSPECHOSA: María García - $15,000.00 en 24h',
+         'severity': 5, 'account_id': 7},
+    ]
+    chat = {
+        'user_input': 'Saldo de Juan',
+        'bot_response': '💰 Saldo actual: $1,250.00 (Cuenta checking)',
+        'context': 'financial_chat',
+        'timestamp': datetime.now().isoformat()
+    }
+    return {
+        'alerta': P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['ALERT'], alerts, 'bot_financiero_8000'),
+        'chat': P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['CHAT'], chat, 'bot_financiero_8000'),
+    }
+
+def throughput(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return repeat / (time.perf_counter() - start)
+
+def main(repeat=50000):
+    print(f"\n Benchmark de formato de trama P2P ({repeat:,} mensajes)")
+    print("=" * 50)
+    for name, message in sample_messages().items():
+        print(f"\n{name.capitalize()}:")
+        for wire_format in ('json', 'binary'):
+            raw = P2PProtocol.encode_message(message, wire_format)
+            assert P2PProtocol.parse_message(raw) == message
+            encode = throughput(lambda m: P2PProtocol.encode_message(m, wire_format), message, repeat)
+            decode = throughput(P2PProtocol.parse_message, raw, repeat)
+            size = len(raw.encode('utf-8')) if isinstance(raw, str) else len(raw)
+            print(f"  {wire_format:6}: {size:4d} bytes  codificar {encode:9,.0f}/s  decodificar {decode:9,.0f}/s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class _DatabaseJob:
+    """Llamada a la base de datos ejecutada en un hilo del executor"""
+
+    def __init__(self, db, func, args, kwargs):
+        self.db = db
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.thread_id = None
+        self.lock = threading.Lock()
+
+    def run(self):
+        with self.lock:
+            self.thread_id = threading.get_ident()
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.thread_id = None
+
+    def interrupt(self):
+        """Interrumpir la consulta si todavía se esta ejecutando"""
+        with self.lock:
+            if self.thread_id is not None:
+                self.db.interrupt(self.thread_id)
+
+class AsyncFinancialDatabase:
+    """Fachada asíncrona de FinancialDatabase
+
+    Ejecuta cada consulta en un ThreadPoolExecutor acotado para no bloquear
+    el event loop (servidor P2P, monitor de alertas). Si la consulta supera
+    el timeout o la tarea que espera es cancelada, la consulta en curso se
+    interrumpe con sqlite3 interrupt y se propaga asyncio.TimeoutError o
+    asyncio.CancelledError.
+    """
+
+    def __init__(self, db, max_workers=4, timeout=10.0):
+        self.db = db
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="financial-db")
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """Ejecutar func(*args, **kwargs) en el executor y esperar su resultado"""
+        job = _DatabaseJob(self.db, func, args, kwargs)
+        future = self._executor.submit(job.run)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Si no llegó a empezar se descarta; si ya empezó se interrumpe
+            future.cancel()
+            job.interrupt()
+            raise
+
+    async def get_account_balance(self, account_name=None, account_id=None):
+        return await self.run(self.db.get_account_balance, account_name, account_id)
+
+    async def get_recent_transactions(self, account_name, limit=5):
+        return await self.run(self.db.get_recent_transactions, account_name, limit)
+
+    async def get_account_summary(self, account_name=None, limit=3, account_id=None):
+        return await self.run(self.db.get_account_summary, account_name, limit, account_id)
+
+    async def get_transactions_page(self, account_name=None, limit=5, before=None, account_id=None):
+        return await self.run(self.db.get_transactions_page, account_name, limit, before, account_id)
+
+    async def detect_critical_conditions(self):
+        return await self.run(self.db.detect_critical_conditions)
+
+    async def get_all_alerts(self):
+        return await self.run(self.db.get_all_alerts)
+
+    def close(self):
+        """Detener el executor sin esperar a las consultas pendientes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
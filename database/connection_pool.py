@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# PRAGMAs aplicados a cada conexión del pool
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",   # Seguro en modo WAL y mucho mas rapido que FULL
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",    # ~16 MB de cache de paginas por conexión
+    "PRAGMA mmap_size = 134217728",  # 128 MB de lectura mapeada en memoria
+]
+
+class ConnectionPool:
+    """Pool de conexiones SQLite con modo WAL y separación lectura/escritura
+
+    - Lecturas: una conexión persistente por hilo (thread-local), en modo
+      query_only, que en WAL no bloquea ni es bloqueada por el escritor.
+    - Escrituras: una única conexión compartida protegida por un lock, de modo
+      que los escritores del mismo proceso se serializan en Python en lugar de
+      competir por el lock de SQLite.
+    """
+
+    def __init__(self, db_path, busy_timeout=5.0):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._readers = {}  # {thread_id: conexión de lectura}
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._writer_owner = None  # thread_id que tiene la conexión de escritura
+        self._probe = None  # conexión dedicada a PRAGMA data_version
+        self._probe_lock = threading.Lock()
+        self._closed = False
+
+        # El modo WAL es persistente en el archivo: basta con activarlo una vez
+        with self._write_lock:
+            writer = self._get_writer()
+            writer.execute("PRAGMA journal_mode = WAL")
+
+    def _connect(self):
+        """Abrir una conexión nueva con los PRAGMAs del pool"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _get_writer(self):
+        """Conexión de escritura compartida (llamar con el lock tomado)"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("El pool de conexiones esta cerrado")
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _get_reader(self):
+        """Conexión de lectura del hilo actual"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("El pool de conexiones esta cerrado")
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers[threading.get_ident()] = conn
+                self._prune_dead_readers()
+        return conn
+
+    def _prune_dead_readers(self):
+        """Cerrar conexiones de hilos que ya terminaron (llamar con el lock tomado)"""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for thread_id in [tid for tid in self._readers if tid not in alive]:
+            self._readers.pop(thread_id).close()
+
+    @contextmanager
+    def read(self):
+        """Obtener la conexión de lectura del hilo actual"""
+        conn = self._get_reader()
+        try:
+            yield conn
+        finally:
+            # Cerrar cualquier transacción implícita para no retener el snapshot WAL
+            if conn.in_transaction:
+                conn.rollback()
+
+    @contextmanager
+    def write(self):
+        """Obtener la conexión de escritura dentro de una transacción
+
+        Hace commit al salir del bloque o rollback si ocurre una excepción.
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            owner = self._writer_owner
+            self._writer_owner = threading.get_ident()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._writer_owner = owner
+    
+    def data_version(self):
+        """Versión de los datos: cambia cada vez que se confirma una escritura
+
+        PRAGMA data_version solo es comparable dentro de una misma conexión,
+        por eso se consulta siempre sobre una conexión dedicada, que ve los
+        commits de la conexión de escritura y de otros procesos.
+        """
+        with self._probe_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("El pool de conexiones esta cerrado")
+            if self._probe is None:
+                self._probe = self._connect()
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+    
+    def interrupt(self, thread_id):
+        """Interrumpir las consultas en curso del hilo indicado
+
+        La consulta interrumpida falla con sqlite3.OperationalError en ese
+        hilo; si no hay ninguna en ejecución no tiene efecto.
+        """
+        with self._readers_lock:
+            reader = self._readers.get(thread_id)
+        if reader is not None:
+            reader.interrupt()
+        writer = self._writer
+        if writer is not None and self._writer_owner == thread_id:
+            writer.interrupt()
+
+    def close(self):
+        """Cerrar todas las conexiones del pool"""
+        with self._write_lock:
+            self._closed = True
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
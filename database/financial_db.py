@@ -1,16 +1,128 @@
+import os
 import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from database.connection_pool import ConnectionPool, CONNECTION_PRAGMAS
+from database.read_cache import ReadCache
+
+# Longitud del prefijo de timestamp que identifica un bucket horario ('YYYY-MM-DD HH')
+OUTFLOW_BUCKET_LENGTH = 13
+
+# Orden en que se reportan las alertas de cada condición crítica
+ALERT_TYPE_ORDER = {"SALDO_BAJO": 0, "ACTIVIDAD_SOSPECHOSA": 1, "INCIDENTE_DE_SEGURIDAD": 2}
+
+def shard_paths(db_path, shards):
+    """Rutas de los archivos de cada shard: financial.db -> financial.shard0.db, ..."""
+    if shards <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}{ext}" for i in range(shards)]
+
+class _ShardCall:
+    """Una llamada repartida entre los hilos de los shards, interrumpible en bloque"""
+
+    def __init__(self):
+        self.threads = set()
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def run(self, func, pool):
+        with self.lock:
+            if self.cancelled:
+                raise sqlite3.OperationalError("interrupted")
+            self.threads.add(threading.get_ident())
+        try:
+            return func(pool)
+        finally:
+            with self.lock:
+                self.threads.discard(threading.get_ident())
+
+    def interrupt(self, pools):
+        """Interrumpir las consultas en curso y descartar los shards que no empezaron"""
+        with self.lock:
+            self.cancelled = True
+            threads = list(self.threads)
+        for thread_id in threads:
+            for pool in pools:
+                pool.interrupt(thread_id)
+
+def _prefix_upper_bound(prefix):
+    """Menor cadena mayor que todas las que empiezan por prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def fold_name(text):
+    """Normalizar un nombre: minúsculas, sin acentos y espacios simples
+
+    "  María  González" -> "maria gonzalez"
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(without_accents.casefold().split())
 
 class FinancialDatabase:
-    def __init__(self, db_path="financial.db"):
+    """Base de datos financiera SQLite, opcionalmente particionada en shards
+
+    Con shards > 1 los datos se reparten en N archivos por account_id
+    (account_id % N): cada cuenta vive en un shard junto con sus
+    transacciones y alertas, así que cada escritor bloquea solo su archivo.
+    N debe mantenerse fijo para un mismo conjunto de archivos.
+    """
+    
+    def __init__(self, db_path="financial.db", cache_size=1024, sample_data=True, shards=1):
         self.db_path = db_path
+        self.shard_paths = shard_paths(db_path, shards)
+        self.pools = [ConnectionPool(path) for path in self.shard_paths]
+        # Pool del primer shard (la única base cuando shards=1)
+        self.pool = self.pools[0]
+        self._shard_executor = None
+        # Llamadas en curso en los shards, por hilo que las espera (para interrupt)
+        self._shard_calls = {}
+        self._shard_calls_lock = threading.Lock()
+        if len(self.pools) > 1:
+            self._shard_executor = ThreadPoolExecutor(max_workers=len(self.pools),
+                                                      thread_name_prefix="financial-shard")
+        # Cache LRU de saldos e historiales, invalidada al cambiar PRAGMA data_version
+        self.cache = ReadCache(cache_size)
         self.init_database()
-        self.populate_sample_data()
+        if sample_data:
+            self.populate_sample_data()
+    
+    def shard_pool(self, account_id):
+        """Pool del shard que contiene la cuenta"""
+        return self.pools[account_id % len(self.pools)]
+    
+    def _map_shards(self, func):
+        """Ejecutar func(pool) en todos los shards, en paralelo si hay mas de uno
+
+        interrupt() con el hilo que llama alcanza también a los hilos de los shards.
+        """
+        if self._shard_executor is None:
+            return [func(self.pool)]
+        caller = threading.get_ident()
+        call = _ShardCall()
+        with self._shard_calls_lock:
+            self._shard_calls[caller] = call
+        try:
+            return list(self._shard_executor.map(lambda pool: call.run(func, pool), self.pools))
+        finally:
+            with self._shard_calls_lock:
+                self._shard_calls.pop(caller, None)
+    
+    def data_version(self):
+        """Versión conjunta de los datos de todos los shards"""
+        return tuple(pool.data_version() for pool in self.pools)
     
     def init_database(self):
         """Inicializar esquema de base de datos financiera"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        for pool in self.pools:
+            with pool.write() as conn:
+                self._create_schema(conn.cursor())
+    
+    def _create_schema(self, cursor):
+        """Crear tablas si no existen"""
         
         # Tabla de cuentas
         cursor.execute('''
@@ -21,7 +133,8 @@ class FinancialDatabase:
                 account_type TEXT NOT NULL,
                 created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_access TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                failed_attempts INTEGER DEFAULT 0
+                failed_attempts INTEGER DEFAULT 0,
+                name_folded TEXT
             )
         ''')
         
@@ -52,33 +165,439 @@ class FinancialDatabase:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Una sola alerta abierta por cuenta y tipo
+        cursor.execute('''
+            SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_alerts_open'
+        ''')
+        if cursor.fetchone() is None:
+            # Eliminar duplicados acumulados por versiones anteriores, conservando el mas reciente
+            cursor.execute('''
+                DELETE FROM critical_alerts
+                WHERE resolved = FALSE
+                AND alert_id NOT IN (
+                    SELECT MAX(alert_id) FROM critical_alerts
+                    WHERE resolved = FALSE
+                    GROUP BY account_id, alert_type
+                )
+            ''')
+            cursor.execute('''
+                CREATE UNIQUE INDEX idx_alerts_open
+                ON critical_alerts (account_id, alert_type)
+                WHERE resolved = FALSE
+            ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_timestamp
+            ON transactions (timestamp)
+        ''')
+        
+        # Índice de cobertura para el historial paginado de una cuenta
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transactions_account_history
+            ON transactions (account_id, timestamp, transaction_id, amount, transaction_type, description)
+        ''')
+        
+        self._create_name_index(cursor)
+        self._create_account_changes(cursor)
+        self._create_outflow_aggregate(cursor)
+    
+    def _create_account_changes(self, cursor):
+        """Crear los contadores de cambios de cuentas que mantienen los triggers
+
+        Una sola fila: appended cuenta las altas con un account_id mayor que
+        todos los anteriores (se pueden cargar leyendo account_id > último);
+        changed, los renombres, las bajas y las altas con un account_id
+        intermedio. Así NameResolver solo relee cuentas cuando cambian
+        cuentas, y no con cada transacción o alerta.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS account_changes (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                appended INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0,
+                max_account_id INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO account_changes (id, max_account_id)
+            SELECT 0, COALESCE(MAX(account_id), 0) FROM accounts
+        ''')
+        
+        # Las expresiones de SET ven la fila anterior: max_account_id es el máximo antes del alta
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_account_changes_insert
+            AFTER INSERT ON accounts
+            BEGIN
+                UPDATE account_changes SET
+                    appended = appended + (NEW.account_id > max_account_id),
+                    changed = changed + (NEW.account_id <= max_account_id),
+                    max_account_id = MAX(max_account_id, NEW.account_id);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_account_changes_update
+            AFTER UPDATE OF account_id, user_name ON accounts
+            WHEN OLD.account_id IS NOT NEW.account_id OR OLD.user_name IS NOT NEW.user_name
+            BEGIN
+                UPDATE account_changes SET
+                    changed = changed + 1,
+                    max_account_id = MAX(max_account_id, NEW.account_id);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_account_changes_delete
+            AFTER DELETE ON accounts
+            BEGIN
+                UPDATE account_changes SET changed = changed + 1;
+            END
+        ''')
+    
+    def account_changes(self):
+        """Contadores (appended, changed) de cambios en accounts, uno por shard"""
+        changes = []
+        for pool in self.pools:
+            with pool.read() as conn:
+                changes.append(conn.execute(
+                    'SELECT appended, changed FROM account_changes WHERE id = 0').fetchone())
+        return tuple(changes)
+    
+    def _create_name_index(self, cursor):
+        """Crear el índice de nombres normalizados (sin acentos) de las cuentas
+
+        accounts.name_folded guarda el nombre completo normalizado (indexado
+        para búsquedas por prefijo) y account_name_tokens cada palabra del
+        nombre, para resolver búsquedas por prefijo de palabra con índices en
+        lugar de LIKE '%nombre%'. Las cuentas con name_folded NULL quedan
+        pendientes de indexar.
+        """
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(accounts)")]
+        if 'name_folded' not in columns:
+            cursor.execute("ALTER TABLE accounts ADD COLUMN name_folded TEXT")
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS account_name_tokens (
+                token TEXT NOT NULL,
+                account_id INTEGER NOT NULL,
+                PRIMARY KEY (token, account_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_accounts_name_folded
+            ON accounts (name_folded)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_accounts_name_pending
+            ON accounts (account_id) WHERE name_folded IS NULL
+        ''')
+        
+        # Un cambio de nombre deja la cuenta pendiente de reindexar
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_accounts_name_update
+            AFTER UPDATE OF user_name ON accounts
+            BEGIN
+                UPDATE accounts SET name_folded = NULL WHERE account_id = NEW.account_id;
+                DELETE FROM account_name_tokens WHERE account_id = OLD.account_id;
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_accounts_name_delete
+            AFTER DELETE ON accounts
+            BEGIN
+                DELETE FROM account_name_tokens WHERE account_id = OLD.account_id;
+            END
+        ''')
+        
+        self._index_pending_names(cursor)
+    
+    def _index_pending_names(self, cursor, chunk_size=10000):
+        """Normalizar e indexar los nombres de las cuentas pendientes, por bloques"""
+        indexed = 0
+        while True:
+            pending = cursor.execute('''
+                SELECT account_id, user_name FROM accounts WHERE name_folded IS NULL LIMIT ?
+            ''', (chunk_size,)).fetchall()
+            if not pending:
+                return indexed
+            
+            folded = [(account_id, fold_name(user_name)) for account_id, user_name in pending]
+            cursor.executemany('''
+                UPDATE accounts SET name_folded = ? WHERE account_id = ?
+            ''', [(name, account_id) for account_id, name in folded])
+            cursor.executemany('''
+                INSERT OR IGNORE INTO account_name_tokens (token, account_id) VALUES (?, ?)
+            ''', [(token, account_id) for account_id, name in folded for token in name.split()])
+            indexed += len(pending)
+    
+    def index_account_names(self):
+        """Indexar nombres de cuentas insertadas por fuera de esta clase"""
+        indexed = 0
+        for pool in self.pools:
+            with pool.write() as conn:
+                indexed += self._index_pending_names(conn.cursor())
+        return indexed
+    
+    def _resolve_account_id(self, account_name):
+        """Resolver un nombre a un account_id buscando en todos los shards"""
+        matches = []
+        for pool in self.pools:
+            with pool.read() as conn:
+                account_id = self._find_account_id(conn.cursor(), account_name)
+            if account_id is not None:
+                matches.append(account_id)
+        return min(matches) if matches else None
+    
+    def _find_account_id(self, cursor, account_name, max_candidates=1000):
+        """Resolver un nombre (o parte de él) a un account_id usando los índices
+
+        Busca cuentas cuyo nombre normalizado contenga el texto ("juan",
+        "gonzalez", "perez 12", "maria gonz"); "María" y "Maria" son
+        equivalentes. Gana la de menor account_id, por este orden:
+        1. el nombre exacto, con una búsqueda en idx_accounts_name_folded
+        2. cuentas con la palabra completa del texto que menos cuentas tiene:
+           sus filas en account_name_tokens están ordenadas por account_id,
+           así que la primera que contiene el texto es la buscada ("perez"
+           entre 300.000 cuentas lee una fila)
+        3. cuentas con una palabra que empiece por la palabra mas selectiva
+           del texto ("gonz")
+        En 2 y 3 se revisan como mucho max_candidates cuentas; con más
+        coincidencias por prefijo, gana la menor de las revisadas.
+        """
+        folded = fold_name(account_name)
+        if not folded:
+            return None
+        words = folded.split()
+        
+        # Nombre completo exacto: una búsqueda en el índice de nombres
+        row = cursor.execute('''
+            SELECT account_id FROM accounts WHERE name_folded = ? ORDER BY account_id LIMIT 1
+        ''', (folded,)).fetchone()
+        if row:
+            return row[0]
+        
+        # Palabra completa con menos cuentas (con una sola palabra no hace falta contar)
+        if len(words) == 1:
+            driver = words[0]
+        else:
+            counts = {word: self._count_token(cursor, word, max_candidates) for word in set(words)}
+            driver = min((word for word in counts if counts[word]), key=counts.get, default=None)
+        if driver is not None:
+            cursor.execute('''
+                SELECT a.account_id, a.name_folded
+                FROM account_name_tokens t
+                JOIN accounts a ON a.account_id = t.account_id
+                WHERE t.token = ?
+                ORDER BY t.account_id
+                LIMIT ?
+            ''', (driver, max_candidates))
+            for account_id, name_folded in cursor:
+                if folded in name_folded:
+                    return account_id
+        
+        # Recorrer los candidatos de la palabra mas selectiva como prefijo
+        driver = min(words, key=lambda token: self._count_token_prefix(cursor, token, max_candidates))
+        cursor.execute('''
+            SELECT a.account_id, a.name_folded
+            FROM account_name_tokens t
+            JOIN accounts a ON a.account_id = t.account_id
+            WHERE t.token >= ? AND t.token < ?
+            LIMIT ?
+        ''', (driver, _prefix_upper_bound(driver), max_candidates))
+        matches = [account_id for account_id, name_folded in cursor if folded in name_folded]
+        return min(matches) if matches else None
+    
+    def _count_token(self, cursor, token, cap=1000):
+        """Cuantas cuentas tienen la palabra token (acotado a cap)"""
+        return cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM account_name_tokens WHERE token = ? LIMIT ?
+            )
+        ''', (token, cap)).fetchone()[0]
+    
+    def _count_token_prefix(self, cursor, token, cap=1000):
+        """Cuantas palabras indexadas empiezan por token (acotado a cap)"""
+        return cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM account_name_tokens
+                WHERE token >= ? AND token < ?
+                LIMIT ?
+            )
+        ''', (token, _prefix_upper_bound(token), cap)).fetchone()[0]
+    
+    def _create_outflow_aggregate(self, cursor):
+        """Crear el agregado horario de salidas por cuenta y sus triggers
+
+        Cada bucket acumula SUM(ABS(amount)) de las transacciones negativas
+        cuyo timestamp empieza por el mismo prefijo 'YYYY-MM-DD HH'. Los
+        triggers lo mantienen al insertar, borrar o modificar transacciones.
+        """
+        cursor.execute('''
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'account_outflow_buckets'
+        ''')
+        needs_backfill = cursor.fetchone() is None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS account_outflow_buckets (
+                bucket TEXT NOT NULL,
+                account_id INTEGER NOT NULL,
+                total_outflow REAL NOT NULL,
+                PRIMARY KEY (bucket, account_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_outflow_insert
+            AFTER INSERT ON transactions
+            WHEN NEW.amount < 0 AND NEW.account_id IS NOT NULL AND typeof(NEW.timestamp) = 'text'
+            BEGIN
+                INSERT INTO account_outflow_buckets (bucket, account_id, total_outflow)
+                VALUES (substr(NEW.timestamp, 1, {OUTFLOW_BUCKET_LENGTH}), NEW.account_id, -NEW.amount)
+                ON CONFLICT (bucket, account_id)
+                DO UPDATE SET total_outflow = total_outflow + excluded.total_outflow;
+            END
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_outflow_delete
+            AFTER DELETE ON transactions
+            WHEN OLD.amount < 0 AND OLD.account_id IS NOT NULL AND typeof(OLD.timestamp) = 'text'
+            BEGIN
+                UPDATE account_outflow_buckets
+                SET total_outflow = total_outflow + OLD.amount
+                WHERE bucket = substr(OLD.timestamp, 1, {OUTFLOW_BUCKET_LENGTH})
+                AND account_id = OLD.account_id;
+            END
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_outflow_update
+            AFTER UPDATE OF account_id, amount, timestamp ON transactions
+            BEGIN
+                UPDATE account_outflow_buckets
+                SET total_outflow = total_outflow + OLD.amount
+                WHERE OLD.amount < 0 AND typeof(OLD.timestamp) = 'text'
+                AND bucket = substr(OLD.timestamp, 1, {OUTFLOW_BUCKET_LENGTH})
+                AND account_id = OLD.account_id;
+                
+                INSERT INTO account_outflow_buckets (bucket, account_id, total_outflow)
+                SELECT substr(NEW.timestamp, 1, {OUTFLOW_BUCKET_LENGTH}), NEW.account_id, -NEW.amount
+                WHERE NEW.amount < 0 AND NEW.account_id IS NOT NULL AND typeof(NEW.timestamp) = 'text'
+                ON CONFLICT (bucket, account_id)
+                DO UPDATE SET total_outflow = total_outflow + excluded.total_outflow;
+            END
+        ''')
+        
+        if needs_backfill:
+            self._rebuild_outflow_buckets(cursor)
+    
+    def _rebuild_outflow_buckets(self, cursor):
+        """Recalcular el agregado de salidas desde la tabla de transacciones"""
+        cursor.execute("DELETE FROM account_outflow_buckets")
+        cursor.execute(f'''
+            INSERT INTO account_outflow_buckets (bucket, account_id, total_outflow)
+            SELECT substr(timestamp, 1, {OUTFLOW_BUCKET_LENGTH}), account_id, SUM(-amount)
+            FROM transactions
+            WHERE amount < 0 AND account_id IS NOT NULL AND typeof(timestamp) = 'text'
+            GROUP BY 1, 2
+        ''')
+    
+    @contextmanager
+    def bulk_load(self, table, drop_indexes=False):
+        """Preparar una tabla para una carga masiva
+
+        Elimina los triggers de la tabla para que las inserciones no mantengan
+        fila a fila el agregado de salidas. Las tablas e índices siguen en su
+        sitio, así que la base se puede seguir consultando durante la carga
+        (el agregado y el índice de nombres no incluyen las filas nuevas
+        hasta el final). Al salir se recrean los triggers, se indexan los
+        nombres nuevos y se recalcula el agregado (en accounts, se marca el
+        cambio en account_changes), en una transacción por shard. Si el
+        proceso muere a mitad de carga, el próximo init_database recrea los
+        triggers (el agregado se recalcula con rebuild_outflow_buckets).
+
+        drop_indexes también elimina los índices secundarios de la tabla y se
+        recrean al final: más rápido, pero mientras tanto las consultas
+        recorren tablas completas. Solo para bases que nadie más está usando.
+        """
+        kinds = ('index', 'trigger') if drop_indexes else ('trigger',)
+        for pool in self.pools:
+            with pool.write() as conn:
+                structures = conn.execute(f'''
+                    SELECT type, name FROM sqlite_master
+                    WHERE tbl_name = ? AND type IN ({', '.join('?' for _ in kinds)}) AND sql IS NOT NULL
+                ''', (table, *kinds)).fetchall()
+                for kind, name in structures:
+                    conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+                # Sin fsync por lote, con los ordenamientos de CREATE INDEX en disco y
+                # sin mmap, para que la memoria no crezca con el tamaño de la carga
+                conn.execute("PRAGMA synchronous = OFF")
+                conn.execute("PRAGMA temp_store = FILE")
+                conn.execute("PRAGMA mmap_size = 0")
+        
+        try:
+            yield
+        finally:
+            for pool in self.pools:
+                with pool.write() as conn:
+                    cursor = conn.cursor()
+                    self._create_schema(cursor)
+                    if table == 'transactions':
+                        self._rebuild_outflow_buckets(cursor)
+                    elif table == 'accounts':
+                        # Las altas de la carga no pasaron por los triggers
+                        cursor.execute('''
+                            UPDATE account_changes SET
+                                changed = changed + 1,
+                                max_account_id = (SELECT COALESCE(MAX(account_id), 0) FROM accounts)
+                        ''')
+                with pool.write() as conn:
+                    for pragma in CONNECTION_PRAGMAS:
+                        conn.execute(pragma)
+            self.cache.clear()
+    
+    def rebuild_outflow_buckets(self):
+        """Recalcular el agregado de salidas (p. ej. tras una carga masiva)"""
+        for pool in self.pools:
+            with pool.write() as conn:
+                self._rebuild_outflow_buckets(conn.cursor())
     
     def populate_sample_data(self):
         """Poblar con datos de ejemplo"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Verificar si ya hay datos
-        cursor.execute("SELECT COUNT(*) FROM accounts")
-        if cursor.fetchone()[0] > 0:
-            conn.close()
-            return
+        for pool in self.pools:
+            with pool.read() as conn:
+                if conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] > 0:
+                    return
+        
+        sample_accounts, sample_transactions = self._sample_data()
+        for pool in self.pools:
+            with pool.write() as conn:
+                conn.executemany('''
+                    INSERT INTO accounts (account_id, user_name, balance, account_type, failed_attempts) 
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [account for account in sample_accounts if self.shard_pool(account[0]) is pool])
+                conn.executemany('''
+                    INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp) 
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [transaction for transaction in sample_transactions if self.shard_pool(transaction[0]) is pool])
+                self._index_pending_names(conn.cursor())
         
-        # Crear cuentas de ejemplo
+        print("✅ Base de datos inicializada con datos de ejemplo")
+    
+    def _sample_data(self):
+        """Cuentas y transacciones de ejemplo"""
+        # Crear cuentas de ejemplo (la cuenta 3 simula intentos fallidos de acceso)
         sample_accounts = [
-            ("Juan Pérez", 50.0, "checking"),  # Saldo bajo crítico
-            ("Maria Gonzalez", 15000.0, "savings"),
-            ("Carlos López", 5.0, "checking"),  # Saldo crítico
-            ("Ana Torres", 25000.0, "business")
+            (1, "Juan Pérez", 50.0, "checking", 0),  # Saldo bajo crítico
+            (2, "Maria Gonzalez", 15000.0, "savings", 0),
+            (3, "Carlos López", 5.0, "checking", 5),  # Saldo crítico
+            (4, "Ana Torres", 25000.0, "business", 0)
         ]
         
-        cursor.executemany('''
-            INSERT INTO accounts (user_name, balance, account_type) 
-            VALUES (?, ?, ?)
-        ''', sample_accounts)
-        
         # Crear transacciones de ejemplo (algunas sospechosas)
         base_time = datetime.now() - timedelta(hours=2)
         sample_transactions = []
@@ -92,24 +611,25 @@ class FinancialDatabase:
                 sample_transactions.append((i, -12000.0, "transfer", "Large Transfer", base_time + timedelta(hours=1)))
                 sample_transactions.append((i, -8000.0, "withdrawal", "Large Withdrawal", base_time + timedelta(hours=2)))
         
-        cursor.executemany('''
-            INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp) 
-            VALUES (?, ?, ?, ?, ?)
-        ''', sample_transactions)
-        
-        # Simular intentos fallidos de acceso para cuenta 3
-        cursor.execute('''
-            UPDATE accounts SET failed_attempts = 5 WHERE account_id = 3
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print("✅ Base de datos inicializada con datos de ejemplo")
+        return sample_accounts, sample_transactions
     
     def detect_critical_conditions(self):
-        """Detectar las 3 condiciones críticas requeridas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Detectar las 3 condiciones críticas requeridas (todos los shards en paralelo)"""
+        shard_alerts = self._map_shards(self._detect_shard_conditions)
+        alerts = [alert for alerts in shard_alerts for alert in alerts]
+        alerts.sort(key=lambda alert: (ALERT_TYPE_ORDER[alert["type"]], alert["account_id"]))
+        return alerts
+    
+    def _detect_shard_conditions(self, pool):
+        """Detectar y guardar las alertas de un shard"""
+        with pool.read() as conn:
+            alerts = self._detect_alerts(conn.cursor())
+        
+        self._save_alerts(alerts)
+        return alerts
+    
+    def _detect_alerts(self, cursor):
+        """Evaluar las reglas críticas con una conexión de lectura"""
         alerts = []
         
         # 1. CONDICIÓN CRÍTICA: Saldo bajo (< $100)
@@ -130,17 +650,28 @@ class FinancialDatabase:
                 "data": {"balance": balance}
             }
             alerts.append(alert)
-            self._save_alert(alert)
         
         # 2. CONDICIÓN CRÍTICA: Transacciones sospechosas (> $10,000 en 24h)
+        # Equivale a filtrar transactions por timestamp > datetime('now', '-24 hours'):
+        # los buckets posteriores al del límite entran completos y solo el bucket
+        # del límite se lee de transactions (rango acotado por el índice de timestamp)
+        cutoff = cursor.execute("SELECT datetime('now', '-24 hours')").fetchone()[0]
+        boundary = cutoff[:OUTFLOW_BUCKET_LENGTH]
         cursor.execute('''
-            SELECT account_id, SUM(ABS(amount)) as total_amount
-            FROM transactions 
-            WHERE timestamp > datetime('now', '-24 hours')
-            AND amount < 0
+            SELECT account_id, SUM(amount) as total_amount
+            FROM (
+                SELECT account_id, total_outflow AS amount
+                FROM account_outflow_buckets
+                WHERE bucket > ?
+                UNION ALL
+                SELECT account_id, ABS(amount)
+                FROM transactions
+                WHERE timestamp > ? AND timestamp < ?
+                AND amount < 0 AND account_id IS NOT NULL
+            )
             GROUP BY account_id
             HAVING total_amount > 10000
-        ''')
+        ''', (boundary, cutoff, _prefix_upper_bound(boundary)))
         suspicious_transactions = cursor.fetchall()
         
         for account_id, total_amount in suspicious_transactions:
@@ -156,7 +687,6 @@ class FinancialDatabase:
                 "data": {"total_amount": total_amount}
             }
             alerts.append(alert)
-            self._save_alert(alert)
         
         # 3. CONDICIÓN CRÍTICA: Múltiples intentos fallidos (>= 3)
         cursor.execute('''
@@ -176,38 +706,76 @@ class FinancialDatabase:
                 "data": {"failed_attempts": attempts}
             }
             alerts.append(alert)
-            self._save_alert(alert)
         
-        conn.close()
         return alerts
     
     def _save_alert(self, alert):
         """Guardar alerta en la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO critical_alerts (account_id, alert_type, message, severity)
-            VALUES (?, ?, ?, ?)
-        ''', (alert["account_id"], alert["type"], alert["message"], alert["severity"]))
-        
-        conn.commit()
-        conn.close()
+        self._save_alerts([alert])
     
-    def get_account_balance(self, account_name):
-        """Consulta de saldo por nombre"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+    def _save_alerts(self, alerts):
+        """Guardar alertas en una sola transacción
+
+        Si ya existe una alerta abierta para la misma cuenta y tipo se
+        actualiza (mensaje, severidad y timestamp) en lugar de duplicarla.
+        Si no cambió, no se escribe nada: una detección repetida no altera
+        data_version ni invalida las caches de lectura.
+        """
+        for pool in self.pools:
+            rows = [(alert["account_id"], alert["type"], alert["message"], alert["severity"])
+                    for alert in alerts if self.shard_pool(alert["account_id"]) is pool]
+            if not rows:
+                continue
+            
+            with pool.write() as conn:
+                conn.executemany('''
+                    INSERT INTO critical_alerts (account_id, alert_type, message, severity)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (account_id, alert_type) WHERE resolved = FALSE
+                    DO UPDATE SET message = excluded.message,
+                                  severity = excluded.severity,
+                                  timestamp = CURRENT_TIMESTAMP
+                    WHERE message IS NOT excluded.message
+                       OR severity IS NOT excluded.severity
+                ''', rows)
+    
+    def _cached(self, key, compute):
+        """Devolver compute() desde la cache si los datos no cambiaron desde que se guardó"""
+        version = self.data_version()
+        found, value = self.cache.get(key, version)
+        if not found:
+            value = compute()
+            self.cache.put(key, version, value)
+        return value
+    
+    def cache_stats(self):
+        """Métricas de la cache de lecturas (hits, misses, hit_rate...)"""
+        return self.cache.stats()
+    
+    def get_account_balance(self, account_name=None, account_id=None):
+        """Consulta de saldo por nombre o, si se conoce, por account_id"""
+        if account_id is None:
+            key = ('balance', fold_name(account_name))
+        else:
+            key = ('balance', 'id', account_id)
+        return self._cached(key, lambda: self._read_account_balance(account_name, account_id))
+    
+    def _read_account_balance(self, account_name, account_id):
+        if account_id is None:
+            account_id = self._resolve_account_id(account_name)
+        if account_id is None:
+            return self._format_balance(None)
+        with self.shard_pool(account_id).read() as conn:
+            return self._format_balance(self._select_balance(conn.cursor(), account_id))
+    
+    def _select_balance(self, cursor, account_id):
+        return cursor.execute('''
             SELECT balance, account_type 
             FROM accounts 
-            WHERE LOWER(user_name) LIKE LOWER(?)
-        ''', (f'%{account_name}%',))
-        
-        result = cursor.fetchone()
-        conn.close()
-        
+            WHERE account_id = ?
+        ''', (account_id,)).fetchone()
+    
+    def _format_balance(self, result):
         if result:
             balance, account_type = result
             return f"Saldo actual: ${balance:.2f} (Cuenta {account_type})"
@@ -216,43 +784,116 @@ class FinancialDatabase:
     
     def get_recent_transactions(self, account_name, limit=5):
         """Obtener transacciones recientes"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        page = self.get_transactions_page(account_name, limit)
+        return self.format_transactions(page["transactions"])
+    
+    def get_account_summary(self, account_name=None, limit=3, account_id=None):
+        """Saldo y últimas transacciones de una cuenta con una sola resolución del nombre
+
+        Devuelve (texto_saldo, texto_transacciones).
+        """
+        if account_id is None:
+            key = ('summary', fold_name(account_name), limit)
+        else:
+            key = ('summary', 'id', account_id, limit)
+        return self._cached(key, lambda: self._read_account_summary(account_name, limit, account_id))
+    
+    def _read_account_summary(self, account_name, limit, account_id):
+        if account_id is None:
+            account_id = self._resolve_account_id(account_name)
+        if account_id is None:
+            return self._format_balance(None), self.format_transactions([])
+        with self.shard_pool(account_id).read() as conn:
+            cursor = conn.cursor()
+            balance = self._select_balance(cursor, account_id)
+            page = self._select_transactions_page(cursor, account_id, limit, None)
+        return self._format_balance(balance), self.format_transactions(page["transactions"])
+    
+    def get_transactions_page(self, account_name=None, limit=5, before=None, account_id=None):
+        """Obtener una página del historial de una cuenta, de la mas reciente a la mas antigua
+
+        Paginación por keyset: before es el next_cursor de la página anterior
+        (timestamp, transaction_id) y la consulta continúa justo después de él
+        en el índice de cobertura, sin OFFSET. Devuelve un dict con
+        account_id, transactions (lista de dicts) y next_cursor (None si no
+        hay más transacciones). El resultado se comparte con la cache: no
+        debe modificarse.
+        """
+        if account_id is None:
+            key = ('page', 'name', fold_name(account_name), limit, before)
+        else:
+            key = ('page', 'id', account_id, limit, before)
+        return self._cached(key, lambda: self._read_transactions_page(account_name, limit, before, account_id))
+    
+    def _read_transactions_page(self, account_name, limit, before, account_id):
+        if account_id is None:
+            account_id = self._resolve_account_id(account_name)
+        if account_id is None:
+            return {"account_id": None, "transactions": [], "next_cursor": None}
+        with self.shard_pool(account_id).read() as conn:
+            return self._select_transactions_page(conn.cursor(), account_id, limit, before)
+    
+    def _select_transactions_page(self, cursor, account_id, limit, before):
+        if before is None:
+            cursor.execute('''
+                SELECT transaction_id, amount, transaction_type, description, timestamp
+                FROM transactions
+                WHERE account_id = ?
+                ORDER BY timestamp DESC, transaction_id DESC
+                LIMIT ?
+            ''', (account_id, limit + 1))
+        else:
+            cursor.execute('''
+                SELECT transaction_id, amount, transaction_type, description, timestamp
+                FROM transactions
+                WHERE account_id = ? AND (timestamp, transaction_id) < (?, ?)
+                ORDER BY timestamp DESC, transaction_id DESC
+                LIMIT ?
+            ''', (account_id, before[0], before[1], limit + 1))
+        rows = cursor.fetchall()
         
-        cursor.execute('''
-            SELECT t.amount, t.transaction_type, t.description, t.timestamp
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.account_id
-            WHERE LOWER(a.user_name) LIKE LOWER(?)
-            ORDER BY t.timestamp DESC
-            LIMIT ?
-        ''', (f'%{account_name}%', limit))
+        transactions = [
+            {
+                "transaction_id": transaction_id,
+                "amount": amount,
+                "transaction_type": transaction_type,
+                "description": description,
+                "timestamp": timestamp
+            }
+            for transaction_id, amount, transaction_type, description, timestamp in rows[:limit]
+        ]
         
-        transactions = cursor.fetchall()
-        conn.close()
+        next_cursor = None
+        if len(rows) > limit:
+            last = transactions[-1]
+            next_cursor = (last["timestamp"], last["transaction_id"])
         
+        return {"account_id": account_id, "transactions": transactions, "next_cursor": next_cursor}
+    
+    def format_transactions(self, transactions):
+        """Formatear una lista de transacciones para el chat"""
         if transactions:
             result = "Transacciones recientes:\n"
-            for amount, trans_type, description, timestamp in transactions:
-                result += f"• ${amount:.2f} - {description} ({timestamp})\n"
+            for transaction in transactions:
+                result += f"• ${transaction['amount']:.2f} - {transaction['description']} ({transaction['timestamp']})\n"
             return result
         else:
             return "No se encontraron transacciones"
     
     def get_all_alerts(self):
         """Obtener todas las alertas críticas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT alert_type, message, severity, timestamp
-            FROM critical_alerts
-            WHERE resolved = FALSE
-            ORDER BY severity DESC, timestamp DESC
-        ''')
-        
-        alerts = cursor.fetchall()
-        conn.close()
+        alerts = []
+        for pool in self.pools:
+            with pool.read() as conn:
+                alerts.extend(conn.execute('''
+                    SELECT alert_type, message, severity, timestamp
+                    FROM critical_alerts
+                    WHERE resolved = FALSE
+                    ORDER BY severity DESC, timestamp DESC
+                ''').fetchall())
+        if len(self.pools) > 1:
+            alerts.sort(key=lambda alert: alert[3], reverse=True)
+            alerts.sort(key=lambda alert: alert[2], reverse=True)
         
         if alerts:
             result = " ALERTAS CRÍTICAS ACTIVAS:\n"
@@ -261,6 +902,26 @@ class FinancialDatabase:
             return result
         else:
             return "✅ No hay alertas críticas activas"
+    
+    def interrupt(self, thread_id):
+        """Interrumpir las consultas en curso del hilo indicado en todos los shards
+
+        Si el hilo espera una llamada repartida entre shards (_map_shards),
+        se interrumpen también las consultas de esos hilos.
+        """
+        for pool in self.pools:
+            pool.interrupt(thread_id)
+        with self._shard_calls_lock:
+            call = self._shard_calls.get(thread_id)
+        if call is not None:
+            call.interrupt(self.pools)
+    
+    def close(self):
+        """Cerrar las conexiones de todos los shards"""
+        if self._shard_executor is not None:
+            self._shard_executor.shutdown(wait=False)
+        for pool in self.pools:
+            pool.close()
 
 # Función de prueba
 if __name__ == "__main__":
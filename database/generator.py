@@ -0,0 +1,181 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+from database.importer import import_rows
+
+# Escalas predefinidas: (cuentas, transacciones)
+SCALES = {
+    '10k': (1000, 10000),
+    '1m': (50000, 1000000),
+    '10m': (500000, 10000000),
+}
+
+FIRST_NAMES = ["Juan", "María", "Carlos", "Ana", "José", "Lucía", "Pedro", "Sofía", "Miguel",
+               "Valentina", "Andrés", "Camila", "Jorge", "Isabel", "Raúl", "Elena", "Diego",
+               "Paula", "Fernando", "Gabriela", "Luis", "Daniela", "Ricardo", "Natalia"]
+LAST_NAMES = ["Pérez", "González", "López", "Torres", "Rodríguez", "Martínez", "Sánchez",
+              "Ramírez", "Flores", "Gómez", "Díaz", "Vargas", "Castro", "Núñez", "Rojas",
+              "Morales", "Herrera", "Medina", "Aguilar", "Ortiz", "Silva", "Mendoza"]
+ACCOUNT_TYPES = [("checking", 0.6), ("savings", 0.3), ("business", 0.1)]
+
+# (tipo, descripción, peso) de las salidas normales
+OUTFLOW_TYPES = [("withdrawal", "ATM Withdrawal", 0.35), ("payment", "Card Payment", 0.45),
+                 ("transfer", "Transfer", 0.2)]
+
+def weighted_choice(rnd, choices):
+    """Elegir un elemento de [(valor, ..., peso)] según los pesos"""
+    return rnd.choices(choices, weights=[choice[-1] for choice in choices])[0]
+
+class DatasetConfig:
+    """Parámetros del conjunto de datos sintético"""
+
+    def __init__(self, accounts, transactions, seed=42, anchor=None, days=90,
+                 low_balance_fraction=0.02, suspicious_fraction=0.01, failed_login_fraction=0.01,
+                 deposit_fraction=0.25, amount_median=60.0, amount_sigma=1.2, activity_skew=1.5):
+        self.accounts = accounts
+        self.transactions = transactions
+        self.seed = seed
+        # Instante de referencia (UTC, como datetime('now') de SQLite); fijarlo hace la salida reproducible
+        self.anchor = anchor or datetime.utcnow().replace(microsecond=0)
+        self.days = days
+        self.low_balance_fraction = low_balance_fraction
+        self.suspicious_fraction = suspicious_fraction
+        self.failed_login_fraction = failed_login_fraction
+        self.deposit_fraction = deposit_fraction
+        self.amount_median = amount_median
+        self.amount_sigma = amount_sigma
+        # > 1 concentra la actividad en pocas cuentas; 1 la reparte de forma uniforme
+        self.activity_skew = activity_skew
+
+def generate_accounts(config):
+    """Cuentas sintéticas: saldo log-normal, una fracción con saldo bajo o intentos fallidos"""
+    rnd = random.Random(f"{config.seed}-accounts")
+    for account_id in range(1, config.accounts + 1):
+        name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        account_type = weighted_choice(rnd, ACCOUNT_TYPES)[0]
+
+        if rnd.random() < config.low_balance_fraction:
+            balance = round(rnd.uniform(0, 99.99), 2)
+        else:
+            balance = round(100 + rnd.lognormvariate(math.log(3000), 1.0), 2)
+
+        if rnd.random() < config.failed_login_fraction:
+            failed_attempts = rnd.randint(3, 8)
+        else:
+            failed_attempts = rnd.choices([0, 1, 2], weights=[0.9, 0.08, 0.02])[0]
+
+        yield (account_id, name, balance, account_type, failed_attempts)
+
+def suspicious_accounts(config):
+    """Cuentas que tendrán una ráfaga de salidas > $10,000 en las últimas 24h"""
+    rnd = random.Random(f"{config.seed}-suspicious")
+    count = int(config.accounts * config.suspicious_fraction)
+    return sorted(rnd.sample(range(1, config.accounts + 1), count))
+
+def generate_transactions(config, burst_accounts):
+    """Transacciones sintéticas: ráfagas sospechosas y luego historial normal
+
+    Las ráfagas (3 a 6 salidas grandes en las últimas 12h) cuentan dentro
+    del total de transacciones. Se generan en streaming, sin listas en memoria.
+    """
+    rnd = random.Random(f"{config.seed}-transactions")
+    generated = 0
+
+    for account_id in burst_accounts:
+        if generated >= config.transactions:
+            return
+        parts = rnd.randint(3, 6)
+        total = rnd.uniform(10500, 40000)
+        for _ in range(parts):
+            if generated >= config.transactions:
+                return
+            timestamp = config.anchor - timedelta(seconds=rnd.uniform(0, 12 * 3600))
+            yield (None, account_id, -round(total / parts, 2), "transfer", "Large Transfer",
+                   timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+            generated += 1
+
+    span = config.days * 86400
+    log_median = math.log(config.amount_median)
+    while generated < config.transactions:
+        # Actividad sesgada: pocas cuentas concentran la mayoría de movimientos
+        account_id = int(config.accounts * rnd.random() ** config.activity_skew) + 1
+        amount = round(rnd.lognormvariate(log_median, config.amount_sigma), 2)
+        if rnd.random() < config.deposit_fraction:
+            transaction_type, description = "deposit", "Deposit"
+        else:
+            transaction_type, description = weighted_choice(rnd, OUTFLOW_TYPES)[:2]
+            amount = -amount
+        timestamp = config.anchor - timedelta(seconds=rnd.uniform(0, span))
+        yield (None, account_id, amount, transaction_type, description,
+               timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+        generated += 1
+
+def generate_database(db, config):
+    """Poblar una base vacía con el conjunto sintético. Devuelve (cuentas, transacciones, segundos)"""
+    start = time.perf_counter()
+    # Base nueva que nadie más usa: se cargan sin índices
+    accounts, _ = import_rows(db, 'accounts', generate_accounts(config), offline=True)
+    transactions, _ = import_rows(db, 'transactions',
+                                  generate_transactions(config, suspicious_accounts(config)), offline=True)
+    return accounts, transactions, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar una base financiera sintética reproducible")
+    parser.add_argument('--db', default='synthetic_financial.db', help="Ruta de la base a crear")
+    parser.add_argument('--scale', choices=sorted(SCALES), help="Escala predefinida (cuentas, transacciones)")
+    parser.add_argument('--accounts', type=int, help="Número de cuentas")
+    parser.add_argument('--transactions', type=int, help="Número de transacciones")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', help="Instante de referencia UTC 'YYYY-MM-DD HH:MM:SS' (por defecto ahora)")
+    parser.add_argument('--days', type=int, default=90, help="Días de historial")
+    parser.add_argument('--low-balance-fraction', type=float, default=0.02)
+    parser.add_argument('--suspicious-fraction', type=float, default=0.01)
+    parser.add_argument('--failed-login-fraction', type=float, default=0.01)
+    parser.add_argument('--deposit-fraction', type=float, default=0.25)
+    parser.add_argument('--amount-median', type=float, default=60.0, help="Mediana del importe (log-normal)")
+    parser.add_argument('--amount-sigma', type=float, default=1.2, help="Dispersión del importe (log-normal)")
+    parser.add_argument('--activity-skew', type=float, default=1.5)
+    parser.add_argument('--shards', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    accounts, transactions = SCALES.get(args.scale, (1000, 10000))
+    config = DatasetConfig(
+        args.accounts or accounts,
+        args.transactions or transactions,
+        seed=args.seed,
+        anchor=datetime.strptime(args.anchor, '%Y-%m-%d %H:%M:%S') if args.anchor else None,
+        days=args.days,
+        low_balance_fraction=args.low_balance_fraction,
+        suspicious_fraction=args.suspicious_fraction,
+        failed_login_fraction=args.failed_login_fraction,
+        deposit_fraction=args.deposit_fraction,
+        amount_median=args.amount_median,
+        amount_sigma=args.amount_sigma,
+        activity_skew=args.activity_skew
+    )
+
+    db = FinancialDatabase(args.db, sample_data=False, shards=args.shards)
+    try:
+        for pool in db.pools:
+            with pool.read() as conn:
+                if conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] > 0:
+                    print(f"❌ {args.db} ya contiene cuentas; usa una ruta nueva")
+                    return 1
+
+        print(f"🔧 Generando {config.accounts:,} cuentas y {config.transactions:,} transacciones "
+              f"(semilla {config.seed}, referencia {config.anchor})")
+        accounts, transactions, elapsed = generate_database(db, config)
+        print(f"✅ Base sintética creada en {elapsed:.1f}s: {accounts:,} cuentas, {transactions:,} transacciones")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+
+# Columnas aceptadas por tabla: (nombre, conversión, obligatoria)
+TABLE_COLUMNS = {
+    'accounts': [
+        ('account_id', int, False),
+        ('user_name', str, True),
+        ('balance', float, True),
+        ('account_type', str, True),
+        ('failed_attempts', int, False),
+    ],
+    'transactions': [
+        ('transaction_id', int, False),
+        ('account_id', int, True),
+        ('amount', float, True),
+        ('transaction_type', str, True),
+        ('description', str, False),
+        ('timestamp', str, False),
+    ],
+}
+
+def read_records(stream, file_format):
+    """Leer registros (dicts) de un CSV con cabecera o de JSON Lines, uno a uno"""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def to_rows(records, table, shards=1):
+    """Convertir registros en tuplas con las columnas de la tabla
+
+    Con varios shards account_id es obligatorio, porque decide el shard.
+    """
+    columns = TABLE_COLUMNS[table]
+    for line_number, record in enumerate(records, start=1):
+        row = []
+        for name, convert, required in columns:
+            value = record.get(name)
+            if value is None or value == '':
+                if required or (name == 'account_id' and shards > 1):
+                    raise ValueError(f"Registro {line_number}: falta la columna obligatoria '{name}'")
+                if name == 'timestamp':
+                    # Mismo formato que CURRENT_TIMESTAMP
+                    value = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                elif name == 'failed_attempts':
+                    value = 0
+                else:
+                    value = None
+            else:
+                value = convert(value)
+            row.append(value)
+        yield tuple(row)
+
+def import_rows(db, table, rows, batch_size=50000, report_every=1000000, offline=False):
+    """Insertar filas en lotes con executemany, una transacción por lote
+
+    Los triggers de la tabla se eliminan durante la carga y al final se
+    recrean y se recalcula el agregado de salidas (ver bulk_load); con
+    offline también los índices, solo si nadie más usa la base. Solo hay un
+    lote en memoria a la vez. Con varios shards cada lote se reparte por
+    account_id.
+    Devuelve (filas, segundos).
+    """
+    columns = [name for name, _, _ in TABLE_COLUMNS[table]]
+    account_column = columns.index('account_id')
+    insert_sql = f'''
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join('?' for _ in columns)})
+    '''
+
+    total = 0
+    next_report = report_every
+    start = time.perf_counter()
+    with db.bulk_load(table, drop_indexes=offline):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            for pool in db.pools:
+                shard_batch = batch
+                if len(db.pools) > 1:
+                    shard_batch = [row for row in batch if db.shard_pool(row[account_column]) is pool]
+                with pool.write() as conn:
+                    conn.executemany(insert_sql, shard_batch)
+            total += len(batch)
+
+            if total >= next_report:
+                elapsed = time.perf_counter() - start
+                print(f"   {total:,} filas ({total / elapsed:,.0f} filas/s)")
+                next_report += report_every
+
+        load_time = time.perf_counter() - start
+        print(f" Carga de {total:,} filas en {load_time:.1f}s, reconstruyendo índices...")
+
+    return total, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importar cuentas o transacciones a la base financiera")
+    parser.add_argument('table', choices=sorted(TABLE_COLUMNS), help="Tabla destino")
+    parser.add_argument('source', help="Archivo CSV/JSONL o '-' para leer de stdin")
+    parser.add_argument('--db', default='financial.db', help="Ruta de la base de datos")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="Formato de entrada (por defecto según la extensión; csv para stdin)")
+    parser.add_argument('--batch-size', type=int, default=50000, help="Filas por transacción")
+    parser.add_argument('--shards', type=int, default=1, help="Número de shards de la base de datos")
+    parser.add_argument('--offline', action='store_true',
+                        help="Eliminar también los índices durante la carga (más rápido; solo si "
+                             "ninguna aplicación está usando la base)")
+    args = parser.parse_args(argv)
+
+    file_format = args.format
+    if file_format is None:
+        file_format = 'jsonl' if args.source.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+    db = FinancialDatabase(args.db, sample_data=False, shards=args.shards)
+    print(f" Importando {args.table} desde {'stdin' if args.source == '-' else args.source} ({file_format})")
+
+    if args.source == '-':
+        stream = sys.stdin
+    else:
+        stream = open(args.source, 'r', encoding='utf-8', newline='')
+    try:
+        rows = to_rows(read_records(stream, file_format), args.table, args.shards)
+        total, elapsed = import_rows(db, args.table, rows, args.batch_size, offline=args.offline)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        db.close()
+
+    print(f"✅ {total:,} filas importadas en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} filas/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import re
+import threading
+
+from database.financial_db import fold_name
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Palabras que no identifican a nadie aunque aparezcan en un nombre ("María de la Cruz")
+STOPWORDS = {'de', 'del', 'la', 'las', 'el', 'los', 'y', 'e', 'da', 'do', 'dos', 'van', 'von', 'mi', 'mis'}
+
+
+class _NameIndex:
+    """Índice de nombres de una carga: se completa con altas y se reemplaza entero"""
+
+    def __init__(self, shards):
+        self.tokens = {}  # token -> set(account_id)
+        self.first = {}  # token -> menor account_id con ese token
+        self.names = {}  # account_id -> tokens del nombre
+        self.shard_state = [None] * shards  # (appended, changed, último account_id) por shard
+
+    def add(self, account_id, user_name):
+        tokens = tuple(TOKEN_PATTERN.findall(fold_name(user_name)))
+        self.names[account_id] = tokens
+        for token in tokens:
+            self.tokens.setdefault(token, set()).add(account_id)
+            if account_id < self.first.get(token, account_id + 1):
+                self.first[token] = account_id
+
+    def load_shard(self, shard, pool, changes, last_id=0):
+        """Añadir las cuentas del shard con account_id > last_id
+
+        Los contadores se leen antes que las filas: lo cargado es al menos
+        tan reciente como ellos y una alta posterior se recoge en la
+        siguiente sincronización.
+        """
+        with pool.read() as conn:
+            for account_id, user_name in conn.execute(
+                    'SELECT account_id, user_name FROM accounts WHERE account_id > ? ORDER BY account_id',
+                    (last_id,)):
+                self.add(account_id, user_name)
+                last_id = account_id
+        self.shard_state[shard] = (*changes, last_id)
+
+
+class NameResolver:
+    """Índice en memoria de los titulares de cuenta: token normalizado -> account_ids
+
+    Los nombres se normalizan con fold_name ("María" y "Maria" son el mismo
+    token). find() recorre una frase una vez y devuelve la cuenta cuyo
+    nombre cubre la secuencia más larga de palabras consecutivas; con varias
+    candidatas, la de menor account_id (como _find_account_id).
+
+    El índice sigue los contadores de account_changes, que solo mueven los
+    cambios en accounts: las altas con account_id nuevo se añaden sin releer
+    la tabla; los renombres y bajas reconstruyen el índice en un hilo aparte
+    mientras find() sigue respondiendo con el anterior, y al terminar se
+    sustituye de una vez. generation cambia con cada actualización.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.generation = 0
+        self._index = None
+        self._version = None
+        self._rebuilding = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Sincronizar el índice con la base de datos si cambiaron las cuentas
+
+        Devuelve generation. Solo la primera carga bloquea; las
+        reconstrucciones completas se hacen en segundo plano.
+        """
+        with self._lock:
+            version = self.db.data_version()
+            if version == self._version:
+                return self.generation
+            changes = self.db.account_changes()
+            if self._index is None:
+                self._index = self._build(changes)
+                self.generation += 1
+            elif self._rebuilding is None:
+                self._update(changes)
+            self._version = version
+            return self.generation
+
+    def _update(self, changes):
+        index = self._index
+        for shard, (pool, shard_changes) in enumerate(zip(self.db.pools, changes)):
+            appended, changed, last_id = index.shard_state[shard]
+            if shard_changes[1] != changed:
+                # Renombres o bajas: el índice se reconstruye sin bloquear find()
+                self._rebuilding = threading.Thread(target=self._rebuild, name="name-resolver", daemon=True)
+                self._rebuilding.start()
+                return
+            if shard_changes[0] != appended:
+                index.load_shard(shard, pool, shard_changes, last_id)
+                self.generation += 1
+
+    def _build(self, changes):
+        index = _NameIndex(len(self.db.pools))
+        for shard, (pool, shard_changes) in enumerate(zip(self.db.pools, changes)):
+            index.load_shard(shard, pool, shard_changes)
+        return index
+
+    def _rebuild(self):
+        index = None
+        try:
+            index = self._build(self.db.account_changes())
+        except Exception as e:
+            print(f"⚠️ Error reconstruyendo el índice de nombres: {e}")
+        finally:
+            with self._lock:
+                if index is not None:
+                    self._index = index
+                    self.generation += 1
+                # Revisar en la próxima consulta los cambios llegados durante la carga
+                self._version = None
+                self._rebuilding = None
+
+    def wait(self, timeout=None):
+        """Esperar a que termine la reconstrucción en segundo plano, si hay una"""
+        thread = self._rebuilding
+        if thread is not None:
+            thread.join(timeout)
+
+    def find(self, text):
+        """Buscar un titular en cualquier parte de la frase
+
+        Devuelve (account_id, palabras del nombre encontradas) o None.
+        """
+        self.refresh()
+        tokens = TOKEN_PATTERN.findall(fold_name(text))
+        with self._lock:
+            return self._find_tokens(self._index, tokens)
+
+    def _find_tokens(self, index, tokens):
+        first = index.first
+        postings = index.tokens
+        best_ids, best_span = None, None
+        start = 0
+        while start < len(tokens):
+            if tokens[start] not in postings or tokens[start] in STOPWORDS:
+                start += 1
+                continue
+            end = start + 1
+            while end < len(tokens) and tokens[end] in postings:
+                end += 1
+            ids, end = self._narrow(postings, tokens, start, end)
+            if best_span is None or end - start > best_span[1] - best_span[0]:
+                best_ids, best_span = ids, (start, end)
+            start = end
+        if best_span is None:
+            return None
+        if best_ids is None:
+            account_id = first[tokens[best_span[0]]]
+        else:
+            account_id = min(best_ids)
+        return account_id, ' '.join(tokens[best_span[0]:best_span[1]])
+
+    def _narrow(self, index, tokens, start, end):
+        """Cuentas que contienen tokens[start:end], acortando la secuencia si no hay ninguna
+
+        Devuelve (ids, end); ids es None si la secuencia es de una sola palabra
+        (el menor id se toma de first sin recorrer el conjunto).
+        """
+        if end - start == 1:
+            return None, end
+        # Caso habitual: todas las palabras son del mismo titular; los conjuntos pequeños primero
+        postings = sorted((index[token] for token in tokens[start:end]), key=len)
+        ids = postings[0].intersection(*postings[1:])
+        if ids:
+            return ids, end
+        ids = index[tokens[start]]
+        for stop in range(start + 1, end):
+            narrowed = ids & index[tokens[stop]]
+            if not narrowed:
+                return (None if stop == start + 1 else ids), stop
+            ids = narrowed
+        return ids, end
+
+    def resolve(self, account_name):
+        """account_id de un nombre dado (por ejemplo el user_name de la interfaz) o None"""
+        found = self.find(account_name)
+        return found[0] if found else None
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {'accounts': 0, 'tokens': 0, 'generation': self.generation}
+        return {'accounts': len(index.names), 'tokens': len(index.tokens), 'generation': self.generation}
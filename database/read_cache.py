@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+class ReadCache:
+    """Cache LRU de lecturas invalidada por versión de datos
+
+    Cada consulta a la cache recibe la versión actual de la base de datos
+    (PRAGMA data_version); si cambió desde que se llenó, se vacía entera.
+    La versión debe obtenerse ANTES de ejecutar la consulta que se guarda,
+    para no asociar datos viejos a una versión nueva.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """Devolver (True, valor) si hay una entrada vigente o (False, None)"""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        """Guardar un valor leído con la versión indicada"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Métricas de uso de la cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+                'invalidations': self.invalidations
+            }
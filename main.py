@@ -97,8 +97,13 @@ class P2PChatBot:
     
     def get_network_status(self):
         """Obtener estado de la red P2P"""
-        peers = self.p2p_node.get_connected_peers()
-        return f" Red P2P: {len(peers)} nodos conectados: {peers}"
+        peers = self.p2p_node.get_connected_peers(detailed=True)
+        details = [
+            f"{peer['peer_id']} ({'activo' if peer['alive'] else 'sin respuesta'}"
+            + (f", RTT {peer['rtt_ms']} ms)" if peer['rtt_ms'] is not None else ")")
+            for peer in peers
+        ]
+        return f" Red P2P: {len(peers)} nodos conectados: {', '.join(details)}"
 
 async def main():
     """Función principal del chatbot P2P"""
@@ -1,47 +1,392 @@
+import os
+import queue
 import random
 import json
-import torch
-from nlp_pipeline.model import NeuralNetwork
-from nlp_pipeline.nltk_lib import bag_of_words, tokenizer
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Rutas relativas al paquete, no al directorio de trabajo
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INTENTS_FILE = os.path.join(BASE_DIR, 'training_data', 'intents.json')
+MODEL_FILE = os.path.join(BASE_DIR, 'data.pth')
+NUMPY_MODEL_FILE = os.path.join(BASE_DIR, 'data.npz')  # export_model.py
 
-with open('./nlp_pipeline/training_data/intents.json', 'r', encoding='utf-8') as json_data:
-    intents = json.load(json_data)
+CONFIDENCE_THRESHOLD = 0.80
+# Precisión mínima sobre los patterns de intents.json para aceptar un modelo recargado
+RELOAD_MIN_ACCURACY = 0.90
+FALLBACK_RESPONSE = "I don't understand what are you saying? Maybe i'm still a dumb :("
 
-FILE = "./nlp_pipeline/data.pth"
-data = torch.load(FILE)
 
-input_size = data["input_size"]
-hidden_size = data["hidden_size"]
-num_classes = data["num_classes"]
-all_words = data['all_words']
-tags = data['tags']
-model_state = data["model_state"]
+class TorchNetwork:
+    """NeuralNetwork de torch con la misma interfaz que NumpyNeuralNetwork"""
 
-model = NeuralNetwork(input_size, hidden_size, num_classes).to(device)
-model.load_state_dict(model_state)
-model.eval()
+    def __init__(self, torch, model, device):
+        self.torch = torch
+        self.model = model
+        self.device = device
+        self.input_size = model.layer1.in_features
+        self.num_classes = model.layer3.out_features
+
+    def predict_proba(self, data):
+        data = self.torch.from_numpy(data).to(self.device)
+        with self.torch.no_grad():
+            return self.torch.softmax(self.model(data), dim=1).cpu().numpy()
+
+    def predict_proba_sparse(self, indices, offsets):
+        indices = self.torch.from_numpy(indices).to(self.device)
+        offsets = self.torch.from_numpy(offsets).to(self.device)
+        with self.torch.no_grad():
+            return self.torch.softmax(self.model.forward_sparse(indices, offsets), dim=1).cpu().numpy()
+
+
+class IntentModel:
+    """Clasificador de intents ya cargado; no cambia tras construirse"""
+
+    def __init__(self, network, featurizer, tags, responses, backend):
+        self.network = network  # TorchNetwork o NumpyNeuralNetwork
+        self.backend = backend
+        self.featurizer = featurizer
+        self.tags = tags
+        self.responses = responses  # tag -> lista de respuestas
+
+    def classify_batch(self, texts):
+        """Clasificar varias frases con una sola pasada del modelo
+
+        Devuelve una lista de (tag, probabilidad) en el mismo orden.
+        """
+        from nlp_pipeline.nltk_lib import tokenizer
+
+        if not texts:
+            return []
+        # Solo las columnas activas: el coste no crece con el vocabulario
+        indices, offsets = self.featurizer.sparse_batch([tokenizer(text) for text in texts])
+        probs = self.network.predict_proba_sparse(indices, offsets)
+        predicted = probs.argmax(axis=1)
+        best = probs[range(len(texts)), predicted]
+        return [(self.tags[index], prob) for index, prob in zip(predicted.tolist(), best.tolist())]
+
+    def predict(self, inp):
+        """Devolver (tag, probabilidad) para una frase"""
+        return self.classify_batch([inp])[0]
+
+    def response_for(self, tag, prob):
+        if prob > CONFIDENCE_THRESHOLD and self.responses.get(tag):
+            return random.choice(self.responses[tag])
+        return FALLBACK_RESPONSE
+
+    def respond(self, inp):
+        return self.response_for(*self.predict(inp))
+
+    def respond_batch(self, texts):
+        return [self.response_for(tag, prob) for tag, prob in self.classify_batch(texts)]
+
+
+class IntentModelLoader:
+    """Carga perezosa del modelo y de los intents, con recarga en caliente
+
+    Importar este módulo no importa torch ni lee archivos: la carga ocurre
+    en el primer get() (o en warm_up(), en segundo plano) y se hace una sola
+    vez aunque varios hilos la pidan a la vez. Si existe el modelo exportado
+    a NumPy y corresponde al data.pth actual, se sirve sin importar torch.
+
+    reload() construye un IntentModel nuevo fuera del lock, lo valida y lo
+    sustituye de una vez; cada intercambio incrementa version. Un IntentModel
+    no cambia tras construirse, así que quien ya obtuvo el anterior con get()
+    termina con él. Si la validación falla se sigue sirviendo el modelo
+    actual y el motivo queda en last_error. watch() recarga al cambiar la
+    fecha de modificación de data.pth, data.npz o intents.json.
+    """
+
+    def __init__(self, model_file=MODEL_FILE, intents_file=INTENTS_FILE, numpy_model_file=NUMPY_MODEL_FILE):
+        self.model_file = model_file
+        self.numpy_model_file = numpy_model_file
+        self.intents_file = intents_file
+        self.load_time = None
+        self.version = 0  # incrementa con cada modelo servido
+        self.last_error = None
+        self.reloads = 0
+        self._model = None
+        self._mtimes = None  # fechas de los archivos del modelo servido
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # una recarga a la vez
+        self._watcher = None
+        self._stop_watch = threading.Event()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        """Devolver el IntentModel, cargándolo si todavía no existe"""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._mtimes = self._artifact_mtimes()
+                    self._model = self._load()
+                    self.version += 1
+                model = self._model
+        return model
+
+    def warm_up(self):
+        """Cargar el modelo en un hilo aparte para que la primera respuesta no espere"""
+        thread = threading.Thread(target=self.get, name="intent-model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self, wait=True):
+        """Cargar, validar y servir de nuevo el modelo desde disco
+
+        Con wait=True devuelve True si se intercambió el modelo y False si se
+        descartó (ver last_error); con wait=False recarga en segundo plano y
+        devuelve el hilo.
+        """
+        if not wait:
+            thread = threading.Thread(target=self._reload, name="intent-model-reload", daemon=True)
+            thread.start()
+            return thread
+        return self._reload()
+
+    def watch(self, interval=2.0):
+        """Recargar automáticamente al cambiar los archivos del modelo (hilo en segundo plano)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._stop_watch.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="intent-model-watch", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watch(self):
+        self._stop_watch.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self):
+        """Estado del modelo servido"""
+        model = self._model
+        return {
+            'loaded': model is not None,
+            'version': self.version,
+            'backend': model.backend if model else None,
+            'tags': len(model.tags) if model else 0,
+            'load_time': self.load_time,
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None and self._watcher.is_alive()
+        }
+
+    def _artifact_mtimes(self):
+        mtimes = []
+        for path in (self.model_file, self.numpy_model_file, self.intents_file):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except (OSError, TypeError):
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _watch(self, interval):
+        pending = None
+        while not self._stop_watch.wait(interval):
+            mtimes = self._artifact_mtimes()
+            if mtimes == self._mtimes:
+                pending = None
+            elif not self.loaded:
+                # Aún no se sirve nada: el primer get() ya leerá los archivos nuevos
+                self._mtimes = mtimes
+            elif mtimes == pending:
+                # Sin cambios durante un intervalo: train.py ya terminó de escribir .pth y .npz
+                self._reload()
+                pending = None
+            else:
+                pending = mtimes
+
+    def _reload(self):
+        with self._reload_lock:
+            # Se recuerdan aunque falle, para no reintentar el mismo artefacto roto en cada sondeo
+            self._mtimes = self._artifact_mtimes()
+            try:
+                intents = self._read_intents()
+                model = self._build(intents)
+                self._validate(model, intents)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Recarga del modelo descartada, se mantiene la versión {self.version}: {self.last_error}")
+                return False
+            with self._lock:
+                self._model = model
+                self.version += 1
+            self.reloads += 1
+            self.last_error = None
+            print(f"✅ Modelo recargado: versión {self.version} ({model.backend}, {len(model.tags)} intents)")
+            return True
+
+    def _validate(self, model, intents):
+        """Rechazar un modelo que no encaja con su vocabulario o que no reconoce sus propios patterns"""
+        network = model.network
+        if network.input_size != model.featurizer.size:
+            raise ValueError(f"el modelo espera {network.input_size} palabras y el vocabulario tiene {model.featurizer.size}")
+        if network.num_classes != len(model.tags):
+            raise ValueError(f"el modelo tiene {network.num_classes} salidas para {len(model.tags)} tags")
+        missing = [tag for tag in model.tags if not model.responses.get(tag)]
+        if missing:
+            raise ValueError(f"tags sin respuestas en intents.json: {', '.join(missing)}")
+
+        samples = [(pattern, intent['tag']) for intent in intents['intents'] for pattern in intent['patterns']]
+        if samples:
+            predicted = model.classify_batch([pattern for pattern, _ in samples])
+            accuracy = sum(tag == expected for (tag, _), (_, expected) in zip(predicted, samples)) / len(samples)
+            if accuracy < RELOAD_MIN_ACCURACY:
+                raise ValueError(f"precisión {accuracy:.1%} sobre los patterns, mínimo {RELOAD_MIN_ACCURACY:.0%}")
+
+    def _use_numpy_model(self):
+        if not self.numpy_model_file or not os.path.exists(self.numpy_model_file):
+            return False
+        if not os.path.exists(self.model_file):
+            return True
+        # Un data.pth reentrenado sin volver a exportar deja el .npz obsoleto
+        from nlp_pipeline.numpy_model import file_digest, npz_source_digest
+        return npz_source_digest(self.numpy_model_file) == file_digest(self.model_file)
+
+    def _load_torch(self):
+        import torch
+        from nlp_pipeline.model import NeuralNetwork
+
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        data = torch.load(self.model_file)
+
+        model = NeuralNetwork(data["input_size"], data["hidden_size"], data["num_classes"]).to(device)
+        model.load_state_dict(data["model_state"])
+        model.eval()
+        return TorchNetwork(torch, model, device), data['all_words'], data['tags']
+
+    def _read_intents(self):
+        with open(self.intents_file, 'r', encoding='utf-8') as json_data:
+            return json.load(json_data)
+
+    def _load(self):
+        return self._build(self._read_intents())
+
+    def _build(self, intents):
+        start = time.perf_counter()
+        from nlp_pipeline.nltk_lib import BagOfWordsFeaturizer
+
+        if self._use_numpy_model():
+            from nlp_pipeline.numpy_model import load_npz
+            network, all_words, tags = load_npz(self.numpy_model_file)
+            backend = 'numpy'
+        else:
+            network, all_words, tags = self._load_torch()
+            backend = 'torch'
+
+        responses = {intent['tag']: intent['responses'] for intent in intents['intents']}
+        bundle = IntentModel(network, BagOfWordsFeaturizer(all_words), tags, responses, backend)
+        self.load_time = time.perf_counter() - start
+        return bundle
+
+
+class MicroBatcher:
+    """Agrupa llamadas concurrentes para procesarlas en un solo lote
+
+    submit() encola un elemento y devuelve un concurrent.futures.Future. Un
+    hilo de fondo espera hasta max_wait segundos (o max_batch elementos)
+    desde el primero de la cola y llama a process(lista) una vez para todo
+    el lote. Sirve tanto a hilos como al event loop (asyncio.wrap_future).
+    """
+
+    def __init__(self, process, max_batch=32, max_wait=0.005):
+        self.process = process
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="intent-batcher", daemon=True)
+                    self._worker.start()
+        return future
+
+    def stats(self):
+        """Métricas del agrupamiento"""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch': self.items / self.batches if self.batches else 0.0
+        }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [(item, future) for item, future in self._collect()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.process([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _classify_with_model(texts):
+    # Todo el lote con el mismo modelo, que acompaña al resultado hasta elegir la respuesta
+    model = loader.get()
+    return [(tag, prob, model) for tag, prob in model.classify_batch(texts)]
+
+
+loader = IntentModelLoader()
+batcher = MicroBatcher(_classify_with_model)
+
+
+def classify_batch(texts):
+    """Lista de (tag, probabilidad) para cada texto"""
+    return loader.get().classify_batch(texts)
 
 
 def chatbot(inp):
-    sentence = tokenizer(inp)
-    data = bag_of_words(sentence, all_words)
-    data = data.reshape(1, data.shape[0])
-    data = torch.from_numpy(data).to(device)
-
-    output = model(data)
-    _, predicted = torch.max(output, dim=1)
-
-    tag = tags[predicted.item()]
-
-    probs = torch.softmax(output, dim=1)
-    prob = probs[0][predicted.item()]
-    # print(predicted)
-    # print(prob)
-    if prob.item() > 0.80:
-        for intent in intents['intents']:
-            if tag == intent["tag"]:
-                return random.choice(intent['responses'])
-    else:
-        return "I don't understand what are you saying? Maybe i'm still a dumb :("
+    return loader.get().respond(inp)
+
+
+def response_for(tag, prob, model=None):
+    """Respuesta para una clasificación ya hecha (elige al azar entre las del intent)
+
+    model es el IntentModel que clasificó; si se omite, el que se sirve ahora.
+    """
+    return (model or loader.get()).response_for(tag, prob)
+
+
+async def classify_async(inp):
+    """(tag, probabilidad, modelo), agrupando las llamadas concurrentes en un solo lote"""
+    return await asyncio.wrap_future(batcher.submit(inp))
+
+
+async def chatbot_async(inp):
+    """Como chatbot(), agrupando las llamadas concurrentes en un solo lote"""
+    return response_for(*await classify_async(inp))
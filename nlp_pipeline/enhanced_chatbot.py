@@ -1,13 +1,70 @@
 import re
-from nlp_pipeline.chatbot import chatbot as base_chatbot
-from database.financial_db import FinancialDatabase
+import asyncio
+import threading
+from collections import OrderedDict
+from nlp_pipeline.chatbot import classify_async, response_for, loader
+from database.financial_db import FinancialDatabase, fold_name
+from database.async_db import AsyncFinancialDatabase
+from nlp_pipeline.keyword_matcher import KeywordMatcher
+from database.read_cache import ReadCache
+from database.name_resolver import NameResolver
+
+# "más transacciones" / "mas transacciones": continuar el último historial mostrado
+MORE_PATTERN = re.compile(r'\bm[aá]s\b', re.IGNORECASE)
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+TIMEOUT_MESSAGE = "⚠️ La consulta tardó demasiado. Por favor, inténtalo de nuevo en unos segundos."
+
+# Patrones como "saldo de Juan", "transacciones de María", etc. para nombres que no
+# están en el índice de titulares (por ejemplo un nombre parcial)
+NAME_PATTERNS = [
+    re.compile(r'(?:saldo|balance|transacciones|información|info)\s+(?:de|del|para)\s+([A-Za-záéíóúñÑ]+(?:\s+[A-Za-záéíóúñÑ]+)?)', re.IGNORECASE),
+    re.compile(r'(?:usuario|cuenta)\s+([A-Za-záéíóúñÑ]+(?:\s+[A-Za-záéíóúñÑ]+)?)', re.IGNORECASE),
+]
+# Palabras comunes que no son nombres
+COMMON_WORDS = {'mi', 'mis', 'el', 'la', 'los', 'las', 'cuenta', 'saldo', 'transacciones', 'información', 'info', 'de', 'del', 'para'}
+
+_keyword_matcher = None
+
+def normalize_utterance(text):
+    """Clave de cache de una frase: minúsculas, sin acentos, puntuación ni espacios extra
+
+    "¿Saldo de  María?" -> "saldo de maria"
+    """
+    return fold_name(PUNCTUATION_PATTERN.sub(' ', text))
+
+def default_keyword_matcher():
+    """KeywordMatcher de las tablas del repositorio, compilado una vez por proceso
+
+    Las keywords se normalizan como las frases, así que el intent solo
+    depende de la clave de cache.
+    """
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        _keyword_matcher = KeywordMatcher.from_file(normalize=normalize_utterance)
+    return _keyword_matcher
 
 class EnhancedChatbot:
     """Chatbot mejorado con capacidades financieras y P2P"""
     
-    def __init__(self, db_path="financial.db"):
-        self.db = FinancialDatabase(db_path)
+    def __init__(self, db_path="financial.db", db_shards=1, query_cache_size=1024, keyword_matcher=None,
+                 max_sessions=1024):
+        self.db = FinancialDatabase(db_path, shards=db_shards)
+        # Las consultas se ejecutan fuera del event loop para no bloquear la red P2P
+        self.async_db = AsyncFinancialDatabase(self.db)
         self.p2p_node = None
+        # Por sesión: session_id -> (account_id, next_cursor) del último historial mostrado
+        self.transaction_cursors = OrderedDict()
+        self.max_sessions = max_sessions
+        self._cursors_lock = threading.Lock()
+
+        # Cache por frase normalizada: el análisis (intent, nombre, cuenta, clasificación)
+        # vale mientras no cambien el modelo ni las cuentas; las respuestas con datos,
+        # hasta que cambia data_version
+        self.analysis_cache = ReadCache(query_cache_size)
+        self.response_cache = ReadCache(query_cache_size)
+        self.keyword_matcher = keyword_matcher or default_keyword_matcher()
+        # Índice en memoria de titulares: nombre -> account_id sin recorrer la tabla
+        self.name_resolver = NameResolver(self.db)
         
         # Mapeo de intents a funciones
         self.intent_handlers = {
@@ -21,25 +78,64 @@ class EnhancedChatbot:
         """Configurar nodo P2P para compartir información"""
         self.p2p_node = p2p_node
     
-    async def process_query(self, user_input, user_name=None):
-        """Procesar consulta del usuario con capacidades financieras"""
+    async def process_query(self, user_input, user_name=None, session_id=None):
+        """Procesar consulta del usuario con capacidades financieras
+
+        session_id identifica la conversación (por ejemplo el cliente web) para
+        que "más transacciones" continúe su propio historial.
+        """
 
         if not user_input or not user_input.strip():
             return "Por favor, escribe una consulta válida."
         
-        # Clasificar intent usando el modelo base
-        intent = self.classify_intent(user_input)
+        utterance = normalize_utterance(user_input)
+        key = (utterance, fold_name(user_name) if user_name else None)
+        # El análisis no depende de los datos, pero la clasificación sí del modelo servido
+        model_version = loader.version
+        found, analysis = self.analysis_cache.get(key, model_version)
+        if found and analysis[2] is not None:
+            # El account_id guardado vale mientras no cambien las cuentas (sin cambios, refresh no lee filas)
+            try:
+                generation = await self.async_db.run(self.name_resolver.refresh)
+            except asyncio.TimeoutError:
+                return TIMEOUT_MESSAGE
+            found = analysis[2][1] == generation
+        if not found:
+            # Clasificar intent usando keywords y extraer el nombre una sola vez por frase
+            # Sobre la frase normalizada: misma clave, mismo intent, llegue como llegue escrita
+            intent = self.classify_intent(utterance)
+            account = None
+            if intent in self.intent_handlers:
+                try:
+                    user_name, account = await self.async_db.run(self.analyze_account, user_input, user_name)
+                except asyncio.TimeoutError:
+                    return TIMEOUT_MESSAGE
+            analysis = (intent, user_name, account, None)
+            self.analysis_cache.put(key, model_version, analysis)
+        intent, user_name, account, classification = analysis
         
         # Si es un intent financiero, usar handler específico
         if intent in self.intent_handlers:
-            response = await self.handle_financial_query(intent, user_input, user_name)
+            # La respuesta depende de la cuenta resuelta, que puede cambiar sin cambiar la frase
+            account_id = account[0] if account else None
+            response = await self.handle_financial_query(intent, user_input, user_name, (key, account_id),
+                                                         session_id, account_id)
         else:
-            # Usar chatbot base para conversación general
-            response = base_chatbot(user_input)
+            # Usar chatbot base para conversación general; las consultas concurrentes
+            # se clasifican juntas en un hilo aparte, fuera del event loop
+            if classification is None:
+                tag, prob, model = await classify_async(user_input)
+                classification = (tag, prob)
+                # Con la versión leída al empezar: si hubo recarga entre medias, la entrada ya nace obsoleta
+                self.analysis_cache.put(key, model_version, (intent, user_name, account, classification))
+                response = response_for(tag, prob, model)
+            else:
+                response = response_for(*classification)
             if response and ("I don't understand" in response or "dumb" in response):
                 response = "No entiendo tu consulta. ¿Puedes ser mas específico? Puedo ayudarte con saldos, transacciones o alertas críticas."
         
-        # Compartir conversación con peers si esta habilitado P2P
+        # Compartir conversación con peers si esta habilitado P2P (se acumula y se envía
+        # por lotes, sin esperar a la red)
         if self.p2p_node and hasattr(self.p2p_node, 'share_chat'):
             try:
                 await self.p2p_node.share_chat(user_input, response)
@@ -49,89 +145,117 @@ class EnhancedChatbot:
         return response
     
     def classify_intent(self, user_input):
-        """Clasificar intent usando keywords - versión simplificada"""
-        user_input_lower = user_input.lower()
-                
-        # Consulta de saldo
-        saldo_keywords = ['saldo de', 'balance de', 'consultar saldo', 'ver saldo', 'mostrar saldo', 
-                          'saldo', 'balance', 'dinero', 'cuanto tengo', 'cuánto tengo', 
-                          'fondos', 'capital disponible']
-        
-        for keyword in saldo_keywords:
-            if keyword in user_input_lower:
-                return 'consulta_saldo'
-        
-        # Historial de transacciones
-        transaccion_keywords = ['transacciones de', 'historial de', 'movimientos de', 
-                               'transacciones', 'historial', 'movimientos', 'pagos', 
-                               'transferencias', 'actividad', 'operaciones']
-        
-        for keyword in transaccion_keywords:
-            if keyword in user_input_lower:
-                return 'historial_transacciones'
-        
-        # Alertas críticas
-        alerta_keywords = ['alertas criticas', 'alertas críticas', 'alertas', 'alerta', 
-                           'advertencias', 'problemas', 'seguridad', 'emergencia']
-        
-        for keyword in alerta_keywords:
-            if keyword in user_input_lower:
-                return 'alertas_criticas'
-        
-        # Información de cuenta
-        info_keywords = ['informacion de cuenta', 'información de cuenta', 'informacion de', 
-                         'información de', 'información', 'detalles', 'resumen', 'perfil']
-        
-        for keyword in info_keywords:
-            if keyword in user_input_lower:
-                return 'informacion_cuenta'
-        
-        return None
-    
-    async def handle_financial_query(self, intent, user_input, user_name):
+        """Clasificar intent por keywords (training_data/intent_keywords.json) en una sola pasada"""
+        return self.keyword_matcher.match(user_input)
+    
+    def is_cacheable(self, intent, user_name):
+        """Las alertas se detectan (y difunden) siempre; el historial mueve el cursor de la sesión
+
+        Las páginas del historial ya se guardan en la cache de lecturas de la
+        base de datos, por cuenta y cursor.
+        """
+        return intent not in ('alertas_criticas', 'historial_transacciones')
+
+    async def handle_financial_query(self, intent, user_input, user_name, cache_key=None, session_id=None,
+                                     account_id=None):
         """Manejar consulta financiera específica"""
         
-        if intent == 'consulta_saldo':
-            return self.handle_balance_inquiry(user_input, user_name)
-        elif intent == 'historial_transacciones':
-            return self.handle_transaction_history(user_input, user_name)
-        elif intent == 'alertas_criticas':
-            return await self.handle_critical_alerts(user_input)
-        elif intent == 'informacion_cuenta':
-            return self.handle_account_info(user_input, user_name)
-        else:
-            return "No pude procesar tu consulta financiera. ¿Puedes ser mas específico?"
+        if cache_key is None or not self.is_cacheable(intent, user_name):
+            return await self.run_financial_handler(intent, user_input, user_name, session_id=session_id,
+                                                    account_id=account_id)
+
+        try:
+            # La versión se lee antes de consultar para no asociar datos viejos a una versión nueva
+            version = await self.async_db.run(self.db.data_version)
+            found, response = self.response_cache.get(cache_key, version)
+            if found:
+                return response
+            response = await self.run_financial_handler(intent, user_input, user_name, raise_timeout=True,
+                                                        account_id=account_id)
+        except asyncio.TimeoutError:
+            return TIMEOUT_MESSAGE
+        self.response_cache.put(cache_key, version, response)
+        return response
+
+    async def run_financial_handler(self, intent, user_input, user_name, raise_timeout=False, session_id=None,
+                                    account_id=None):
+        try:
+            if intent == 'consulta_saldo':
+                return await self.handle_balance_inquiry(user_input, user_name, account_id)
+            elif intent == 'historial_transacciones':
+                return await self.handle_transaction_history(user_input, user_name, session_id, account_id)
+            elif intent == 'alertas_criticas':
+                return await self.handle_critical_alerts(user_input)
+            elif intent == 'informacion_cuenta':
+                return await self.handle_account_info(user_input, user_name, account_id)
+            else:
+                return "No pude procesar tu consulta financiera. ¿Puedes ser mas específico?"
+        except asyncio.TimeoutError:
+            if raise_timeout:
+                raise
+            return TIMEOUT_MESSAGE
     
-    def handle_balance_inquiry(self, user_input, user_name):
+    async def handle_balance_inquiry(self, user_input, user_name, account_id=None):
         """Manejar consulta de saldo"""
         
         # Extraer nombre de usuario del input si no se proporciona
         if not user_name:
-            user_name = self.extract_name_from_input(user_input)
+            user_name, account_id = await self.find_name(user_input)
         
         if user_name:
-            result = self.db.get_account_balance(user_name)
+            result = await self.async_db.get_account_balance(user_name, account_id)
             return f"💰 {result}"
         else:
             return "Para consultar el saldo, necesito que me digas el nombre. Por ejemplo: 'Saldo de Juan'"
     
-    def handle_transaction_history(self, user_input, user_name):
+    async def handle_transaction_history(self, user_input, user_name, session_id=None, account_id=None):
         """Manejar consulta de historial de transacciones"""
         
         if not user_name:
-            user_name = self.extract_name_from_input(user_input)
+            user_name, account_id = await self.find_name(user_input)
         
         if user_name:
-            result = self.db.get_recent_transactions(user_name, 5)
-            return f" {result}"
+            page = await self.async_db.get_transactions_page(user_name, 5, account_id=account_id)
+        elif MORE_PATTERN.search(user_input):
+            # Siguiente página del último historial consultado en esta sesión
+            cursor = self.get_transaction_cursor(session_id)
+            if not cursor:
+                return "No hay más transacciones para mostrar."
+            account_id, before = cursor
+            page = await self.async_db.get_transactions_page(account_id=account_id, limit=5, before=before)
         else:
             return "Para ver el historial, necesito que me digas el nombre. Por ejemplo: 'Transacciones de María'"
+        
+        result = self.db.format_transactions(page["transactions"])
+        if page["next_cursor"]:
+            self.set_transaction_cursor(session_id, (page["account_id"], page["next_cursor"]))
+            result += "\nEscribe 'más transacciones' para ver las anteriores"
+        else:
+            self.set_transaction_cursor(session_id, None)
+        return f" {result}"
+    
+    def get_transaction_cursor(self, session_id):
+        """(account_id, next_cursor) del último historial de la sesión o None"""
+        with self._cursors_lock:
+            return self.transaction_cursors.get(session_id)
+    
+    def set_transaction_cursor(self, session_id, cursor):
+        """Guardar (o borrar, con None) el cursor de la sesión; se olvidan las sesiones más antiguas"""
+        with self._cursors_lock:
+            cursors = self.transaction_cursors
+            if cursor is None:
+                cursors.pop(session_id, None)
+                return
+            cursors[session_id] = cursor
+            cursors.move_to_end(session_id)
+            if len(cursors) > self.max_sessions:
+                cursors.popitem(last=False)
     
     async def handle_critical_alerts(self, user_input):
         """Manejar consulta de alertas críticas"""
         
         # Detectar condiciones críticas actuales
-        alerts = self.db.detect_critical_conditions()
+        alerts = await self.async_db.detect_critical_conditions()
         
         if alerts:
             # Compartir alertas con red P2P
@@ -153,46 +277,70 @@ class EnhancedChatbot:
         else:
             return "✅ No hay alertas críticas en este momento. Todos los sistemas funcionan normalmente."
     
-    def handle_account_info(self, user_input, user_name):
+    async def handle_account_info(self, user_input, user_name, account_id=None):
         """Manejar consulta de información de cuenta"""
         
         if not user_name:
-            user_name = self.extract_name_from_input(user_input)
+            user_name, account_id = await self.find_name(user_input)
         
         if user_name:
-            balance_info = self.db.get_account_balance(user_name)
-            transaction_info = self.db.get_recent_transactions(user_name, 3)
+            balance_info, transaction_info = await self.async_db.get_account_summary(user_name, 3, account_id)
             
             return f"👤 INFORMACIÓN DE CUENTA:\n\n💰 {balance_info}\n\n Últimas transacciones:\n{transaction_info}"
         else:
             return "Para ver la información de cuenta, necesito que me digas el nombre."
     
     def extract_name_from_input(self, user_input):
-        """Extraer nombre del usuario del input usando palabras clave"""
-        
-        # Patrones comunes para extraer nombres en español
-        import re
-        
-        # Buscar patrones como "saldo de Juan", "transacciones de María", etc.
-        patterns = [
-        r'(?:saldo|balance|transacciones|información|info)\s+(?:de|del|para)\s+([A-Za-záéíóúñÑ]+(?:\s+[A-Za-záéíóúñÑ]+)?)',
-        r'(?:usuario|cuenta)\s+([A-Za-záéíóúñÑ]+(?:\s+[A-Za-záéíóúñÑ]+)?)',
-    ]
+        """Extraer nombre del usuario del input: (nombre, account_id) o (None, None)
+
+        Primero busca titulares conocidos en cualquier parte de la frase
+        (sin distinguir acentos) y devuelve también su account_id; si no hay
+        ninguno, usa patrones como "saldo de Juan" (account_id None: se busca
+        por nombre en la base). Consulta la base de datos si el índice está
+        desactualizado: desde el event loop usar find_name().
+        """
+        found = self.name_resolver.find(user_input)
+        if found:
+            return found[1], found[0]
         
-        for pattern in patterns:
-            match = re.search(pattern, user_input, re.IGNORECASE)
+        for pattern in NAME_PATTERNS:
+            match = pattern.search(user_input)
             if match:
                 name = match.group(1).strip()
-                # Filtrar palabras comunes que no son nombres
-                common_words = ['mi', 'mis', 'el', 'la', 'los', 'las', 'cuenta', 'saldo', 'transacciones', 'información', 'info', 'de', 'del', 'para']
-                if name.lower() not in common_words and len(name) > 0:
-                    return name
+                if name.lower() not in COMMON_WORDS and len(name) > 0:
+                    return name, None
         
-        return None
+        return None, None
+    
+    async def find_name(self, user_input):
+        """extract_name_from_input fuera del event loop"""
+        return await self.async_db.run(self.extract_name_from_input, user_input)
+    
+    def analyze_account(self, user_input, user_name=None):
+        """Titular de una consulta: (user_name, (account_id, generation)) o (user_name, None)
+
+        Con user_name dado (por ejemplo desde la interfaz) solo se resuelve
+        su account_id. generation es la del índice antes de buscar: si cambia
+        entre medias, la entrada de cache ya nace obsoleta.
+        """
+        generation = self.name_resolver.refresh()
+        if user_name:
+            account_id = self.name_resolver.resolve(user_name)
+        else:
+            user_name, account_id = self.extract_name_from_input(user_input)
+        return user_name, ((account_id, generation) if account_id is not None else None)
+    
+    def cache_stats(self):
+        """Métricas de las caches de consultas y de la base de datos"""
+        return {
+            'analysis': self.analysis_cache.stats(),
+            'responses': self.response_cache.stats(),
+            'database': self.db.cache_stats()
+        }
     
     async def check_and_broadcast_alerts(self):
         """Verificar condiciones críticas y enviar a red P2P"""
-        alerts = self.db.detect_critical_conditions()
+        alerts = await self.async_db.detect_critical_conditions()
         
         if alerts and self.p2p_node:
             try:
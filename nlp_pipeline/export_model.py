@@ -0,0 +1,34 @@
+import argparse
+import os
+import torch
+from numpy_model import save_npz, load_npz, file_digest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def export_model(input_file, output_file):
+    """Exportar data.pth (train.py) a un .npz que se sirve sin torch"""
+    data = torch.load(input_file)
+    state = {name: tensor.detach().cpu().numpy() for name, tensor in data["model_state"].items()}
+    save_npz(output_file, state, data["all_words"], data["tags"], file_digest(input_file))
+
+    # Comprobar que el modelo exportado reproduce las salidas de torch
+    from model import NeuralNetwork
+    model = NeuralNetwork(data["input_size"], data["hidden_size"], data["num_classes"])
+    model.load_state_dict(data["model_state"])
+    model.eval()
+    network, _, _ = load_npz(output_file)
+
+    samples = (torch.rand(64, data["input_size"]) > 0.9).float()
+    with torch.no_grad():
+        expected = model(samples).numpy()
+    max_diff = abs(network.forward(samples.numpy()) - expected).max()
+    return max_diff
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportar el modelo entrenado a formato NumPy")
+    parser.add_argument('--input', default=os.path.join(BASE_DIR, 'data.pth'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'data.npz'))
+    args = parser.parse_args()
+
+    max_diff = export_model(args.input, args.output)
+    print(f'model exported to {args.output} ({os.path.getsize(args.output)} bytes, max diff vs torch {max_diff:.2e})')
@@ -0,0 +1,73 @@
+import json
+import os
+import re
+
+KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'training_data', 'intent_keywords.json')
+
+
+def _trie_pattern(node):
+    """Regex de un nodo del trie; en nodos finales se intenta seguir antes de terminar"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    return f'(?:{body})?' if '' in node else body
+
+
+class KeywordMatcher:
+    """Clasificador por palabras clave compilado en una sola expresión regular
+
+    Las tablas son [(intent, [keywords])] en orden de prioridad: gana el
+    primer intent con alguna keyword contenida en el texto, como en el
+    recorrido de listas original. Las keywords forman un trie dentro de un
+    lookahead, así que un solo finditer encuentra en cada posición la keyword
+    más larga que empieza ahí. Todas las que empiezan en esa posición son
+    prefijos de ella, por lo que a cada keyword se le asigna la mejor
+    prioridad entre sus prefijos.
+
+    normalize se aplica igual a keywords y textos (por defecto, minúsculas);
+    con fold_name "información" e "informacion" son la misma keyword.
+    """
+
+    def __init__(self, tables, normalize=str.lower):
+        self.tags = [tag for tag, _ in tables]
+        self.normalize = normalize
+        priorities = {}
+        for priority, (tag, keywords) in enumerate(tables):
+            for keyword in keywords:
+                keyword = normalize(keyword)
+                if keyword:
+                    priorities.setdefault(keyword, priority)
+
+        self.priorities = {
+            keyword: min(priorities.get(keyword[:end], priority) for end in range(1, len(keyword) + 1))
+            for keyword, priority in priorities.items()
+        }
+
+        trie = {}
+        for keyword in self.priorities:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+        self.pattern = re.compile(f'(?=({_trie_pattern(trie)}))') if trie else None
+
+    @classmethod
+    def from_file(cls, path=KEYWORDS_FILE, normalize=str.lower):
+        """Cargar las tablas de un JSON {"intents": [{"tag", "keywords"}]} (el orden es la prioridad)"""
+        with open(path, 'r', encoding='utf-8') as stream:
+            data = json.load(stream)
+        return cls([(intent['tag'], intent['keywords']) for intent in data['intents']], normalize)
+
+    def match(self, text):
+        """Intent de mayor prioridad con alguna keyword en el texto, o None"""
+        if self.pattern is None:
+            return None
+        best = None
+        for found in self.pattern.finditer(self.normalize(text)):
+            priority = self.priorities[found.group(1)]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return self.tags[best] if best is not None else None
@@ -1,4 +1,6 @@
+import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 class NeuralNetwork(nn.Module):
     def __init__(self, input_size, hidden_size, num_classes):
@@ -16,3 +18,28 @@ class NeuralNetwork(nn.Module):
         out = self.relu(out)
         out = self.layer3(out)
         return out
+
+    # Sparse input: active word indices in EmbeddingBag layout (indices, offsets).
+    # Layer 1 becomes a sum of weight columns, same result as the dense 0/1 bag.
+    # For training pass embedding (see sparse_embedding) to get sparse gradients.
+    def forward_sparse(self, indices, offsets, embedding=None):
+        if embedding is None:
+            out = F.embedding_bag(indices, self.layer1.weight.t(), offsets, mode='sum')
+        else:
+            out = embedding(indices, offsets)
+        out = self.relu(out + self.layer1.bias)
+        out = self.layer2(out)
+        out = self.relu(out)
+        out = self.layer3(out)
+        return out
+
+    # Trainable copy of layer1's weight as (vocabulary x hidden) rows: its gradient only
+    # holds the rows of the words in the batch, so SparseAdam updates O(batch words)
+    # instead of the whole vocabulary. Copy it back with load_embedding before saving.
+    def sparse_embedding(self):
+        weight = self.layer1.weight.detach().t().contiguous()
+        return nn.EmbeddingBag.from_pretrained(weight, freeze=False, mode='sum', sparse=True)
+
+    def load_embedding(self, embedding):
+        with torch.no_grad():
+            self.layer1.weight.copy_(embedding.weight.t())
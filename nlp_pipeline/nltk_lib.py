@@ -1,20 +1,61 @@
 import nltk
 import numpy as np
+from functools import lru_cache
 from nltk.stem.porter import PorterStemmer
 
+_stemmer = PorterStemmer()
+
 # To tokenize data
 def tokenizer(sentence):
     return nltk.word_tokenize(sentence)
-# Stem data to root form
+# Stem data to root form (memoized: the same words repeat across queries)
+@lru_cache(maxsize=65536)
 def stemming(word):
-    stemmer = PorterStemmer()
-    return stemmer.stem(word.lower())
+    return _stemmer.stem(word.lower())
 # To get words that appeared in the sentence
 def bag_of_words(tokenized_sentence, words):
-    tokenized_sentence = [stemming(i) for i in tokenized_sentence]
-    bag = np.zeros(len(words), dtype=np.float32)
-    for i, word in enumerate(words):
-        if word in tokenized_sentence:
-            bag[i] = 1.0
+    return BagOfWordsFeaturizer(words).transform(tokenized_sentence)
+
+
+class BagOfWordsFeaturizer:
+    """Bag of words over a fixed vocabulary
+
+    Keeps a word -> column dict, so a sentence costs O(tokens) instead of
+    O(vocabulary x tokens). Produces the same vectors as bag_of_words.
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+        self.size = len(self.words)
+
+    def indices(self, tokenized_sentence):
+        """Sorted columns of the vocabulary words present in the sentence"""
+        columns = {self.index.get(stemming(token)) for token in tokenized_sentence}
+        columns.discard(None)
+        return np.array(sorted(columns), dtype=np.intp)
+
+    def transform(self, tokenized_sentence):
+        bag = np.zeros(self.size, dtype=np.float32)
+        bag[self.indices(tokenized_sentence)] = 1.0
+        return bag
+
+    def sparse_batch(self, tokenized_sentences):
+        """Active columns of every sentence as (indices, offsets)
+
+        indices concatenates the columns of all sentences and offsets[i] is
+        where sentence i starts (the EmbeddingBag layout). Its size depends
+        on sentence length, not on vocabulary size.
+        """
+        bags = [self.indices(tokenized_sentence) for tokenized_sentence in tokenized_sentences]
+        if not bags:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        offsets = np.cumsum([0] + [len(bag) for bag in bags[:-1]]).astype(np.intp)
+        return np.concatenate(bags).astype(np.intp, copy=False), offsets
 
-    return bag
+    def transform_batch(self, tokenized_sentences):
+        """One row per sentence"""
+        bags = np.zeros((len(tokenized_sentences), self.size), dtype=np.float32)
+        for row, tokenized_sentence in enumerate(tokenized_sentences):
+            bags[row, self.indices(tokenized_sentence)] = 1.0
+        return bags
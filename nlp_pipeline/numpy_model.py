@@ -0,0 +1,91 @@
+import hashlib
+import numpy as np
+
+# Capas de NeuralNetwork en orden (nombre del módulo en el state_dict de torch)
+LAYERS = ['layer1', 'layer2', 'layer3']
+
+
+class NumpyNeuralNetwork:
+    """Inferencia de NeuralNetwork (model.py) solo con NumPy
+
+    Mismas capas: Linear -> ReLU -> Linear -> ReLU -> Linear. Los pesos se
+    guardan como en torch (salida x entrada) y se trasponen una vez al cargar.
+    """
+
+    def __init__(self, weights, biases):
+        self.weights = [np.ascontiguousarray(w.T, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.input_size = self.weights[0].shape[0]
+        self.hidden_size = self.weights[0].shape[1]
+        self.num_classes = self.weights[-1].shape[1]
+
+    def forward(self, data):
+        """Logits para un lote (filas x input_size)"""
+        out = data
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            out = out @ weight + bias
+            if i < len(self.weights) - 1:
+                np.maximum(out, 0, out=out)
+        return out
+
+    def forward_sparse(self, indices, offsets):
+        """Logits a partir de las columnas activas (BagOfWordsFeaturizer.sparse_batch)
+
+        Con entradas 0/1 la primera capa es la suma de las filas de sus pesos
+        en las columnas activas: el coste depende de las palabras de la
+        frase y no del tamaño del vocabulario.
+        """
+        # Suma por frase con sumas prefijas: fila final menos fila inicial (admite frases vacías)
+        prefix = np.zeros((len(indices) + 1, self.hidden_size), dtype=np.float64)
+        np.cumsum(self.weights[0][indices], axis=0, out=prefix[1:])
+        ends = np.append(offsets[1:], len(indices))
+        out = (prefix[ends] - prefix[offsets]).astype(np.float32)
+        out += self.biases[0]
+        for weight, bias in zip(self.weights[1:], self.biases[1:]):
+            np.maximum(out, 0, out=out)
+            out = out @ weight + bias
+        return out
+
+    def predict_proba(self, data):
+        """Softmax por filas de los logits"""
+        return softmax(self.forward(data))
+
+    def predict_proba_sparse(self, indices, offsets):
+        return softmax(self.forward_sparse(indices, offsets))
+
+
+def softmax(logits):
+    """Softmax por filas, en el mismo array"""
+    logits -= logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+def file_digest(path):
+    """SHA-256 de un archivo (identifica el data.pth del que salió el .npz)"""
+    with open(path, 'rb') as stream:
+        return hashlib.sha256(stream.read()).hexdigest()
+
+
+def save_npz(path, state, all_words, tags, source_digest=''):
+    """Guardar pesos (state_dict como arrays), vocabulario y tags en un .npz"""
+    arrays = {}
+    for layer in LAYERS:
+        arrays[f'{layer}.weight'] = np.asarray(state[f'{layer}.weight'], dtype=np.float32)
+        arrays[f'{layer}.bias'] = np.asarray(state[f'{layer}.bias'], dtype=np.float32)
+    np.savez_compressed(path, all_words=np.array(all_words, dtype=str),
+                        tags=np.array(tags, dtype=str), source_digest=np.array(source_digest), **arrays)
+
+
+def load_npz(path):
+    """Devolver (NumpyNeuralNetwork, all_words, tags) desde un .npz exportado"""
+    with np.load(path, allow_pickle=False) as data:
+        network = NumpyNeuralNetwork([data[f'{layer}.weight'] for layer in LAYERS],
+                                     [data[f'{layer}.bias'] for layer in LAYERS])
+        return network, data['all_words'].tolist(), data['tags'].tolist()
+
+
+def npz_source_digest(path):
+    with np.load(path, allow_pickle=False) as data:
+        return str(data['source_digest']) if 'source_digest' in data.files else ''
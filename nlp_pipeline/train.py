@@ -1,12 +1,41 @@
+import argparse
 import json
+import os
+import random
+import time
 import numpy as np
 import torch
 import torch.nn as nn
 from torch.utils.data import Dataset, DataLoader
 from model import NeuralNetwork
-from nltk_lib import tokenizer, stemming, bag_of_words
-
-with open("./nlp_pipeline/training_data/intents.json", 'r', encoding='utf-8') as stream:
+from nltk_lib import tokenizer, stemming, BagOfWordsFeaturizer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+parser = argparse.ArgumentParser(description="Train the intent classifier")
+parser.add_argument('--mode', choices=['fast', 'minibatch'], default='fast',
+                    help="fast: whole dataset as one tensor, full-batch steps and early stopping; "
+                         "minibatch: original DataLoader loop")
+parser.add_argument('--epochs', type=int, help="Max epochs (default 500 fast, 2000 minibatch)")
+parser.add_argument('--batch-size', type=int, help="Batch size (default: full batch in fast mode, 8 in minibatch)")
+parser.add_argument('--lr', type=float, help="Learning rate (default 0.01 fast, 0.001 minibatch)")
+parser.add_argument('--hidden-size', type=int, default=8)
+parser.add_argument('--target-accuracy', type=float, default=1.0, help="Early stop once reached...")
+parser.add_argument('--target-loss', type=float, default=0.01, help="...and the loss is below this")
+parser.add_argument('--patience', type=int, default=50, help="Early stop after this many epochs without loss improvement")
+parser.add_argument('--seed', type=int, default=42)
+parser.add_argument('--threads', type=int, help="torch CPU threads (default: torch's choice)")
+parser.add_argument('--intents', default=os.path.join(BASE_DIR, 'training_data', 'intents.json'))
+parser.add_argument('--output', default=os.path.join(BASE_DIR, 'data.pth'))
+args = parser.parse_args()
+
+random.seed(args.seed)
+np.random.seed(args.seed)
+torch.manual_seed(args.seed)
+if args.threads:
+    torch.set_num_threads(args.threads)
+
+with open(args.intents, 'r', encoding='utf-8') as stream:
     intents = json.load(stream)
 
 all_words = []
@@ -25,17 +54,10 @@ ignore_words = ['?','!','.',',']
 all_words = [stemming(i) for i in all_words if i not in ignore_words]
 all_words = sorted(set(all_words))
 
-train_x = []
-train_y = []
-for(tokenized_sentence, tag) in xy:
-    bag = bag_of_words(tokenized_sentence, all_words)
-    train_x.append(bag)
-
-    label = tags.index(tag)
-    train_y.append(label) # CrossEntropyloss
-
-train_x = np.array(train_x)
-train_y = np.array(train_y)
+featurizer = BagOfWordsFeaturizer(all_words)
+# Sparse input: active word columns per sentence instead of a dense vocabulary-sized bag
+train_x = [featurizer.indices(tokenized_sentence) for (tokenized_sentence, tag) in xy]
+train_y = np.array([tags.index(tag) for (tokenized_sentence, tag) in xy]) # CrossEntropyloss
 
 class CharDataset(Dataset):
     def __init__(self):
@@ -49,39 +71,109 @@ class CharDataset(Dataset):
     def __len__(self):
         return self.x_samples
 
+# Batch of index arrays -> (indices, offsets, labels) in EmbeddingBag layout
+def collate_sparse(batch):
+    lengths = [len(words) for (words, label) in batch]
+    indices = torch.from_numpy(np.concatenate([words for (words, label) in batch]).astype(np.int64))
+    offsets = torch.tensor([0] + lengths[:-1]).cumsum(0)
+    labels = torch.tensor([label for (words, label) in batch])
+    return indices, offsets, labels
+
 # Hyperparameters
-batch_size = 8
-input_size = len(train_x[0])
-hidden_size = 8
+fast = args.mode == 'fast'
+batch_size = args.batch_size or (0 if fast else 8)
+input_size = featurizer.size
+hidden_size = args.hidden_size
 num_classes = len(tags)
-lr = 0.001
-num_epochs = 2000
-
-dataset = CharDataset()
-train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True)
+lr = args.lr or (0.01 if fast else 0.001)
+num_epochs = args.epochs or (500 if fast else 2000)
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 model = NeuralNetwork(input_size,hidden_size,num_classes).to(device)
 
-# Loss and optimizer
+# Loss and optimizers: layer 1 trains as an EmbeddingBag with sparse gradients (SparseAdam
+# touches only the words in the batch), the small dense layers with Adam
 criterion = nn.CrossEntropyLoss()
-optimizer = torch.optim.Adam(model.parameters(), lr=lr)
-
-for epoch in range(num_epochs):
-    for (words, labels) in train_loader:
-        words = words.to(device)
-        labels = labels.to(dtype=torch.long).to(device)
-        
-        # Forward
-        optputs = model(words)
-        loss = criterion(optputs, labels)
-
-        # Backward and optimizer step
+embedding = model.sparse_embedding().to(device)
+dense_parameters = [p for name, p in model.named_parameters() if name != 'layer1.weight']
+optimizers = [torch.optim.SparseAdam(embedding.parameters(), lr=lr), torch.optim.Adam(dense_parameters, lr=lr)]
+
+def train_step(indices, offsets, labels):
+    outputs = model.forward_sparse(indices, offsets, embedding)
+    loss = criterion(outputs, labels)
+    for optimizer in optimizers:
         optimizer.zero_grad()
-        loss.backward()
+    loss.backward()
+    for optimizer in optimizers:
         optimizer.step()
-    if(epoch+1)%100 == 0:
-        print(f'epoch {epoch+1}/{num_epochs}')
+
+# Whole dataset as one tensor set, built once (used for the accuracy report in both modes)
+all_indices, all_offsets, all_labels = [t.to(device) for t in collate_sparse(list(zip(train_x, train_y)))]
+all_labels = all_labels.to(dtype=torch.long)
+
+def evaluate():
+    with torch.no_grad():
+        outputs = model.forward_sparse(all_indices, all_offsets, embedding)
+        loss = criterion(outputs, all_labels).item()
+        accuracy = (outputs.argmax(dim=1) == all_labels).float().mean().item()
+    return loss, accuracy
+
+start_time = time.perf_counter()
+epochs_run = 0
+
+if fast:
+    # Full batch: the preloaded tensors are the only batch, no DataLoader or collate per step.
+    # With --batch-size, shuffled large batches are collated straight from the index arrays.
+    samples = len(train_x)
+    step_size = batch_size if 0 < batch_size < samples else samples
+    best_loss, stale_epochs = float('inf'), 0
+
+    for epoch in range(num_epochs):
+        if step_size == samples:
+            batches = [(all_indices, all_offsets, all_labels)]
+        else:
+            batches = []
+            order = torch.randperm(samples).tolist()
+            for first in range(0, samples, step_size):
+                batches.append([t.to(device) for t in collate_sparse([(train_x[i], train_y[i]) for i in order[first:first + step_size]])])
+        for (indices, offsets, labels) in batches:
+            train_step(indices, offsets, labels.to(dtype=torch.long))
+        epochs_run = epoch + 1
+
+        epoch_loss, accuracy = evaluate()
+        if epoch_loss < best_loss - 1e-4:
+            best_loss, stale_epochs = epoch_loss, 0
+        else:
+            stale_epochs += 1
+        if accuracy >= args.target_accuracy and epoch_loss <= args.target_loss:
+            print(f'early stop at epoch {epochs_run}: target reached')
+            break
+        if stale_epochs >= args.patience:
+            print(f'early stop at epoch {epochs_run}: no loss improvement in {args.patience} epochs')
+            break
+        if epochs_run % 100 == 0:
+            print(f'epoch {epochs_run}/{num_epochs} loss {epoch_loss:.4f} accuracy {accuracy:.3f}')
+else:
+    dataset = CharDataset()
+    train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True, collate_fn=collate_sparse)
+
+    for epoch in range(num_epochs):
+        for (indices, offsets, labels) in train_loader:
+            indices = indices.to(device)
+            offsets = offsets.to(device)
+            labels = labels.to(dtype=torch.long).to(device)
+
+            # Forward, backward and optimizer step
+            train_step(indices, offsets, labels)
+        epochs_run = epoch + 1
+        if(epoch+1)%100 == 0:
+            print(f'epoch {epoch+1}/{num_epochs}')
+
+train_time = time.perf_counter() - start_time
+final_loss, final_accuracy = evaluate()
+model.load_embedding(embedding)
+print(f'{args.mode} training: {epochs_run} epochs in {train_time:.2f}s, '
+      f'loss {final_loss:.4f}, training accuracy {final_accuracy:.1%}')
 
 data = {
 "model_state": model.state_dict(),
@@ -92,7 +184,13 @@ data = {
 "tags": tags
 }
 
-FILE = "./nlp_pipeline/data.pth"
+FILE = args.output
 torch.save(data, FILE)
 
-print(f'training complete. file saved to {FILE}')
\ No newline at end of file
+print(f'training complete. file saved to {FILE}')
+
+# Torch-free copy for serving (nlp_pipeline/numpy_model.py)
+from export_model import export_model
+NUMPY_FILE = os.path.splitext(FILE)[0] + '.npz'
+max_diff = export_model(FILE, NUMPY_FILE)
+print(f'numpy model exported to {NUMPY_FILE} (max diff vs torch {max_diff:.2e})')
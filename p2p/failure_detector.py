@@ -0,0 +1,59 @@
+import math
+import random
+import time
+from collections import deque
+
+
+class PhiAccrualDetector:
+    """Detector de fallos phi accrual para un peer
+
+    En lugar de un sí/no, phi mide cuán improbable es no haber recibido
+    latido todavía, según los intervalos observados: phi = 1 significa un
+    10% de probabilidad de que el peer siga vivo, phi = 3 una entre mil.
+    Los intervalos se modelan como exponenciales con la media de la ventana
+    (como Cassandra), así que phi llega al umbral tras threshold * ln(10)
+    intervalos medios de silencio: con el umbral 3 y latidos cada segundo,
+    unos 7 s. timeout es solo un respaldo para peers cuyos intervalos se
+    alargan mucho; por defecto, 4 veces ese plazo con expected_interval.
+    """
+
+    def __init__(self, expected_interval=1.0, threshold=3.0, timeout=None, window=100):
+        self.threshold = threshold
+        self.timeout = timeout if timeout is not None else 4 * self.silence_for(threshold, expected_interval)
+        self.expected_interval = expected_interval
+        self.intervals = deque(maxlen=window)
+        self.last_heartbeat = time.monotonic()  # desde el registro del peer
+        self.rtt = None  # último tiempo de ida y vuelta, en segundos
+
+    def heartbeat(self, now=None, rtt=None):
+        """Registrar un latido (pong) del peer"""
+        now = time.monotonic() if now is None else now
+        self.intervals.append(now - self.last_heartbeat)
+        self.last_heartbeat = now
+        if rtt is not None:
+            self.rtt = rtt
+
+    def phi(self, now=None):
+        now = time.monotonic() if now is None else now
+        # Sin historial se supone el intervalo de envío de los pings
+        mean = sum(self.intervals) / len(self.intervals) if self.intervals else self.expected_interval
+        return (now - self.last_heartbeat) / max(mean, 1e-3) * math.log10(math.e)
+
+    @staticmethod
+    def silence_for(phi, mean):
+        """Segundos sin latidos para llegar a phi si el intervalo medio es mean"""
+        return phi * math.log(10) * mean
+
+    def is_available(self, now=None):
+        now = time.monotonic() if now is None else now
+        return now - self.last_heartbeat < self.timeout and self.phi(now) < self.threshold
+
+
+def backoff_delay(attempt, base=0.5, maximum=30.0):
+    """Espera antes del reintento número attempt (desde 0): exponencial con jitter
+
+    Entre la mitad y el total de base * 2^attempt (acotado a maximum), para
+    que los nodos que perdieron la conexión a la vez no reintenten juntos.
+    """
+    delay = min(maximum, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,49 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SeenMessages:
+    """Conjunto acotado de message_id ya vistos, con caducidad
+
+    Un mensaje reenviado por gossip llega por varios caminos; add() dice si
+    es la primera vez que se ve. Los ids caducan a los expire_after segundos
+    (para entonces su TTL de saltos ya se agotó) y, si hay más de maxsize,
+    se olvidan los más antiguos.
+    """
+
+    def __init__(self, maxsize=10000, expire_after=300.0):
+        self.maxsize = maxsize
+        self.expire_after = expire_after
+        self.duplicates = 0
+        self._seen = OrderedDict()  # message_id -> instante en que se vio (orden de llegada)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __contains__(self, message_id):
+        with self._lock:
+            seen_at = self._seen.get(message_id)
+            return seen_at is not None and time.monotonic() - seen_at < self.expire_after
+
+    def add(self, message_id):
+        """Registrar un id; False si ya estaba (duplicado)"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if message_id in self._seen:
+                self.duplicates += 1
+                return False
+            self._seen[message_id] = now
+            if len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+            return True
+
+    def _expire(self, now):
+        seen = self._seen
+        while seen:
+            message_id, seen_at = next(iter(seen.items()))
+            if now - seen_at < self.expire_after:
+                break
+            del seen[message_id]
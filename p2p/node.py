@@ -1,16 +1,63 @@
 import asyncio
+import random
+import threading
+import time
 import websockets
 from datetime import datetime
 from p2p.protocol import P2PProtocol
+from p2p.send_queue import PeerSendQueue
+from p2p.gossip import SeenMessages
+from p2p.failure_detector import PhiAccrualDetector, backoff_delay
 
 class P2PNode:
     """Nodo P2P para comunicación distribuida"""
     
-    def __init__(self, host='localhost', port=8000, node_id=None):
+    def __init__(self, host='localhost', port=8000, node_id=None, send_queue_size=256, overflow_policy='drop_chat_first',
+                 gossip_fanout=3, seen_size=10000, seen_expire=300.0, wire_formats=None,
+                 chat_flush_interval=0.05, chat_batch_size=32,
+                 heartbeat_interval=1.0, phi_threshold=3.0, heartbeat_timeout=None,
+                 reconnect_base=0.5, reconnect_max=30.0):
         self.host = host
         self.port = port
         self.node_id = node_id or f"node_{port}"
         self.peers = {}  # {node_id: websocket}
+        self.send_queues = {}  # {node_id: PeerSendQueue}
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = overflow_policy  # ver p2p/send_queue.py
+        # Gossip: alertas y chats se reenvían a gossip_fanout peers al azar, una vez por message_id
+        self.gossip_fanout = gossip_fanout
+        self.seen_messages = SeenMessages(seen_size, seen_expire)
+        self.relayed = 0
+        # Formatos de trama que acepta este nodo y el negociado con cada peer (JSON hasta negociar)
+        self.wire_formats = tuple(wire_formats or P2PProtocol.WIRE_FORMATS)
+        self.peer_formats = {}  # {node_id: 'binary' | 'json'}
+        # Capacidades anunciadas en DISCOVERY (peers antiguos: ninguna)
+        self.peer_features = {}  # {node_id: set}
+        # Chats compartidos: se acumulan y salen en una sola trama CHAT cada
+        # chat_flush_interval segundos o al juntar chat_batch_size
+        self.chat_flush_interval = chat_flush_interval
+        self.chat_batch_size = chat_batch_size
+        self.chat_flushes = 0
+        self.chats_shared = 0
+        self._chat_buffer = []
+        self._chat_flush_pending = False
+        self._chat_lock = threading.Lock()
+        # Latidos: ping a cada peer cada heartbeat_interval; se da por caído con phi
+        # por encima de phi_threshold (~7 pings sin respuesta con el umbral 3) o, como
+        # respaldo, sin respuesta en heartbeat_timeout segundos (None: ver PhiAccrualDetector)
+        self.heartbeat_interval = heartbeat_interval
+        self.phi_threshold = phi_threshold
+        self.heartbeat_timeout = heartbeat_timeout
+        self.detectors = {}  # {node_id: PhiAccrualDetector}
+        self._pings = {}  # {node_id: (seq, instante de envío)}
+        self._ping_seq = 0
+        # Conexiones salientes perdidas: se reintentan con espera exponencial y jitter
+        self.reconnect_base = reconnect_base
+        self.reconnect_max = reconnect_max
+        self.outbound = {}  # {node_id: (host, port)}
+        self.reconnects = 0
+        self._reconnecting = set()
+        self.loop = None  # event loop del servidor
         self.message_handlers = {}
         self.running = False
         self.server = None
@@ -41,26 +88,34 @@ class P2PNode:
             except Exception as e:
                 print(f"❌ Error en conexión: {e}")
         
+        self.loop = asyncio.get_running_loop()
         self.server = await websockets.serve(handle_client, self.host, self.port)
         self.running = True
         print(f"✅ Servidor P2P activo en {self.host}:{self.port}")
+        self.loop.create_task(self._heartbeat_loop())
         
         # Mantener servidor corriendo
         await self.server.wait_closed()
     
     async def connect_to_peer(self, peer_host, peer_port, peer_id=None):
-        """Conectar a otro nodo"""
+        """Conectar a otro nodo; devuelve True si se conectó
+
+        Si la conexión se pierde después, se reintenta automáticamente.
+        """
         try:
             uri = f"ws://{peer_host}:{peer_port}"
             websocket = await websockets.connect(uri)
             
             peer_id = peer_id or f"peer_{peer_port}"
-            self.peers[peer_id] = websocket
+            self.add_peer(peer_id, websocket)
+            self.outbound[peer_id] = (peer_host, peer_port)
             
             # Enviar mensaje de descubrimiento
             discovery_msg = P2PProtocol.create_message(
                 P2PProtocol.MESSAGE_TYPES['DISCOVERY'],
-                {'node_id': self.node_id, 'action': 'join'},
+                {'node_id': self.node_id, 'action': 'join',
+                 'formats': list(self.wire_formats), 'wire_version': P2PProtocol.WIRE_VERSION,
+                 'features': list(P2PProtocol.FEATURES)},
                 self.node_id
             )
             await websocket.send(discovery_msg)
@@ -69,9 +124,11 @@ class P2PNode:
             
             # Escuchar mensajes del peer
             asyncio.create_task(self.listen_to_peer(websocket, peer_id))
+            return True
             
         except Exception as e:
             print(f"❌ Error conectando a {peer_host}:{peer_port} - {e}")
+            return False
     
     async def listen_to_peer(self, websocket, peer_id):
         """Escuchar mensajes de un peer específico"""
@@ -79,14 +136,81 @@ class P2PNode:
             async for message in websocket:
                 await self.process_message(message, websocket)
         except websockets.exceptions.ConnectionClosed:
-            if peer_id in self.peers:
-                del self.peers[peer_id]
-                print(f"🔌 Peer {peer_id} desconectado")
+            pass
+        # El bucle también termina sin excepción si el peer cierra normalmente
+        if self.peers.get(peer_id) is websocket:
+            self._peer_lost(peer_id, "desconectado")
     
     async def handle_new_connection(self, websocket):
         """Manejar nueva conexión entrante"""
         print(" Nueva conexión entrante")
     
+    def add_peer(self, peer_id, websocket):
+        """Registrar un peer con su cola de salida (debe llamarse desde el loop de la conexión)"""
+        self.remove_peer(peer_id)
+        self.send_queues[peer_id] = PeerSendQueue(
+            peer_id, websocket, self.send_queue_size, self.overflow_policy, self._on_send_failure
+        )
+        self.peers[peer_id] = websocket
+        self.peer_formats[peer_id] = 'json'
+        self.peer_features[peer_id] = set()
+        self.detectors[peer_id] = PhiAccrualDetector(self.heartbeat_interval, self.phi_threshold, self.heartbeat_timeout)
+    
+    def remove_peer(self, peer_id):
+        """Retirar un peer y detener su cola de salida"""
+        self.peers.pop(peer_id, None)
+        self.peer_formats.pop(peer_id, None)
+        self.peer_features.pop(peer_id, None)
+        self.detectors.pop(peer_id, None)
+        self._pings.pop(peer_id, None)
+        send_queue = self.send_queues.pop(peer_id, None)
+        if send_queue:
+            send_queue.close()
+    
+    def _on_send_failure(self, peer_id, send_queue):
+        # Solo si la cola sigue siendo la del peer (pudo reconectarse con otra)
+        if self.send_queues.get(peer_id) is send_queue:
+            self._peer_lost(peer_id, "retirado tras fallo de envío")
+    
+    def _peer_lost(self, peer_id, reason):
+        """Retirar un peer caído y, si la conexión era nuestra, programar la reconexión"""
+        if peer_id not in self.peers:
+            return
+        self.remove_peer(peer_id)
+        print(f"🔌 Peer {peer_id} {reason}")
+        if self.running and peer_id in self.outbound:
+            self._schedule_reconnect(peer_id)
+    
+    def _schedule_reconnect(self, peer_id):
+        if peer_id in self._reconnecting:
+            return
+        # En el loop del servidor: el de la conexión perdida puede haber terminado
+        loop = self.loop
+        if loop is None or not loop.is_running():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+        self._reconnecting.add(peer_id)
+        asyncio.run_coroutine_threadsafe(self._reconnect(peer_id), loop)
+    
+    async def _reconnect(self, peer_id):
+        attempt = 0
+        try:
+            while self.running and peer_id not in self.peers and peer_id in self.outbound:
+                delay = backoff_delay(attempt, self.reconnect_base, self.reconnect_max)
+                print(f"🔄 Reconectando con {peer_id} en {delay:.1f}s (intento {attempt + 1})")
+                await asyncio.sleep(delay)
+                if not self.running or peer_id in self.peers:
+                    return
+                host, port = self.outbound[peer_id]
+                if await self.connect_to_peer(host, port, peer_id):
+                    self.reconnects += 1
+                    return
+                attempt += 1
+        finally:
+            self._reconnecting.discard(peer_id)
+    
     async def handle_disconnection(self, websocket):
         """Manejar desconexión"""
         # Buscar y remover peer desconectado
@@ -97,8 +221,7 @@ class P2PNode:
                 break
         
         if peer_to_remove:
-            del self.peers[peer_to_remove]
-            print(f"🔌 Peer {peer_to_remove} desconectado")
+            self._peer_lost(peer_to_remove, "desconectado")
     
     async def process_message(self, raw_message, sender_websocket):
         """Procesar mensaje recibido"""
@@ -108,6 +231,11 @@ class P2PNode:
             return
         
         msg_type = message.get('type')
+        if msg_type in P2PProtocol.RELAYED_TYPES:
+            # Llega por varios caminos: se procesa y reenvía solo la primera vez
+            if not self.seen_messages.add(message.get('message_id') or raw_message):
+                return
+            self.relay_message(message, sender_websocket)
         handler = self.message_handlers.get(msg_type)
         
         if handler:
@@ -115,6 +243,61 @@ class P2PNode:
         else:
             print(f"⚠️ No hay handler para tipo de mensaje: {msg_type}")
     
+    def relay_message(self, message, sender_websocket=None):
+        """Reenviar un mensaje recibido a gossip_fanout peers, con un salto menos de TTL
+
+        No se reenvía a quien lo envió ni a su origen, ni los mensajes con destino.
+        Devuelve el número de peers a los que se encoló.
+        """
+        ttl = message.get('ttl', 1) - 1
+        if ttl <= 0 or message.get('target_id'):
+            return 0
+        origin = message.get('sender_id')
+        candidates = [peer_id for peer_id, websocket in list(self.peers.items())
+                      if websocket is not sender_websocket and peer_id != origin]
+        if P2PProtocol.is_chat_batch(message):
+            # Un peer antiguo no entiende lotes de chat
+            candidates = [peer_id for peer_id in candidates if 'chat_batch' in self.peer_features.get(peer_id, ())]
+        if len(candidates) > self.gossip_fanout:
+            candidates = random.sample(candidates, self.gossip_fanout)
+        if not candidates:
+            return 0
+        
+        queued = self._enqueue(dict(message, ttl=ttl), candidates)
+        self.relayed += queued
+        return queued
+    
+    def _enqueue(self, message, peer_ids):
+        """Encolar un mensaje construido a varios peers, serializado una vez por formato"""
+        droppable = message.get('type') == P2PProtocol.MESSAGE_TYPES['CHAT']
+        encoded = {}
+        queued = 0
+        for peer_id in peer_ids:
+            send_queue = self.send_queues.get(peer_id)
+            if not send_queue:
+                continue
+            wire_format = self.peer_formats.get(peer_id, 'json')
+            if wire_format not in encoded:
+                try:
+                    encoded[wire_format] = P2PProtocol.encode_message(message, wire_format)
+                except Exception as e:
+                    # Se descarta solo este mensaje; las conexiones siguen abiertas
+                    print(f"⚠️ Mensaje {message.get('message_id')} no serializable en {wire_format}: {e}")
+                    encoded[wire_format] = None
+            raw_message = encoded[wire_format]
+            if raw_message is not None and send_queue.put(raw_message, droppable):
+                queued += 1
+        return queued
+    
+    def gossip_stats(self):
+        """Reenvíos y duplicados descartados"""
+        return {
+            'relayed': self.relayed,
+            'duplicates': self.seen_messages.duplicates,
+            'seen': len(self.seen_messages),
+            'fanout': self.gossip_fanout
+        }
+    
     async def handle_discovery(self, message, sender_websocket):
         """Manejar mensaje de descubrimiento"""
         content = message.get('content', {})
@@ -122,30 +305,97 @@ class P2PNode:
         action = content.get('action')
         
         if action == 'join' and sender_id:
-            self.peers[sender_id] = sender_websocket
-            print(f" Nuevo peer registrado: {sender_id}")
+            self.add_peer(sender_id, sender_websocket)
+            # Un peer antiguo no anuncia formatos: se queda en JSON
+            wire_format = P2PProtocol.negotiate_format(content.get('formats'), self.wire_formats,
+                                                       content.get('wire_version'))
+            self.peer_formats[sender_id] = wire_format
+            self.peer_features[sender_id] = set(content.get('features') or ())
+            print(f" Nuevo peer registrado: {sender_id} ({wire_format})")
             
-            # Responder con confirmación
+            # Responder con confirmación (siempre en JSON, que entiende cualquier versión)
             response = P2PProtocol.create_message(
                 P2PProtocol.MESSAGE_TYPES['DISCOVERY'],
-                {'node_id': self.node_id, 'action': 'welcome'},
+                {'node_id': self.node_id, 'action': 'welcome', 'format': wire_format,
+                 'wire_version': P2PProtocol.WIRE_VERSION, 'features': list(P2PProtocol.FEATURES)},
                 self.node_id,
                 sender_id
             )
             await sender_websocket.send(response)
+        
+        elif action == 'welcome':
+            # Respuesta a nuestro join: el peer eligió el formato (ausente en peers antiguos)
+            wire_format = content.get('format', 'json')
+            if wire_format not in self.wire_formats or (
+                    wire_format == 'binary' and content.get('wire_version') != P2PProtocol.WIRE_VERSION):
+                wire_format = 'json'
+            for peer_id, peer_ws in list(self.peers.items()):
+                if peer_ws is sender_websocket:
+                    self.peer_formats[peer_id] = wire_format
+                    self.peer_features[peer_id] = set(content.get('features') or ())
     
     async def handle_heartbeat(self, message, sender_websocket):
-        """Manejar latido de corazón"""
+        """Manejar latido de corazón
+
+        Un ping se contesta con un pong con el mismo seq. Un pong (o la respuesta
+        sin 'kind' de un nodo antiguo) cuenta como latido del peer y da su RTT.
+        """
         sender_id = message.get('sender_id')
+        content = message.get('content') or {}
+        kind = content.get('kind')
+        
+        if kind == 'pong' or (kind is None and content.get('status') == 'alive'):
+            self._record_pong(sender_websocket, content.get('seq'))
+            return
+        
         # Responder con heartbeat
         response = P2PProtocol.create_message(
             P2PProtocol.MESSAGE_TYPES['HEARTBEAT'],
-            {'status': 'alive', 'timestamp': datetime.now().isoformat()},
+            {'kind': 'pong', 'seq': content.get('seq'), 'status': 'alive', 'timestamp': datetime.now().isoformat()},
             self.node_id,
             sender_id
         )
         await sender_websocket.send(response)
     
+    def _record_pong(self, websocket, seq):
+        now = time.monotonic()
+        for peer_id, peer_ws in list(self.peers.items()):
+            if peer_ws is not websocket:
+                continue
+            detector = self.detectors.get(peer_id)
+            ping = self._pings.get(peer_id)
+            if detector is None:
+                continue
+            # Sin seq (nodo antiguo) se mide desde el último ping enviado
+            rtt = now - ping[1] if ping and (seq is None or seq == ping[0]) else None
+            detector.heartbeat(now, rtt)
+    
+    async def _heartbeat_loop(self):
+        """Enviar pings periódicos y retirar los peers que dejan de responder"""
+        while self.running:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.check_peers()
+            self.send_pings()
+    
+    def send_pings(self):
+        heartbeat_type = P2PProtocol.MESSAGE_TYPES['HEARTBEAT']
+        for peer_id in list(self.send_queues):
+            self._ping_seq += 1
+            self._pings[peer_id] = (self._ping_seq, time.monotonic())
+            built = P2PProtocol.build_message(heartbeat_type, {'kind': 'ping', 'seq': self._ping_seq}, self.node_id, peer_id)
+            self._enqueue(built, [peer_id])
+    
+    def check_peers(self):
+        """Retirar (y reconectar si son salientes) los peers que el detector da por caídos"""
+        now = time.monotonic()
+        for peer_id, detector in list(self.detectors.items()):
+            if detector.is_available(now):
+                continue
+            send_queue = self.send_queues.get(peer_id)
+            if send_queue:
+                send_queue.disconnect()
+            self._peer_lost(peer_id, f"sin latidos (phi {detector.phi(now):.1f}, {now - detector.last_heartbeat:.1f}s)")
+    
     async def handle_alert(self, message, sender_websocket):
         """Manejar alerta crítica recibida"""
         sender_id = message.get('sender_id')
@@ -163,41 +413,44 @@ class P2PNode:
         """Manejar mensaje de chat compartido"""
         sender_id = message.get('sender_id')
         content = message.get('content', {})
+        # Una conversación, o un lote de ellas (lista) si el peer agrupa los chats
+        chats = content if isinstance(content, list) else [content]
         
-        print(f"\n CHAT COMPARTIDO POR {sender_id}:")
-        print(f"   Usuario: {content.get('user_input', 'N/A')}")
-        print(f"   Bot: {content.get('bot_response', 'N/A')}")
+        print(f"\n CHAT COMPARTIDO POR {sender_id}" + (f" ({len(chats)} conversaciones):" if len(chats) > 1 else ":"))
+        for chat in chats:
+            print(f"   Usuario: {chat.get('user_input', 'N/A')}")
+            print(f"   Bot: {chat.get('bot_response', 'N/A')}")
         print("-" * 30)
     
     async def broadcast_message(self, message_type, content, target_id=None):
-        """Enviar mensaje a todos los peers o a uno específico"""
+        """Enviar mensaje a todos los peers o a uno específico
+
+        Solo encola en la cola de cada peer (no espera a la red): un peer lento
+        no retrasa a los demás. Devuelve el número de peers a los que se encoló.
+        """
         if not self.peers:
             print("⚠️ No hay peers conectados para enviar mensaje")
-            return
+            return 0
         
-        message = P2PProtocol.create_message(message_type, content, self.node_id, target_id)
-        
-        if target_id and target_id in self.peers:
+        if target_id and target_id in self.send_queues:
             # Enviar a peer específico
-            try:
-                await self.peers[target_id].send(message)
-                print(f" Mensaje enviado a {target_id}")
-            except Exception as e:
-                print(f"❌ Error enviando a {target_id}: {e}")
+            targets = [target_id]
         else:
             # Broadcast a todos los peers
-            disconnected_peers = []
-            for peer_id, websocket in self.peers.items():
-                try:
-                    await websocket.send(message)
-                    print(f" Mensaje enviado a {peer_id}")
-                except Exception as e:
-                    print(f"❌ Error enviando a {peer_id}: {e}")
-                    disconnected_peers.append(peer_id)
-            
-            # Limpiar peers desconectados
-            for peer_id in disconnected_peers:
-                del self.peers[peer_id]
+            targets = list(self.send_queues)
+        
+        return self._send_new(message_type, content, targets, target_id)
+    
+    def _send_new(self, message_type, content, peer_ids, target_id=None):
+        built = P2PProtocol.build_message(message_type, content, self.node_id, target_id)
+        if message_type in P2PProtocol.RELAYED_TYPES:
+            # Los ecos que vuelvan por otros nodos se descartan como duplicados
+            self.seen_messages.add(built['message_id'])
+        return self._enqueue(built, peer_ids)
+    
+    def queue_stats(self):
+        """Profundidad y descartes de la cola de salida de cada peer"""
+        return {peer_id: send_queue.stats() for peer_id, send_queue in list(self.send_queues.items())}
     
     async def broadcast_alert(self, alerts):
         """Enviar alerta crítica a todos los peers"""
@@ -207,24 +460,107 @@ class P2PNode:
         )
     
     async def share_chat(self, user_input, bot_response):
-        """Compartir conversación con peers"""
+        """Compartir conversación con peers
+
+        No espera a la red: la conversación se acumula y flush_chats() la envía
+        junto con las demás en una sola trama, al pasar chat_flush_interval o
+        al juntar chat_batch_size.
+        """
         content = {
             'user_input': user_input,
             'bot_response': bot_response,
             'context': 'financial_chat',
             'timestamp': datetime.now().isoformat()
         }
-        await self.broadcast_message(
-            P2PProtocol.MESSAGE_TYPES['CHAT'],
-            content
-        )
+        with self._chat_lock:
+            self._chat_buffer.append(content)
+            full = len(self._chat_buffer) >= self.chat_batch_size
+            schedule = not full and not self._chat_flush_pending
+            if schedule:
+                self._chat_flush_pending = True
+        if full:
+            self.flush_chats()
+        elif schedule:
+            self._schedule_chat_flush()
     
-    def get_connected_peers(self):
-        """Obtener lista de peers conectados"""
-        return list(self.peers.keys())
+    def _schedule_chat_flush(self):
+        # En el loop del servidor si está activo (el de quien llama puede cerrarse antes del plazo)
+        running = asyncio.get_running_loop()
+        loop = self.loop if self.loop is not None and self.loop.is_running() else running
+        if loop is running:
+            loop.call_later(self.chat_flush_interval, self.flush_chats)
+        else:
+            loop.call_soon_threadsafe(loop.call_later, self.chat_flush_interval, self.flush_chats)
+    
+    def flush_chats(self):
+        """Enviar los chats acumulados; devuelve cuántos se enviaron
+
+        Los peers que anunciaron 'chat_batch' reciben una trama CHAT con la
+        lista; los antiguos, una trama por conversación.
+        """
+        with self._chat_lock:
+            chats, self._chat_buffer = self._chat_buffer, []
+            self._chat_flush_pending = False
+        if not chats or not self.send_queues:
+            return 0
+        
+        chat_type = P2PProtocol.MESSAGE_TYPES['CHAT']
+        peer_ids = list(self.send_queues)
+        if len(chats) == 1:
+            self._send_new(chat_type, chats[0], peer_ids)
+        else:
+            batch_peers = [peer_id for peer_id in peer_ids if 'chat_batch' in self.peer_features.get(peer_id, ())]
+            legacy_peers = [peer_id for peer_id in peer_ids if peer_id not in batch_peers]
+            if batch_peers:
+                self._send_new(chat_type, chats, batch_peers)
+            if legacy_peers:
+                for chat in chats:
+                    self._send_new(chat_type, chat, legacy_peers)
+        self.chat_flushes += 1
+        self.chats_shared += len(chats)
+        return len(chats)
+    
+    def chat_stats(self):
+        """Chats compartidos y tramas usadas"""
+        return {
+            'shared': self.chats_shared,
+            'flushes': self.chat_flushes,
+            'avg_batch': self.chats_shared / self.chat_flushes if self.chat_flushes else 0.0,
+            'pending': len(self._chat_buffer)
+        }
+    
+    def get_connected_peers(self, detailed=False):
+        """Obtener lista de peers conectados
+
+        Con detailed=True, un diccionario por peer con su estado según los
+        latidos (alive, phi, RTT en ms, segundos desde el último latido).
+        """
+        if not detailed:
+            return list(self.peers.keys())
+        
+        now = time.monotonic()
+        peers = []
+        for peer_id in list(self.peers):
+            detector = self.detectors.get(peer_id)
+            if detector is None:
+                continue
+            send_queue = self.send_queues.get(peer_id)
+            peers.append({
+                'peer_id': peer_id,
+                'alive': detector.is_available(now),
+                'phi': round(detector.phi(now), 2),
+                'rtt_ms': round(detector.rtt * 1000, 2) if detector.rtt is not None else None,
+                'last_heartbeat': round(now - detector.last_heartbeat, 2),
+                'outbound': peer_id in self.outbound,
+                'format': self.peer_formats.get(peer_id, 'json'),
+                'queue_depth': send_queue.depth if send_queue else 0
+            })
+        return peers
     
     def stop(self):
         """Detener el nodo"""
         self.running = False
+        for peer_id in list(self.send_queues):
+            self.remove_peer(peer_id)
         if self.server:
             self.server.close()
\ No newline at end of file
@@ -1,7 +1,22 @@
 import json
-import time
+import struct
+import uuid
 from datetime import datetime
 
+# Trama binaria: cabecera fija + campos con prefijo de longitud
+#   versión B, tipo B, flags B, ttl B, timestamp q (microsegundos desde epoch)
+#   message_id: 16 bytes si es un UUID (FLAG_UUID_ID), si no B longitud + utf-8
+#   sender_id: H longitud + utf-8; target_id (solo con FLAG_TARGET): H longitud + utf-8
+#   content: I longitud + JSON compacto utf-8
+_HEADER = struct.Struct('!BBBBq')
+_SHORT = struct.Struct('!H')
+_LONG = struct.Struct('!I')
+FLAG_TARGET = 1
+FLAG_UUID_ID = 2
+# Un solo codificador: json.dumps con opciones crea uno nuevo en cada llamada
+_CONTENT_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+_CONTENT_DECODER = json.JSONDecoder()
+
 class P2PProtocol:
     """Protocolo de comunicación para red P2P"""
     
@@ -14,33 +29,193 @@ class P2PProtocol:
         'HEARTBEAT': 'heartbeat'
     }
     
+    # Tipos que se reenvían entre nodos (gossip) y saltos que puede dar un mensaje
+    RELAYED_TYPES = {MESSAGE_TYPES['ALERT'], MESSAGE_TYPES['CHAT']}
+    DEFAULT_TTL = 6
+    
+    # Formato binario: se negocia en DISCOVERY; JSON para peers que no lo anuncian
+    WIRE_VERSION = 1
+    WIRE_FORMATS = ('binary', 'json')  # por preferencia
+    TYPE_CODES = {
+        'chat_request': 1,
+        'critical_alert': 2,
+        'db_query': 3,
+        'node_discovery': 4,
+        'response': 5,
+        'heartbeat': 6
+    }
+    TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+    
+    # Capacidades que se anuncian en DISCOVERY; chat_batch: CHAT con una lista de conversaciones
+    FEATURES = ('chat_batch',)
+    
     @staticmethod
-    def create_message(msg_type, content, sender_id, target_id=None):
-        """Crear mensaje estructurado para P2P"""
-        message = {
+    def build_message(msg_type, content, sender_id, target_id=None, ttl=None):
+        """Mensaje estructurado para P2P, sin serializar
+
+        message_id es un UUID: único aunque dos mensajes salgan en el mismo
+        milisegundo. ttl son los saltos que aún puede dar al reenviarse.
+        """
+        return {
             'type': msg_type,
             'sender_id': sender_id,
             'target_id': target_id,
             'content': content,
             'timestamp': datetime.now().isoformat(),
-            'message_id': f"{sender_id}_{int(time.time() * 1000)}"
+            'message_id': uuid.uuid4().hex,
+            'ttl': P2PProtocol.DEFAULT_TTL if ttl is None else ttl
         }
+    
+    @staticmethod
+    def encode_message(message, wire_format='json'):
+        """Serializar un mensaje ya construido (o recibido, para reenviarlo)
+
+        'binary' produce bytes (trama binaria de WebSocket); 'json', texto.
+        Un tipo sin código binario se envía en JSON.
+        """
+        if wire_format == 'binary' and message.get('type') in P2PProtocol.TYPE_CODES:
+            return P2PProtocol.encode_binary(message)
         return json.dumps(message)
     
+    @staticmethod
+    def encode_binary(message):
+        """Mensaje -> trama binaria (ver _HEADER)"""
+        flags = 0
+        message_id = message.get('message_id') or ''
+        try:
+            id_field = bytes.fromhex(message_id) if len(message_id) == 32 else None
+        except ValueError:
+            id_field = None
+        if id_field is not None:
+            flags |= FLAG_UUID_ID
+        else:
+            encoded_id = message_id.encode('utf-8')
+            id_field = bytes([len(encoded_id)]) + encoded_id
+        
+        sender = (message.get('sender_id') or '').encode('utf-8')
+        parts = [None, id_field, _SHORT.pack(len(sender)), sender]
+        target_id = message.get('target_id')
+        if target_id is not None:
+            flags |= FLAG_TARGET
+            target = str(target_id).encode('utf-8')
+            parts += [_SHORT.pack(len(target)), target]
+        content = _CONTENT_ENCODER.encode(message.get('content')).encode('utf-8')
+        parts += [_LONG.pack(len(content)), content]
+        
+        timestamp = message.get('timestamp')
+        micros = round(datetime.fromisoformat(timestamp).timestamp() * 1e6) if timestamp else 0
+        ttl = min(max(message.get('ttl', 1), 0), 255)
+        parts[0] = _HEADER.pack(P2PProtocol.WIRE_VERSION, P2PProtocol.TYPE_CODES[message['type']], flags, ttl, micros)
+        return b''.join(parts)
+    
+    @staticmethod
+    def decode_binary(raw_message):
+        """Trama binaria -> mensaje (mismo diccionario que el formato JSON); None si no es válida"""
+        try:
+            data = raw_message if isinstance(raw_message, bytes) else bytes(raw_message)
+            version, type_code, flags, ttl, micros = _HEADER.unpack_from(data)
+            if version != P2PProtocol.WIRE_VERSION or type_code not in P2PProtocol.TYPE_NAMES:
+                return None
+            offset = _HEADER.size
+            if flags & FLAG_UUID_ID:
+                message_id = data[offset:offset + 16].hex()
+                offset += 16
+            else:
+                length = data[offset]
+                message_id = data[offset + 1:offset + 1 + length].decode('utf-8')
+                offset += 1 + length
+            (length,) = _SHORT.unpack_from(data, offset)
+            sender_id = data[offset + 2:offset + 2 + length].decode('utf-8')
+            offset += 2 + length
+            target_id = None
+            if flags & FLAG_TARGET:
+                (length,) = _SHORT.unpack_from(data, offset)
+                target_id = data[offset + 2:offset + 2 + length].decode('utf-8')
+                offset += 2 + length
+            (length,) = _LONG.unpack_from(data, offset)
+            if offset + 4 + length != len(data):
+                return None
+            content = _CONTENT_DECODER.decode(data[offset + 4:].decode('utf-8'))
+            # micros / 1e6 es exacto al microsegundo para fechas de este siglo
+            timestamp = datetime.fromtimestamp(micros / 1e6).isoformat()
+        except (struct.error, IndexError, UnicodeDecodeError, ValueError, OverflowError, OSError):
+            return None
+        return {
+            'type': P2PProtocol.TYPE_NAMES[type_code],
+            'sender_id': sender_id,
+            'target_id': target_id,
+            'content': content,
+            'timestamp': timestamp,
+            'message_id': message_id,
+            'ttl': ttl
+        }
+    
+    @staticmethod
+    def is_chat_batch(message):
+        return message.get('type') == P2PProtocol.MESSAGE_TYPES['CHAT'] and isinstance(message.get('content'), list)
+    
+    @staticmethod
+    def negotiate_format(offered, supported=None, wire_version=None):
+        """Formato común preferido con un peer que anunció offered (None: peer antiguo, JSON)
+
+        El binario solo se elige si el peer usa la misma versión de trama
+        (wire_version); con otra, decode_binary descartaría sus mensajes.
+        """
+        for wire_format in supported or P2PProtocol.WIRE_FORMATS:
+            if wire_format == 'binary' and wire_version != P2PProtocol.WIRE_VERSION:
+                continue
+            if wire_format in (offered or ()):
+                return wire_format
+        return 'json'
+    
+    @staticmethod
+    def create_message(msg_type, content, sender_id, target_id=None, ttl=None):
+        """Crear mensaje estructurado para P2P"""
+        return P2PProtocol.encode_message(
+            P2PProtocol.build_message(msg_type, content, sender_id, target_id, ttl)
+        )
+    
     @staticmethod
     def parse_message(raw_message):
-        """Parsear mensaje recibido"""
+        """Parsear mensaje recibido (texto JSON o trama binaria)"""
+        if isinstance(raw_message, (bytes, bytearray, memoryview)):
+            return P2PProtocol.decode_binary(raw_message)
         try:
             message = json.loads(raw_message)
             required_fields = ['type', 'sender_id', 'content', 'timestamp']
             
-            if all(field in message for field in required_fields):
-                return message
+            if isinstance(message, dict) and all(field in message for field in required_fields):
+                return P2PProtocol._validate_fields(message)
             else:
                 return None
         except json.JSONDecodeError:
             return None
     
+    @staticmethod
+    def _validate_fields(message):
+        """Mensaje JSON con campos que se pueden reenviar en cualquier formato, o None
+
+        Un mensaje recibido se reenvía tal cual a otros peers (quizá en binario):
+        lo que no cabe en la trama se rechaza al recibirlo y el ttl se convierte
+        a entero, para que un peer no pueda hacer fallar el reenvío.
+        """
+        sender_id, message_id, target_id = message['sender_id'], message.get('message_id'), message.get('target_id')
+        if not isinstance(message['type'], str) or not isinstance(sender_id, str):
+            return None
+        if len(sender_id.encode('utf-8')) > 0xFFFF:
+            return None
+        if target_id is not None and (not isinstance(target_id, str) or len(target_id.encode('utf-8')) > 0xFFFF):
+            return None
+        if message_id is not None and (not isinstance(message_id, str) or len(message_id.encode('utf-8')) > 255):
+            return None
+        try:
+            datetime.fromisoformat(message['timestamp']).timestamp()
+            if 'ttl' in message:
+                message['ttl'] = min(max(int(message['ttl']), 0), 255)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return None
+        return message
+    
     @staticmethod
     def create_alert_message(alert_data, sender_id):
         """Crear mensaje de alerta crítica"""
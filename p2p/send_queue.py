@@ -0,0 +1,157 @@
+import asyncio
+from collections import deque
+
+# Qué hacer cuando la cola de un peer está llena
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_chat_first', 'disconnect')
+
+
+class PeerSendQueue:
+    """Cola de salida acotada de un peer, vaciada por su propia tarea de escritura
+
+    put() no espera a la red: encola y vuelve, así que un peer lento solo
+    retrasa sus propios mensajes. La tarea de escritura vive en el event loop
+    donde se registró la conexión (el dueño del websocket); desde otro hilo o
+    loop, put() se delega con call_soon_threadsafe.
+
+    Con la cola llena (maxsize mensajes):
+    - drop_oldest: se descarta el mensaje más antiguo
+    - drop_chat_first: se descarta el chat más antiguo; si solo hay alertas,
+      un chat nuevo se descarta y una alerta nueva desplaza a la más antigua
+    - disconnect: se cierra la conexión (el peer no da abasto)
+
+    on_failure(peer_id, cola) se llama si el envío falla o se desconecta por
+    desbordamiento, para que el nodo retire al peer.
+    """
+
+    def __init__(self, peer_id, websocket, maxsize=256, policy='drop_chat_first', on_failure=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de cola desconocida: {policy} (opciones: {', '.join(OVERFLOW_POLICIES)})")
+        self.peer_id = peer_id
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_failure = on_failure
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.closed = False
+        self._messages = deque()  # (es_chat, mensaje)
+        self._ready = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._writer())
+
+    @property
+    def depth(self):
+        return len(self._messages)
+
+    def put(self, message, droppable=False):
+        """Encolar un mensaje ya serializado; droppable marca los chats
+
+        Devuelve False si la cola está cerrada o su loop ya no corre.
+        """
+        if self.closed:
+            return False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._put(message, droppable)
+            return True
+        if not self._loop.is_running():
+            # El loop dueño de la conexión se detuvo: nadie vaciaría la cola
+            self._fail()
+            return False
+        try:
+            self._loop.call_soon_threadsafe(self._put, message, droppable)
+        except RuntimeError:
+            # El loop dueño de la conexión terminó: el peer ya no es alcanzable
+            self._fail()
+            return False
+        return True
+
+    def close(self):
+        """Detener la tarea de escritura y descartar lo pendiente"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:
+            pass
+        self._messages.clear()
+
+    def disconnect(self):
+        """Cerrar la conexión del peer (en el loop dueño del websocket) y la cola"""
+        if not self.closed:
+            try:
+                self._loop.call_soon_threadsafe(self._loop.create_task, self.websocket.close())
+            except RuntimeError:
+                pass
+        self.close()
+
+    def stats(self):
+        """Métricas de la cola"""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'policy': self.policy
+        }
+
+    def _put(self, message, droppable):
+        if self.closed:
+            return
+        messages = self._messages
+        if len(messages) >= self.maxsize:
+            if self.policy == 'disconnect':
+                self.dropped += len(messages) + 1
+                print(f"⚠️ Cola de {self.peer_id} llena ({self.maxsize}), desconectando peer lento")
+                self._loop.create_task(self.websocket.close())
+                self._fail()
+                return
+            if not self._make_room(droppable):
+                self.dropped += 1
+                return
+        messages.append((droppable, message))
+        if len(messages) > self.max_depth:
+            self.max_depth = len(messages)
+        self._ready.set()
+
+    def _make_room(self, droppable):
+        """Descartar un mensaje encolado según la política; False si se descarta el nuevo"""
+        messages = self._messages
+        if self.policy == 'drop_chat_first':
+            for position, (is_chat, _) in enumerate(messages):
+                if is_chat:
+                    del messages[position]
+                    self.dropped += 1
+                    return True
+            if droppable:
+                return False
+        messages.popleft()
+        self.dropped += 1
+        return True
+
+    async def _writer(self):
+        messages = self._messages
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while messages:
+                _, message = messages.popleft()
+                try:
+                    await self.websocket.send(message)
+                except Exception as e:
+                    print(f"❌ Error enviando a {self.peer_id}: {e}")
+                    self._fail()
+                    return
+                self.sent += 1
+
+    def _fail(self):
+        if self.closed:
+            return
+        self.close()
+        if self.on_failure:
+            self.on_failure(self.peer_id, self)
@@ -1,8 +1,38 @@
 import sys
 import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database.financial_db import FinancialDatabase
+from database.name_resolver import NameResolver
+
+# Regla de actividad sospechosa tal como estaba antes del agregado horario
+ORIGINAL_SUSPICIOUS_SQL = '''
+    SELECT account_id, SUM(ABS(amount)) as total_amount
+    FROM transactions 
+    WHERE timestamp > datetime('now', '-24 hours')
+    AND amount < 0
+    GROUP BY account_id
+    HAVING total_amount > 10000
+'''
+
+def temp_database(**kwargs):
+    """FinancialDatabase vacía en un directorio temporal"""
+    directory = tempfile.mkdtemp(prefix="financial_test_")
+    return FinancialDatabase(os.path.join(directory, "test.db"), sample_data=False, **kwargs)
+
+def insert_accounts(db, names):
+    """Insertar cuentas (account_id desde 1) e indexar sus nombres"""
+    with db.pool.write() as conn:
+        conn.executemany('''
+            INSERT INTO accounts (account_id, user_name, balance, account_type)
+            VALUES (?, ?, 1000.0, 'checking')
+        ''', list(enumerate(names, 1)))
+    db.index_account_names()
 
 def test_financial_database():
     print("🔧 Probando base de datos financiera...")
@@ -28,7 +58,235 @@ def test_financial_database():
     print("\n Probando alertas:")
     print(db.get_all_alerts())
     
+    # Repetir la detección no debe duplicar alertas abiertas
+    print("\n Probando deduplicación de alertas:")
+    count_open = '''
+        SELECT COUNT(*), COUNT(DISTINCT account_id || '/' || alert_type)
+        FROM critical_alerts WHERE resolved = FALSE
+    '''
+    with db.pool.read() as conn:
+        first_open, _ = conn.execute(count_open).fetchone()
+    db.detect_critical_conditions()
+    with db.pool.read() as conn:
+        open_alerts, distinct_alerts = conn.execute(count_open).fetchone()
+    print(f"  Alertas abiertas tras dos detecciones: {open_alerts}")
+    assert open_alerts == first_open, "repetir la detección duplicó alertas"
+    assert open_alerts == distinct_alerts, "hay más de una alerta abierta por cuenta y tipo"
+    assert open_alerts >= len(alerts)
+    
+    # Consultas repetidas se sirven desde la cache de lecturas
+    print("\n Probando cache de lecturas:")
+    db.get_account_balance('Juan')
+    db.get_account_balance('Juan')
+    stats = db.cache_stats()
+    print(f"  {stats}")
+    assert stats['hits'] >= 1
+    
     print("\n✅ Pruebas completadas!")
 
+def test_outflow_aggregate():
+    print("🔧 Probando agregado horario de salidas...")
+    db = temp_database()
+    insert_accounts(db, [f"Cliente {i}" for i in range(1, 21)])
+    rnd = random.Random(3)
+    
+    with db.pool.write() as conn:
+        now = datetime.strptime(conn.execute("SELECT datetime('now')").fetchone()[0], '%Y-%m-%d %H:%M:%S')
+        conn.executemany('''
+            INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp)
+            VALUES (?, ?, 'transfer', 'test', ?)
+        ''', [
+            (rnd.randint(1, 20), rnd.choice([-1, 1]) * round(rnd.uniform(10, 4000), 2),
+             (now - timedelta(minutes=rnd.randint(0, 48 * 60))).strftime('%Y-%m-%d %H:%M:%S'))
+            for _ in range(600)
+        ])
+        # Los triggers también deben mantener el agregado en borrados y modificaciones
+        conn.execute("DELETE FROM transactions WHERE transaction_id % 7 = 0")
+        conn.execute("UPDATE transactions SET amount = -amount WHERE transaction_id % 5 = 0")
+        conn.execute("UPDATE transactions SET timestamp = datetime(timestamp, '-3 hours') WHERE transaction_id % 11 = 0")
+        conn.execute("UPDATE transactions SET account_id = 1 WHERE transaction_id % 13 = 0")
+    
+    with db.pool.read() as conn:
+        cursor = conn.cursor()
+        alerts = db._detect_alerts(cursor)
+        expected = {account_id: round(total, 2) for account_id, total in cursor.execute(ORIGINAL_SUSPICIOUS_SQL)}
+    found = {alert["account_id"]: round(alert["data"]["total_amount"], 2)
+             for alert in alerts if alert["type"] == "ACTIVIDAD_SOSPECHOSA"}
+    print(f"  Cuentas sospechosas: {len(found)} (consulta original: {len(expected)})")
+    assert expected, "el conjunto de prueba debe disparar la regla"
+    assert found == expected
+    
+    # Lo mantenido por los triggers coincide con recalcularlo desde transactions
+    buckets_sql = "SELECT bucket, account_id, ROUND(total_outflow, 2) FROM account_outflow_buckets WHERE ABS(total_outflow) > 0.001 ORDER BY 1, 2"
+    with db.pool.read() as conn:
+        maintained = conn.execute(buckets_sql).fetchall()
+    db.rebuild_outflow_buckets()
+    with db.pool.read() as conn:
+        rebuilt = conn.execute(buckets_sql).fetchall()
+    assert maintained == rebuilt
+    db.close()
+    print("✅ Agregado de salidas correcto")
+
+def test_account_name_resolution():
+    print("🔧 Probando resolución de nombres con varias coincidencias...")
+    names = (["Juan Pérez", "Cliente 2", "Alvarezito Ruiz"] + [f"Cliente {i}" for i in range(4, 10)]
+             + ["Juan Alvarez", "Ana Perez Alvarez"] + [f"Juan Gómez {i}" for i in range(12, 2100)])
+    db = temp_database()
+    insert_accounts(db, names)
+    
+    with db.pool.read() as conn:
+        cursor = conn.cursor()
+        # "juan alvarez" va antes que "juan perez" en el índice: el empate lo decide el account_id
+        assert db._find_account_id(cursor, "Juan") == 1
+        assert db._find_account_id(cursor, "juan") == 1
+        assert db._find_account_id(cursor, "Juan Alvarez") == 10
+        # Búsqueda por palabra: "alvarez" está en 10 y 11, "perez" en 1 y 11
+        assert db._find_account_id(cursor, "Alvarez") == 10
+        assert db._find_account_id(cursor, "perez") == 1
+        assert db._find_account_id(cursor, "Pedro") is None
+        # Una palabra completa gana a un prefijo con menor account_id ("alvarezito")
+        assert db._find_account_id(cursor, "alvarez") == 10
+        # Palabras incompletas: se buscan por prefijo
+        assert db._find_account_id(cursor, "alvar") == 3
+        assert db._find_account_id(cursor, "juan alv") == 10
+        assert db._find_account_id(cursor, "perez alv") == 11
+        # Con miles de "juan", la frase se resuelve con la palabra mas selectiva
+        assert db._find_account_id(cursor, "juan gomez 2050") == 2050
+        assert db._find_account_id(cursor, "Cliente 7") == 7
+    
+    resolver = NameResolver(db)
+    resolver.refresh()
+    for name in ("Juan", "Alvarez", "perez", "Juan Gomez 2050"):
+        assert resolver.resolve(name) == db._resolve_account_id(name), name
+    db.close()
+    print("✅ Gana la cuenta de menor account_id")
+
+def test_name_resolver_follows_accounts():
+    print("🔧 Probando actualización del índice de titulares...")
+    db = temp_database()
+    insert_accounts(db, ["Juan Pérez", "Maria Gonzalez", "Ana Martinez"])
+    resolver = NameResolver(db)
+    generation = resolver.refresh()
+    assert resolver.find("saldo de maria") == (2, "maria")
+    
+    # Transacciones y alertas no tocan las cuentas: no se relee nada
+    with db.pool.write() as conn:
+        conn.execute("INSERT INTO transactions (account_id, amount, transaction_type) VALUES (1, -5.0, 'transfer')")
+    assert resolver.refresh() == generation
+    
+    # Alta con account_id nuevo: se añade en la misma consulta
+    with db.pool.write() as conn:
+        conn.execute("INSERT INTO accounts (account_id, user_name, balance, account_type) VALUES (4, 'Lucía Rojas', 1.0, 'checking')")
+    assert resolver.find("Saldo de Lucia") == (4, "lucia")
+    assert resolver.refresh() > generation
+    
+    # Renombre: se reconstruye en segundo plano y find() responde con el índice anterior mientras tanto
+    release = threading.Event()
+    build = resolver._build
+    def slow_build(changes):
+        if threading.current_thread().name == "name-resolver":
+            release.wait(5)
+        return build(changes)
+    resolver._build = slow_build
+    with db.pool.write() as conn:
+        conn.execute("UPDATE accounts SET user_name = 'Marta Gonzalez' WHERE account_id = 2")
+    started = time.perf_counter()
+    assert resolver.find("saldo de maria") == (2, "maria")
+    assert time.perf_counter() - started < 1
+    release.set()
+    resolver.wait()
+    assert resolver.find("saldo de maria") is None
+    assert resolver.find("saldo de marta") == (2, "marta")
+    
+    # Bajas y altas con un account_id intermedio también reconstruyen el índice
+    with db.pool.write() as conn:
+        conn.execute("DELETE FROM accounts WHERE account_id = 1")
+    resolver.refresh()
+    resolver.wait()
+    assert resolver.find("Juan") is None
+    with db.pool.write() as conn:
+        conn.execute("INSERT INTO accounts (account_id, user_name, balance, account_type) VALUES (1, 'Pedro Ruiz', 1.0, 'checking')")
+    resolver.refresh()
+    resolver.wait()
+    assert resolver.find("saldo de pedro") == (1, "pedro")
+    
+    # Una carga masiva no pasa por los triggers, pero marca el cambio al terminar
+    with db.bulk_load('accounts'):
+        with db.pool.write() as conn:
+            conn.execute("UPDATE accounts SET user_name = 'Sofia Rojas' WHERE account_id = 4")
+    resolver.refresh()
+    resolver.wait()
+    assert resolver.find("lucia") is None and resolver.find("sofia") == (4, "sofia")
+    db.close()
+    print("✅ El índice solo se relee cuando cambian las cuentas")
+
+def test_transactions_pagination():
+    print("🔧 Probando paginación del historial...")
+    db = temp_database()
+    insert_accounts(db, ["Juan Pérez", "Maria Gonzalez"])
+    with db.pool.write() as conn:
+        # Varias transacciones comparten timestamp: el desempate es transaction_id
+        conn.executemany('''
+            INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp)
+            VALUES (?, ?, 'transfer', 'test', ?)
+        ''', [(1 + i % 2, -10.0 * i, f"2024-01-{1 + i // 6:02d} 10:00:00") for i in range(47)])
+        expected = [row[0] for row in conn.execute('''
+            SELECT transaction_id FROM transactions WHERE account_id = 1
+            ORDER BY timestamp DESC, transaction_id DESC
+        ''')]
+    
+    seen = []
+    page = db.get_transactions_page("Juan", limit=5)
+    pages = 1
+    while page["next_cursor"]:
+        seen.extend(t["transaction_id"] for t in page["transactions"])
+        page = db.get_transactions_page(account_id=page["account_id"], limit=5, before=page["next_cursor"])
+        pages += 1
+    seen.extend(t["transaction_id"] for t in page["transactions"])
+    
+    print(f"  {len(seen)} transacciones en {pages} páginas")
+    assert len(seen) == len(set(seen)), "las páginas no deben solaparse"
+    assert seen == expected, "las páginas deben cubrir todo el historial en orden"
+    db.close()
+    print("✅ Paginación completa y sin solapes")
+
+def test_read_cache():
+    print("🔧 Probando invalidación de la cache de lecturas...")
+    directory = tempfile.mkdtemp(prefix="financial_test_")
+    db = FinancialDatabase(os.path.join(directory, "test.db"))
+    db.detect_critical_conditions()
+    
+    first = db.get_account_balance('Juan')
+    assert db.get_account_balance('Juan') == first
+    stats = db.cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    
+    # Repetir la detección sin cambios no escribe: la cache sigue vigente
+    # (con las alertas de hace una hora, reescribir el timestamp sí sería un cambio)
+    with db.pool.write() as conn:
+        conn.execute("UPDATE critical_alerts SET timestamp = datetime('now', '-1 hour')")
+    db.get_account_balance('Juan')
+    version = db.data_version()
+    db.detect_critical_conditions()
+    assert db.data_version() == version
+    assert db.get_account_balance('Juan') == first
+    stats = db.cache_stats()
+    assert stats['hits'] == 2 and stats['invalidations'] == 1
+    
+    # Un cambio real invalida la cache y se ve en la siguiente lectura
+    with db.pool.write() as conn:
+        conn.execute("UPDATE accounts SET balance = balance + 1 WHERE account_id = 1")
+    assert db.get_account_balance('Juan') != first
+    stats = db.cache_stats()
+    print(f"  {stats}")
+    assert stats['invalidations'] == 2 and stats['misses'] == 3
+    db.close()
+    print("✅ La cache solo se invalida cuando cambian los datos")
+
 if __name__ == "__main__":
-    test_financial_database()
\ No newline at end of file
+    test_financial_database()
+    test_read_cache()
+    test_outflow_aggregate()
+    test_account_name_resolution()
+    test_name_resolver_follows_accounts()
+    test_transactions_pagination()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nlp_pipeline.enhanced_chatbot import EnhancedChatbot, TIMEOUT_MESSAGE, normalize_utterance
+
+def temp_chatbot():
+    """EnhancedChatbot sobre una base de datos de ejemplo en un directorio temporal"""
+    directory = tempfile.mkdtemp(prefix="chatbot_test_")
+    return EnhancedChatbot(os.path.join(directory, "test.db"))
+
+def add_history(chatbot, account_id, label, count):
+    with chatbot.db.pool.write() as conn:
+        conn.executemany('''
+            INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp)
+            VALUES (?, -1.0, 'transfer', ?, ?)
+        ''', [(account_id, f"{label} {i}", f"2024-01-01 10:{i:02d}:00") for i in range(count)])
+
+def test_history_sessions():
+    print("🔧 Probando historial por sesión...")
+    chatbot = temp_chatbot()
+    add_history(chatbot, 2, "pago maria", 12)
+    add_history(chatbot, 4, "pago ana", 12)
+    
+    async def conversation():
+        maria = await chatbot.process_query("Transacciones de Maria", session_id="a")
+        ana = await chatbot.process_query("Transacciones de Ana", session_id="b")
+        # Cada sesión continúa su propio historial, no el último consultado por cualquiera
+        more_maria = await chatbot.process_query("más transacciones", session_id="a")
+        more_ana = await chatbot.process_query("más transacciones", session_id="b")
+        # La misma consulta en otra sesión no hereda cursores de la cache de respuestas
+        again = await chatbot.process_query("Transacciones de Maria", session_id="c")
+        more_again = await chatbot.process_query("más transacciones", session_id="c")
+        nothing = await chatbot.process_query("más transacciones", session_id="d")
+        return maria, ana, more_maria, more_ana, again, more_again, nothing
+    
+    maria, ana, more_maria, more_ana, again, more_again, nothing = asyncio.run(conversation())
+    assert "pago maria" in maria and "pago ana" in ana
+    assert "pago maria" in more_maria and "pago ana" not in more_maria
+    assert "pago ana" in more_ana and "pago maria" not in more_ana
+    assert more_maria != maria
+    assert again == maria and more_again == more_maria
+    assert nothing == "No hay más transacciones para mostrar."
+    assert chatbot.get_transaction_cursor("a") != chatbot.get_transaction_cursor("b")
+    chatbot.db.close()
+    print("✅ Los cursores de historial no se comparten entre sesiones")
+
+def test_accents_do_not_change_intent():
+    print("🔧 Probando frases con y sin acentos...")
+    
+    async def conversation(chatbot, texts):
+        return [await chatbot.process_query(text) for text in texts]
+    
+    # Comparten clave de cache, así que el orden de llegada no puede cambiar la respuesta
+    texts = ["Información de Juan Pérez", "informacion de juan perez", "¿Información?", "informacion"]
+    results = []
+    db_path = os.path.join(tempfile.mkdtemp(prefix="chatbot_test_"), "test.db")
+    for order in (texts, texts[::-1]):
+        # Misma base (mismos datos de ejemplo), caches vacías
+        chatbot = EnhancedChatbot(db_path)
+        responses = dict(zip(order, asyncio.run(conversation(chatbot, order))))
+        results.append([responses[text] for text in texts])
+        for text in texts:
+            assert chatbot.classify_intent(normalize_utterance(text)) == "informacion_cuenta", text
+        chatbot.db.close()
+    assert results[0] == results[1]
+    assert results[0][0] == results[0][1] and results[0][2] == results[0][3]
+    assert "INFORMACIÓN DE CUENTA" in results[0][0] and "$50.00" in results[0][0]
+    print("✅ Mismo intent y respuesta en cualquier orden")
+
+def test_account_resolved_once():
+    print("🔧 Probando resolución del titular una vez por frase...")
+    chatbot = temp_chatbot()
+    resolver = chatbot.name_resolver
+    calls = []
+    find = resolver.find
+    def counted_find(text):
+        calls.append(text)
+        return find(text)
+    resolver.find = counted_find
+    
+    async def ask(text, session_id="a"):
+        return await chatbot.process_query(text, session_id=session_id)
+    
+    # El análisis guarda el account_id: ni los handlers ni las repeticiones vuelven a buscar
+    first = asyncio.run(ask("Saldo de Juan"))
+    assert len(calls) == 1
+    assert asyncio.run(ask("saldo de juan")) == first
+    assert "pago juan" not in asyncio.run(ask("Transacciones de Juan"))
+    asyncio.run(ask("Transacciones de Juan"))
+    assert len(calls) == 2
+    
+    # Si cambian las cuentas, el account_id guardado deja de valer
+    with chatbot.db.pool.write() as conn:
+        conn.execute("UPDATE accounts SET user_name = 'Pedro Ruiz' WHERE account_id = 1")
+    asyncio.run(ask("Saldo de Juan"))
+    resolver.wait()
+    assert "$50.00" not in asyncio.run(ask("Saldo de Juan"))
+    assert "$50.00" in asyncio.run(ask("Saldo de Pedro"))
+    chatbot.db.close()
+    print("✅ Un solo find() por frase y cuenta")
+
+def test_timeouts_return_message():
+    print("🔧 Probando consultas que superan el timeout...")
+    chatbot = temp_chatbot()
+    
+    async def timeout(*args, **kwargs):
+        raise asyncio.TimeoutError()
+    chatbot.async_db.run = timeout
+    
+    async def conversation():
+        # Sin nombre falla la búsqueda del titular; con nombre, la resolución de su cuenta
+        return (await chatbot.process_query("Saldo de Juan"),
+                await chatbot.process_query("Cual es mi saldo", user_name="Juan"))
+    
+    assert asyncio.run(conversation()) == (TIMEOUT_MESSAGE, TIMEOUT_MESSAGE)
+    chatbot.db.close()
+    print("✅ Los timeouts se responden con un mensaje, sin excepción")
+
+if __name__ == "__main__":
+    test_history_sessions()
+    test_accents_do_not_change_intent()
+    test_account_resolved_once()
+    test_timeouts_return_message()
@@ -0,0 +1,100 @@
+import json
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+from database.importer import main as import_main
+
+ACCOUNTS_CSV = """account_id,user_name,balance,account_type,failed_attempts
+1,Juan Pérez,50.0,checking,0
+2,María González,15000.0,savings,
+3,Carlos López,5.0,checking,5
+"""
+
+def structures(db):
+    """Índices y triggers definidos en la base"""
+    with db.pool.read() as conn:
+        return {name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL")}
+
+def outflow_buckets(db):
+    with db.pool.read() as conn:
+        return conn.execute('''
+            SELECT bucket, account_id, ROUND(total_outflow, 2) FROM account_outflow_buckets
+            WHERE ABS(total_outflow) > 0.001 ORDER BY 1, 2
+        ''').fetchall()
+
+def test_import_csv_and_jsonl():
+    print("🔧 Probando importación de CSV y JSON Lines...")
+    directory = tempfile.mkdtemp(prefix="importer_test_")
+    db_path = os.path.join(directory, "test.db")
+    accounts_path = os.path.join(directory, "cuentas.csv")
+    transactions_path = os.path.join(directory, "transacciones.jsonl")
+    with open(accounts_path, 'w', encoding='utf-8') as stream:
+        stream.write(ACCOUNTS_CSV)
+    with open(transactions_path, 'w', encoding='utf-8') as stream:
+        for i in range(30):
+            record = {'account_id': 1 + i % 3, 'amount': -1000.0 * (i % 4) + 10, 'transaction_type': 'transfer',
+                      'timestamp': f"2024-05-0{1 + i % 2} {10 + i % 5:02d}:30:00"}
+            stream.write(json.dumps(record) + "\n")
+        stream.write("\n")  # las líneas vacías se ignoran
+    
+    db = FinancialDatabase(db_path, sample_data=False)
+    expected_structures = structures(db)
+    db.close()
+    
+    import_main(['accounts', accounts_path, '--db', db_path, '--batch-size', '2'])
+    import_main(['transactions', transactions_path, '--db', db_path, '--batch-size', '7'])
+    
+    db = FinancialDatabase(db_path, sample_data=False)
+    with db.pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 30
+        assert conn.execute("SELECT failed_attempts FROM accounts WHERE account_id = 2").fetchone()[0] == 0
+        # Nombres nuevos indexados al terminar la carga
+        assert conn.execute("SELECT COUNT(*) FROM accounts WHERE name_folded IS NULL").fetchone()[0] == 0
+        assert db._find_account_id(conn.cursor(), "maria") == 2
+    # Índices y triggers recreados, y agregado recalculado
+    assert structures(db) == expected_structures
+    maintained = outflow_buckets(db)
+    assert maintained
+    db.rebuild_outflow_buckets()
+    assert outflow_buckets(db) == maintained
+    # Los triggers vuelven a mantener el agregado
+    with db.pool.write() as conn:
+        conn.execute('''
+            INSERT INTO transactions (account_id, amount, transaction_type, timestamp)
+            VALUES (1, -5.0, 'payment', '2024-05-01 10:45:00')
+        ''')
+    after_insert = outflow_buckets(db)
+    db.rebuild_outflow_buckets()
+    assert after_insert == outflow_buckets(db) != maintained
+    db.close()
+    print("✅ Datos, índices, triggers y agregado correctos tras la carga")
+
+def test_bulk_load_keeps_database_usable():
+    print("🔧 Probando consultas durante una carga masiva...")
+    directory = tempfile.mkdtemp(prefix="importer_test_")
+    db = FinancialDatabase(os.path.join(directory, "test.db"))
+    expected_structures = structures(db)
+    
+    with db.bulk_load('transactions'):
+        # Solo se eliminan los triggers: tablas e índices siguen disponibles
+        during = structures(db)
+        assert not any(name.startswith('trg_outflow') for name in during)
+        assert 'idx_transactions_timestamp' in during and 'idx_accounts_name_folded' in during
+        assert db.detect_critical_conditions()
+        assert db.get_account_balance('Juan') == "Saldo actual: $50.00 (Cuenta checking)"
+    assert structures(db) == expected_structures
+    
+    with db.bulk_load('transactions', drop_indexes=True):
+        assert 'idx_transactions_timestamp' not in structures(db)
+    assert structures(db) == expected_structures
+    db.close()
+    print("✅ La base sigue consultable durante la carga")
+
+if __name__ == "__main__":
+    test_import_csv_and_jsonl()
+    test_bulk_load_keeps_database_usable()
@@ -0,0 +1,69 @@
+import random
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nlp_pipeline.keyword_matcher import KeywordMatcher
+from database.financial_db import fold_name
+from benchmarks.bench_keyword_matcher import legacy_classify, load_tables, random_word, synthetic_tables
+
+# Keywords que se solapan entre intents: prefijos, contenidas unas en otras y con la
+# de menor prioridad más larga, para que gane el orden de las tablas y no la posición
+OVERLAPPING_TABLES = [
+    ("saldo", ["saldo", "cuanto tengo"]),
+    ("historial", ["movimientos", "transacciones", "sal"]),
+    ("alertas", ["saldo bajo", "alerta", "critic"]),
+    ("cuenta", ["cuenta", "tengo", "mov"]),
+]
+
+def test_overlapping_priorities():
+    print("🔧 Probando prioridad de keywords solapadas...")
+    matcher = KeywordMatcher(OVERLAPPING_TABLES)
+    cases = {
+        "alerta de saldo bajo": "saldo",
+        "Saldo bajo en mi cuenta": "saldo",
+        "salida de dinero": "historial",
+        "alertas criticas": "alertas",
+        "mi cuenta": "cuenta",
+        "cuanto tengo": "saldo",
+        "tengo movimientos": "historial",
+        "movil": "cuenta",
+        "hola": None,
+        "": None,
+    }
+    for text, expected in cases.items():
+        assert legacy_classify(OVERLAPPING_TABLES, text) == expected, text
+        assert matcher.match(text) == expected, text
+    print("✅ Gana el intent con mayor prioridad, como en el recorrido original")
+
+def test_matches_legacy_classifier():
+    print("🔧 Comparando con el clasificador original...")
+    rnd = random.Random(5)
+    for tables in (load_tables(), synthetic_tables(rnd, 60)):
+        matcher = KeywordMatcher(tables)
+        keywords = [keyword for _, keywords in tables for keyword in keywords]
+        texts = ["saldo de Juan", "Transacciones de María", "alertas críticas", "hola", "información de cuenta"]
+        for _ in range(2000):
+            words = [random_word(rnd) for _ in range(rnd.randint(1, 6))]
+            for _ in range(rnd.randint(0, 2)):
+                words.insert(rnd.randint(0, len(words)), rnd.choice(keywords).upper() if rnd.random() < 0.2 else rnd.choice(keywords))
+            texts.append(' '.join(words))
+        for text in texts:
+            assert matcher.match(text) == legacy_classify(tables, text), text
+    print("✅ Mismo intent que el clasificador original")
+
+def test_normalized_keywords():
+    print("🔧 Probando keywords normalizadas sin acentos...")
+    tables = [("saldo", ["cuánto tengo"]), ("informacion", ["información"])]
+    matcher = KeywordMatcher(tables, normalize=fold_name)
+    for text, expected in {"Información": "informacion", "informacion": "informacion",
+                           "¿CUANTO  tengo?": "saldo", "cuánto tengo": "saldo", "info": None}.items():
+        assert matcher.match(text) == expected, text
+    # Por defecto solo minúsculas, como el clasificador original
+    assert KeywordMatcher(tables).match("informacion") is None
+    print("✅ Con y sin acentos se reconoce la misma keyword")
+
+if __name__ == "__main__":
+    test_overlapping_priorities()
+    test_matches_legacy_classifier()
+    test_normalized_keywords()
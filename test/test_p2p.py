@@ -0,0 +1,327 @@
+import asyncio
+import json
+import math
+import random
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from p2p.send_queue import PeerSendQueue
+from p2p.gossip import SeenMessages
+from p2p.node import P2PNode
+from p2p.protocol import P2PProtocol
+from p2p.failure_detector import PhiAccrualDetector, backoff_delay
+
+class SlowWebSocket:
+    """Conexión que no envía nada hasta release(): la cola se llena"""
+
+    def __init__(self, released=False):
+        self.sent = []
+        self.closed = False
+        self._released = asyncio.Event()
+        if released:
+            self._released.set()
+
+    def release(self):
+        self._released.set()
+
+    async def send(self, message):
+        await self._released.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+def pending(send_queue):
+    return [message for _, message in send_queue._messages]
+
+def test_send_queue_overflow_policies():
+    print("🔧 Probando políticas de desbordamiento de la cola de envío...")
+    
+    async def scenario():
+        failures = []
+        on_failure = lambda peer_id, send_queue: failures.append(peer_id)
+        
+        # drop_oldest: se conservan los más recientes
+        websocket = SlowWebSocket()
+        oldest = PeerSendQueue("a", websocket, maxsize=3, policy='drop_oldest')
+        for i in range(5):
+            assert oldest.put(f"m{i}")
+        assert pending(oldest) == ["m2", "m3", "m4"] and oldest.dropped == 2
+        websocket.release()
+        while oldest.depth:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert websocket.sent == ["m2", "m3", "m4"] and oldest.stats()['sent'] == 3
+        oldest.close()
+        
+        # drop_chat_first: los chats se descartan antes que las alertas
+        chats = PeerSendQueue("b", SlowWebSocket(), maxsize=3, policy='drop_chat_first')
+        chats.put("alert1")
+        chats.put("chat1", droppable=True)
+        chats.put("alert2")
+        chats.put("alert3")
+        assert pending(chats) == ["alert1", "alert2", "alert3"]
+        chats.put("chat2", droppable=True)  # solo hay alertas: se descarta el chat nuevo
+        assert pending(chats) == ["alert1", "alert2", "alert3"]
+        chats.put("alert4")  # una alerta nueva desplaza a la más antigua
+        assert pending(chats) == ["alert2", "alert3", "alert4"]
+        assert chats.stats() == {'depth': 3, 'max_depth': 3, 'sent': 0, 'dropped': 3, 'policy': 'drop_chat_first'}
+        chats.close()
+        
+        # disconnect: se cierra la conexión y se avisa al nodo
+        websocket = SlowWebSocket()
+        strict = PeerSendQueue("c", websocket, maxsize=2, policy='disconnect', on_failure=on_failure)
+        for i in range(3):
+            strict.put(f"m{i}")
+        await asyncio.sleep(0)
+        assert websocket.closed and strict.closed and failures == ["c"]
+        assert strict.dropped == 3
+        assert not strict.put("m3")
+    
+    asyncio.run(scenario())
+    print("✅ Políticas de desbordamiento correctas")
+
+def test_send_queue_stopped_loop():
+    print("🔧 Probando cola cuyo loop se detuvo...")
+    failures = []
+    loop = asyncio.new_event_loop()
+    
+    async def create():
+        return PeerSendQueue("a", SlowWebSocket(), on_failure=lambda peer_id, send_queue: failures.append(peer_id))
+    
+    send_queue = loop.run_until_complete(create())
+    # El loop sigue abierto pero ya no corre: encolar no debe fingir éxito
+    assert not loop.is_running() and not loop.is_closed()
+    assert not send_queue.put("alerta")
+    assert send_queue.closed and failures == ["a"]
+    loop.run_until_complete(asyncio.sleep(0))  # procesar la cancelación de la tarea de escritura
+    loop.close()
+    print("✅ El nodo recibe el fallo y puede reconectar al peer")
+
+def test_seen_messages():
+    print("🔧 Probando conjunto de mensajes vistos...")
+    seen = SeenMessages(maxsize=3, expire_after=0.05)
+    assert seen.add("a") and not seen.add("a")
+    assert "a" in seen and seen.duplicates == 1
+    # Con más de maxsize se olvidan los más antiguos
+    for message_id in ("b", "c", "d"):
+        assert seen.add(message_id)
+    assert len(seen) == 3 and "a" not in seen and seen.add("a")
+    # Pasado expire_after un id vuelve a ser nuevo
+    time.sleep(0.06)
+    assert "d" not in seen
+    assert seen.add("d") and len(seen) == 1
+    print("✅ Duplicados descartados y caducidad correcta")
+
+def alert_message(sender_id="origen", ttl=3, **fields):
+    message = P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['ALERT'], [{'message': 'saldo bajo'}], sender_id, ttl=ttl)
+    message.update(fields)
+    return message
+
+def test_gossip_dedup_and_ttl():
+    print("🔧 Probando reenvío gossip...")
+    
+    async def scenario():
+        node = P2PNode('localhost', 0, 'nodo', gossip_fanout=2)
+        received = []
+        async def handle_alert(message, websocket):
+            received.append(message['message_id'])
+        node.message_handlers[P2PProtocol.MESSAGE_TYPES['ALERT']] = handle_alert
+        sockets = {peer_id: SlowWebSocket(released=True) for peer_id in ("origen", "p1", "p2", "p3")}
+        for peer_id, websocket in sockets.items():
+            node.add_peer(peer_id, websocket)
+        
+        # El mismo mensaje por dos caminos: se procesa y reenvía una sola vez
+        message = alert_message(ttl=3)
+        raw_message = json.dumps(message)
+        await node.process_message(raw_message, sockets["origen"])
+        await node.process_message(raw_message, sockets["p1"])
+        await asyncio.sleep(0)
+        forwarded = [json.loads(raw) for peer_id in ("p1", "p2", "p3") for raw in sockets[peer_id].sent]
+        assert received == [message['message_id']]
+        assert len(forwarded) == 2 and node.gossip_stats()['duplicates'] == 1
+        # Con un salto menos y nunca de vuelta al origen
+        assert all(relayed['ttl'] == 2 for relayed in forwarded) and not sockets["origen"].sent
+        
+        # Sin saltos restantes no se reenvía, pero se procesa
+        await node.process_message(json.dumps(alert_message(ttl=1)), sockets["origen"])
+        assert node.relay_message(alert_message(ttl=0)) == 0
+        await asyncio.sleep(0)
+        assert len(received) == 2 and node.gossip_stats()['relayed'] == 2
+        
+        for send_queue in node.send_queues.values():
+            send_queue.close()
+    
+    asyncio.run(scenario())
+    print("✅ Cada mensaje se procesa una vez y el TTL limita los saltos")
+
+def test_relay_rejects_unencodable_fields():
+    print("🔧 Probando mensajes con campos que no caben en la trama...")
+    # parse_message rechaza lo que no se podría reenviar y convierte el ttl a entero
+    assert P2PProtocol.parse_message(json.dumps(alert_message(timestamp="ayer"))) is None
+    assert P2PProtocol.parse_message(json.dumps(alert_message(message_id="x" * 256))) is None
+    assert P2PProtocol.parse_message(json.dumps(alert_message(ttl="muchos"))) is None
+    assert P2PProtocol.parse_message(json.dumps(alert_message(sender_id=7))) is None
+    assert P2PProtocol.parse_message(json.dumps([1, 2, 3])) is None
+    assert P2PProtocol.parse_message(json.dumps(alert_message(ttl="4")))['ttl'] == 4
+    assert P2PProtocol.parse_message(json.dumps(alert_message(ttl=1000)))['ttl'] == 255
+    
+    async def scenario():
+        # Un mensaje que no se puede codificar se descarta sin cerrar la conexión
+        node = P2PNode('localhost', 0, 'nodo')
+        websocket = SlowWebSocket(released=True)
+        node.add_peer("p1", websocket)
+        node.peer_formats["p1"] = 'binary'
+        assert node.relay_message(alert_message(message_id="x" * 300)) == 0
+        assert node.relay_message(alert_message()) == 1
+        await asyncio.sleep(0)
+        assert "p1" in node.peers and len(websocket.sent) == 1
+        node.send_queues["p1"].close()
+    
+    asyncio.run(scenario())
+    print("✅ Solo se descarta el mensaje inválido")
+
+def test_binary_round_trip():
+    print("🔧 Probando formato binario...")
+    messages = [
+        alert_message(),
+        P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['CHAT'],
+                                  [{'user_input': 'Saldo de María', 'bot_response': '💰 $1,250.00'}], 'nodo_ñ'),
+        P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['HEARTBEAT'], {'kind': 'ping', 'seq': 3}, 'nodo', 'peer_8001'),
+        alert_message(message_id='mensaje-legado-1', ttl=0),
+    ]
+    for message in messages:
+        raw_message = P2PProtocol.encode_message(message, 'binary')
+        assert isinstance(raw_message, bytes)
+        assert P2PProtocol.parse_message(raw_message) == message
+        assert len(raw_message) < len(P2PProtocol.encode_message(message, 'json').encode('utf-8'))
+    
+    # Tipos sin código binario salen en JSON; tramas de otra versión se descartan
+    other = P2PProtocol.build_message('custom_type', {'a': 1}, 'nodo')
+    assert P2PProtocol.parse_message(P2PProtocol.encode_message(other, 'binary')) == other
+    raw_message = bytearray(P2PProtocol.encode_message(messages[0], 'binary'))
+    raw_message[0] = P2PProtocol.WIRE_VERSION + 1
+    assert P2PProtocol.parse_message(bytes(raw_message)) is None
+    assert P2PProtocol.parse_message(b'\x01\x02') is None
+    print("✅ Ida y vuelta sin pérdidas")
+
+def discovery_message(content):
+    return P2PProtocol.build_message(P2PProtocol.MESSAGE_TYPES['DISCOVERY'], content, 'peer')
+
+def test_format_negotiation():
+    print("🔧 Probando negociación de formato...")
+    version = P2PProtocol.WIRE_VERSION
+    assert P2PProtocol.negotiate_format(['binary', 'json'], None, version) == 'binary'
+    assert P2PProtocol.negotiate_format(['binary', 'json'], None, version + 1) == 'json'
+    assert P2PProtocol.negotiate_format(['binary'], None, None) == 'json'
+    assert P2PProtocol.negotiate_format(None) == 'json'
+    assert P2PProtocol.negotiate_format(['binary', 'json'], ('json',), version) == 'json'
+    
+    async def join(wire_version):
+        node = P2PNode('localhost', 0, 'nodo')
+        websocket = SlowWebSocket(released=True)
+        content = {'node_id': 'peer', 'action': 'join', 'formats': ['binary', 'json'], 'wire_version': wire_version}
+        await node.handle_discovery(discovery_message(content), websocket)
+        welcome = json.loads(websocket.sent[0])['content']
+        node.send_queues['peer'].close()
+        return node.peer_formats['peer'], welcome['format']
+    
+    async def welcome(content):
+        node = P2PNode('localhost', 0, 'nodo')
+        node.add_peer('peer', SlowWebSocket(released=True))
+        await node.handle_discovery(discovery_message(dict(content, action='welcome')), node.peers['peer'])
+        node.send_queues['peer'].close()
+        return node.peer_formats['peer']
+    
+    assert asyncio.run(join(version)) == ('binary', 'binary')
+    assert asyncio.run(join(version + 1)) == ('json', 'json')
+    assert asyncio.run(join(None)) == ('json', 'json')
+    assert asyncio.run(welcome({'format': 'binary', 'wire_version': version})) == 'binary'
+    assert asyncio.run(welcome({'format': 'binary', 'wire_version': version + 1})) == 'json'
+    assert asyncio.run(welcome({})) == 'json'
+    print("✅ Binario solo con la misma versión de trama")
+
+def test_chat_batches():
+    print("🔧 Probando lotes de chats...")
+    
+    async def scenario():
+        node = P2PNode('localhost', 0, 'nodo', chat_batch_size=4, chat_flush_interval=0.01)
+        sockets = {'nuevo': SlowWebSocket(released=True), 'antiguo': SlowWebSocket(released=True)}
+        for peer_id, websocket in sockets.items():
+            node.add_peer(peer_id, websocket)
+        node.peer_features['nuevo'] = {'chat_batch'}
+        
+        for i in range(10):
+            await node.share_chat(f"pregunta {i}", f"respuesta {i}")
+        await asyncio.sleep(0.05)  # los 2 últimos salen por el temporizador
+        
+        batches = [json.loads(raw)['content'] for raw in sockets['nuevo'].sent]
+        singles = [json.loads(raw)['content'] for raw in sockets['antiguo'].sent]
+        for send_queue in node.send_queues.values():
+            send_queue.close()
+        return node, batches, singles
+    
+    node, batches, singles = asyncio.run(scenario())
+    # Lotes de chat_batch_size como máximo para quien los entiende, uno por trama para el resto
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert all(isinstance(chat, dict) for chat in singles) and len(singles) == 10
+    expected = [f"pregunta {i}" for i in range(10)]
+    assert [chat['user_input'] for batch in batches for chat in batch] == expected
+    assert [chat['user_input'] for chat in singles] == expected
+    assert node.chat_stats() == {'shared': 10, 'flushes': 3, 'avg_batch': 10 / 3, 'pending': 0}
+    print("✅ Lotes divididos según el tamaño y las capacidades de cada peer")
+
+def test_phi_accrual_detector():
+    print("🔧 Probando detector phi accrual...")
+    detector = PhiAccrualDetector(expected_interval=1.0)
+    start = detector.last_heartbeat
+    for beat in range(1, 11):
+        detector.heartbeat(start + beat, rtt=0.02)
+    last = start + 10
+    
+    assert math.isclose(detector.phi(last + 1), math.log10(math.e))
+    assert math.isclose(detector.phi(last + 5), 5 * math.log10(math.e))
+    # phi llega al umbral (3) tras ~6.9 s de silencio, antes que el respaldo por tiempo
+    horizon = PhiAccrualDetector.silence_for(3.0, 1.0)
+    assert detector.is_available(last + horizon - 0.1)
+    assert not detector.is_available(last + horizon + 0.1)
+    assert horizon + 0.1 < detector.timeout
+    assert detector.rtt == 0.02
+    
+    # Con intervalos largos phi tarda más; el respaldo lo acota
+    slow = PhiAccrualDetector(expected_interval=1.0)
+    for beat in range(1, 6):
+        slow.heartbeat(slow.last_heartbeat + 20)
+    silence = slow.timeout + 0.1
+    assert slow.phi(slow.last_heartbeat + silence) < slow.threshold
+    assert not slow.is_available(slow.last_heartbeat + silence)
+    
+    # Un timeout explícito se respeta
+    assert PhiAccrualDetector(timeout=5.0).timeout == 5.0
+    print("✅ phi decide antes que el timeout de respaldo")
+
+def test_backoff_schedule():
+    print("🔧 Probando espera entre reconexiones...")
+    random.seed(7)
+    for attempt in range(12):
+        ceiling = min(30.0, 0.5 * 2 ** attempt)
+        delays = [backoff_delay(attempt) for _ in range(200)]
+        assert all(ceiling / 2 <= delay <= ceiling for delay in delays), attempt
+        # Con jitter: los nodos que cayeron a la vez no reintentan juntos
+        assert len(set(delays)) > 1
+    assert max(backoff_delay(50, base=1.0, maximum=8.0) for _ in range(200)) <= 8.0
+    print("✅ Espera exponencial acotada con jitter")
+
+if __name__ == "__main__":
+    test_send_queue_overflow_policies()
+    test_send_queue_stopped_loop()
+    test_seen_messages()
+    test_gossip_dedup_and_ttl()
+    test_relay_rejects_unencodable_fields()
+    test_binary_round_trip()
+    test_format_negotiation()
+    test_chat_batches()
+    test_phi_accrual_detector()
+    test_backoff_schedule()
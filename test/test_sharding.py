@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.financial_db import FinancialDatabase
+from database.async_db import AsyncFinancialDatabase
+
+# Unos 10 s sin interrumpir
+SLOW_QUERY = 'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c LIMIT 20000000) SELECT COUNT(*) FROM c'
+
+def build_database(shards, recent):
+    """Cuentas y transacciones repartidas por account_id; recent: timestamp de hace una hora"""
+    directory = tempfile.mkdtemp(prefix="sharding_test_")
+    db = FinancialDatabase(os.path.join(directory, "test.db"), sample_data=False, shards=shards)
+    accounts = [(1, "Juan Pérez", 50.0, "checking", 0), (2, "Maria Gonzalez", 15000.0, "savings", 0)]
+    accounts += [(account_id, f"Cliente {account_id}", 40.0 * account_id, "checking", account_id % 4)
+                 for account_id in range(3, 17)]
+    transactions = [(1 + i % 16, -900.0 if i % 3 else 250.0, "transfer", f"pago {i}",
+                     f"2024-03-{1 + i % 9:02d} 12:00:00") for i in range(160)]
+    # Salidas de las últimas 24 horas: actividad sospechosa en las cuentas 2 y 7
+    transactions += [(account_id, -6000.0, "transfer", "Large Transfer", recent)
+                     for account_id in (2, 2, 7, 7, 9)]
+    for pool in db.pools:
+        with pool.write() as conn:
+            conn.executemany('''
+                INSERT INTO accounts (account_id, user_name, balance, account_type, failed_attempts)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [account for account in accounts if db.shard_pool(account[0]) is pool])
+            conn.executemany('''
+                INSERT INTO transactions (account_id, amount, transaction_type, description, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [transaction for transaction in transactions if db.shard_pool(transaction[0]) is pool])
+    db.index_account_names()
+    return db
+
+def without_ids(page):
+    """Página sin transaction_id (cada shard numera sus transacciones)"""
+    return [{key: value for key, value in transaction.items() if key != "transaction_id"}
+            for transaction in page["transactions"]]
+
+def full_history(db, account_id):
+    transactions, before = [], None
+    while True:
+        page = db.get_transactions_page(account_id=account_id, limit=4, before=before)
+        transactions += without_ids(page)
+        before = page["next_cursor"]
+        if before is None:
+            return transactions
+
+def test_shards_match_single_database():
+    print("🔧 Comparando 3 shards con una sola base...")
+    recent = (datetime.utcnow() - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+    single, sharded = build_database(1, recent), build_database(3, recent)
+    assert len(sharded.pools) == 3
+    
+    alerts = single.detect_critical_conditions()
+    assert {alert["type"] for alert in alerts} == {"SALDO_BAJO", "ACTIVIDAD_SOSPECHOSA", "INCIDENTE_DE_SEGURIDAD"}
+    assert sharded.detect_critical_conditions() == alerts
+    
+    for name in ("Juan", "Maria", "Cliente 7", "Cliente 16", "Nadie"):
+        assert sharded.get_account_balance(name) == single.get_account_balance(name), name
+    for account_id in range(1, 17):
+        assert full_history(sharded, account_id) == full_history(single, account_id), account_id
+        page = sharded.get_transactions_page(f"Cliente {account_id}", limit=3)
+        assert without_ids(page) == without_ids(single.get_transactions_page(f"Cliente {account_id}", limit=3))
+    
+    # Mismas alertas abiertas y, al mezclar los shards, el mismo orden (severidad, más reciente primero)
+    merged = sharded.get_all_alerts().splitlines()
+    expected = single.get_all_alerts().splitlines()
+    assert len(merged) > 3 and sorted(merged) == sorted(expected)
+    severities = [int(line.rsplit("Severidad: ", 1)[1].rstrip(")")) for line in merged[1:]]
+    assert severities == sorted(severities, reverse=True)
+    single.close()
+    sharded.close()
+    print("✅ Mismos resultados con 1 y 3 shards")
+
+def test_timeout_interrupts_shard_queries():
+    print("🔧 Probando timeout de una consulta repartida entre shards...")
+    db = build_database(3, "2024-03-01 12:00:00")
+    async_db = AsyncFinancialDatabase(db)
+    outcomes = []
+    
+    def slow_scan(pool):
+        start = time.perf_counter()
+        try:
+            with pool.read() as conn:
+                conn.execute(SLOW_QUERY).fetchone()
+            outcomes.append(("completa", time.perf_counter() - start))
+        except sqlite3.OperationalError:
+            outcomes.append(("interrumpida", time.perf_counter() - start))
+    
+    async def scenario():
+        try:
+            await async_db.run(db._map_shards, slow_scan, timeout=0.3)
+        except asyncio.TimeoutError:
+            return True
+        return False
+    
+    assert asyncio.run(scenario())
+    deadline = time.monotonic() + 3
+    while len(outcomes) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    print(f"  {outcomes}")
+    assert len(outcomes) == 3 and all(outcome == "interrumpida" for outcome, _ in outcomes)
+    async_db.close()
+    db.close()
+    print("✅ El timeout interrumpe las consultas de todos los shards")
+
+if __name__ == "__main__":
+    test_shards_match_single_database()
+    test_timeout_interrupts_shard_queries()